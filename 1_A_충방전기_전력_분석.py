@@ -1,8 +1,21 @@
 import streamlit as st
 import pandas as pd
-import numpy as np
 import math
-from scipy.interpolate import griddata
+import os
+
+from powercalc.batch_import import batch_table, calculate_recipes, read_recipe_library
+from powercalc.cccv import CV_MODELS, LEGACY_CV_MODEL
+from powercalc.demand import DEFAULT_DEMAND_WINDOW_H, demand_peak
+from powercalc.efficiency import DEFAULT_CYCLER_MODEL, EQUIPMENT_SPECS, get_registry
+from powercalc.efficiency_lut import build_lut, get_dense_table
+from powercalc.monte_carlo import DISTRIBUTION_KINDS, InputDistribution, run_monte_carlo
+from powercalc.power_timeline import PowerTimeline
+from powercalc.recipe_engine import RUN_COUNT_COLUMN, CyclerSpecs, IncrementalSimulator, summarize_steps
+from powercalc.recipe_io import RECIPE_FILE_TYPES, is_normalized, normalize_recipe_frame, read_recipe_file, split_recipe_details, validate_recipe
+from powercalc.recipe_loops import LOOP_COUNT_COLUMN, LOOP_MODE, LOOP_START_COLUMN, find_loops
+from powercalc.result_cache import get_result_cache, recipe_fingerprint
+from powercalc.spec_selection import RANKING_CRITERIA, rank_equipment_specs
+from powercalc.sweep import SweepCache, parse_sweep_values, run_sweep
 
 # --- 페이지 기본 설정 ---
 st.set_page_config(layout="wide", page_title="배터리 레시피 계산기")
@@ -12,7 +25,8 @@ st.title("⚡ 배터리 레시피 계산기 (Final Fix)")
 DEFAULT_SPECS = {
     'cell_capacity': 211.10, 'equipment_spec': '60A - 300A', 'control_channels': 16,
     'test_channels': 800, 'standby_power': 1572.0, 'cable_area': 150.0,
-    'cable_length': 3.0, 'repetition_count': 1,
+    'cable_length': 3.0, 'repetition_count': 1, 'use_efficiency_lut': False,
+    'cycler_model': DEFAULT_CYCLER_MODEL, 'cv_model': CV_MODELS[0],
     'recipe_to_manage': '선택하세요'
 }
 
@@ -26,11 +40,19 @@ def initialize_state():
             "전압(V)": pd.Series(dtype='float'),
             "전류(A)": pd.Series(dtype='float'),
             "전력(W)": pd.Series(dtype='float'),
-            "시간 제한(H)": pd.Series(dtype='float')
+            "시간 제한(H)": pd.Series(dtype='float'),
+            LOOP_START_COLUMN: pd.Series(dtype='float'),
+            LOOP_COUNT_COLUMN: pd.Series(dtype='float')
         })
     if 'result_df' not in st.session_state: st.session_state.result_df = pd.DataFrame()
+    if 'first_run_df' not in st.session_state: st.session_state.first_run_df = pd.DataFrame()
     if 'saved_recipes' not in st.session_state: st.session_state.saved_recipes = {}
     if 'cp_cccv_details' not in st.session_state: st.session_state.cp_cccv_details = {}
+    # 직전 계산 결과를 기억해 바뀐 스텝부터만 다시 계산
+    if 'recipe_simulator' not in st.session_state: st.session_state.recipe_simulator = IncrementalSimulator()
+    # 최대 수요전력(이동 평균) 계산 조건
+    if 'recipe_demand_window_min' not in st.session_state: st.session_state.recipe_demand_window_min = DEFAULT_DEMAND_WINDOW_H * 60
+    if 'recipe_demand_exclude_h' not in st.session_state: st.session_state.recipe_demand_exclude_h = 0.0
     for key, value in DEFAULT_SPECS.items():
         if key not in st.session_state: st.session_state[key] = value
 
@@ -42,9 +64,11 @@ def load_recipe_callback():
     if recipe_to_load != "선택하세요" and recipe_to_load in st.session_state.saved_recipes:
         loaded_data = st.session_state.saved_recipes[recipe_to_load]
         for key, value in loaded_data.items():
-            if key not in ['recipe_table', 'total_kwh', 'max_peak_power', 'total_hours', 'demand_peak_power', 'recipe_table_with_results']:
+            if key not in ['recipe_table', 'total_kwh', 'max_peak_power', 'total_hours', 'demand_peak_power', 'rolling_demand_peak_power', 'recipe_table_with_results']:
                 st.session_state[key] = value
         
+        # cv_model 없이 저장된 레시피는 저장 당시 방식(평균 전류)으로 계산
+        st.session_state.cv_model = loaded_data.get('cv_model', LEGACY_CV_MODEL)
         st.session_state.input_df = pd.DataFrame(loaded_data['recipe_table'])
         st.session_state.cp_cccv_details = {int(k): v for k, v in loaded_data.get('cp_cccv_details', {}).items()}
         st.success(f"'{recipe_to_load}' 레시피를 성공적으로 불러왔습니다!")
@@ -77,74 +101,9 @@ with st.expander("📂 저장된 레시피 관리", expanded=True):
 st.markdown("---")
 
 
-# --- 3. 효율 데이터 및 물리 계산 로직 (변경 없음) ---
-# <editor-fold desc="효율 계산 로직">
-COPPER_RESISTIVITY = 1.72e-8
-charge_currents = np.array([10, 20, 30, 40, 50, 60, 70, 80, 90, 100, 110, 120, 130, 140, 150, 160, 170, 180, 190, 200, 210, 220, 230, 240, 250, 260, 270, 280, 290, 300])
-charge_voltages = np.array([3.3, 4.2, 5.0])
-charge_eff_3_3V = np.array([48.62, 63.88, 71.01, 75.43, 78.54, 80.64, 81.90, 82.71, 83.32, 83.78, 84.07, 84.25, 84.25, 84.09, 83.95, 83.75, 83.63, 83.48, 83.33, 83.11, 82.81, 82.49, 82.17, 81.83, 81.51, 81.16, 80.78, 80.38, 79.99, 79.56]) / 100.0
-charge_eff_4_2V = np.array([49.46, 64.42, 72.12, 76.76, 79.58, 81.46, 82.81, 83.85, 84.56, 84.90, 85.15, 85.37, 85.44, 85.49, 85.38, 85.25, 85.15, 85.02, 84.89, 84.71, 84.50, 84.28, 83.99, 83.70, 83.40, 83.09, 82.76, 82.42, 82.06, 81.68]) / 100.0
-charge_eff_5_0V = np.array([53.24, 67.85, 75.24, 79.30, 81.82, 83.63, 84.88, 85.71, 86.15, 86.55, 86.82, 87.01, 86.99, 86.95, 86.83, 86.75, 86.68, 86.56, 86.36, 86.18, 85.94, 85.73, 85.48, 85.22, 84.94, 84.64, 84.32, 84.00, 83.65, 83.31]) / 100.0
-discharge_currents = np.array([10, 20, 30, 40, 50, 60, 70, 80, 90, 100, 110, 120, 130, 140, 150, 160, 170, 180, 190, 200, 210, 220, 230, 240, 250, 260, 270, 280, 290, 300])
-discharge_voltages = np.array([3.3, 4.2, 5.0])
-discharge_eff_3_3V = np.array([-16.20, 39.95, 56.71, 65.99, 70.81, 74.11, 76.21, 77.63, 78.69, 79.58, 80.14, 80.52, 80.77, 80.78, 80.75, 80.58, 80.47, 79.42, 79.99, 79.68, 79.31, 78.93, 78.55, 78.13, 77.62, 77.10, 76.61, 76.05, 75.40, 74.87]) / 100.0
-discharge_eff_4_2V = np.array([-6.35, 45.02, 61.23, 70.32, 74.83, 77.77, 79.81, 81.19, 82.18, 82.85, 83.29, 83.56, 83.63, 83.72, 83.75, 83.70, 83.56, 83.37, 83.16, 82.83, 82.59, 82.28, 81.93, 81.57, 81.17, 80.76, 80.33, 79.83, 79.36, 78.88]) / 100.0
-discharge_eff_5_0V = np.array([9.00, 51.99, 65.99, 74.24, 78.26, 80.71, 82.37, 83.62, 84.36, 84.89, 85.24, 85.44, 85.63, 85.71, 85.66, 85.60, 85.46, 85.27, 85.06, 84.83, 84.58, 84.27, 83.99, 83.65, 83.29, 82.92, 82.53, 82.10, 81.66, 81.23]) / 100.0
-
-def structure_data_for_interpolation(currents, voltages, eff_data_list):
-    points, values = [], []
-    for i, current in enumerate(currents):
-        for j, voltage in enumerate(voltages):
-            points.append([current, voltage])
-            values.append(eff_data_list[j][i])
-    return np.array(points), np.array(values)
-
-charge_points, charge_values = structure_data_for_interpolation(charge_currents, charge_voltages, [charge_eff_3_3V, charge_eff_4_2V, charge_eff_5_0V])
-discharge_points, discharge_values = structure_data_for_interpolation(discharge_currents, discharge_voltages, [discharge_eff_3_3V, discharge_eff_4_2V, discharge_eff_5_0V])
-
-def calculate_cable_resistance(length_m, area_sqmm):
-    if area_sqmm <= 0: return 0
-    area_m2 = area_sqmm * 1e-6
-    return COPPER_RESISTIVITY * (length_m * 2) / area_m2
-
-def get_efficiency(mode, voltage, current, equipment_spec, cable_length_m, cable_area_sqmm):
-    current = abs(current)
-    try:
-        max_current_str = equipment_spec.split('-')[1].strip().replace('A', '')
-        max_current = int(max_current_str)
-        scaling_factor = max_current / 300.0
-    except (IndexError, ValueError):
-        scaling_factor = 1.0
-    
-    equivalent_current = current / scaling_factor if scaling_factor > 0 else 0
-    voltage_clipped = np.clip(voltage, 3.3, 5.0)
-    current_clipped = np.clip(equivalent_current, 10, 300)
-
-    if mode == 'Charge': points, values = charge_points, charge_values
-    elif mode == 'Discharge': points, values = discharge_points, discharge_values
-    else: return 1.0
-
-    eta_table = griddata(points, values, (current_clipped, voltage_clipped), method='linear')
-    if np.isnan(eta_table):
-        eta_table = griddata(points, values, (current_clipped, voltage_clipped), method='nearest')
-
-    R_3m_150sq = calculate_cable_resistance(3.0, 150.0)
-    R_new = calculate_cable_resistance(cable_length_m, cable_area_sqmm)
-
-    eta_adjusted = eta_table
-    if voltage > 0 and current > 0 :
-        if mode == 'Charge':
-            eta_pure = eta_table * (1 + (equivalent_current * R_3m_150sq) / voltage)
-            eta_adjusted = eta_pure / (1 + (current * R_new) / voltage)
-        else: # Discharge
-            denominator = 1 - (equivalent_current * R_3m_150sq) / voltage
-            if denominator <= 0: return -1.0
-            eta_pure = eta_table / denominator
-            eta_adjusted = eta_pure * (1 - (current * R_new) / voltage)
-    
-    if mode == 'Charge': return np.clip(eta_adjusted, 0, 1.0)
-    else: return np.clip(eta_adjusted, -np.inf, 1.0)
-# </editor-fold>
+# --- 3. 효율 데이터 및 물리 계산 로직 ---
+# 효율 테이블과 보간기는 powercalc.efficiency 에서 프로세스당 한 번만 준비됩니다.
+# 스텝별 시뮬레이션은 powercalc.recipe_engine 에서 수행됩니다 (결과 그래프 페이지와 공용).
 
 
 # --- 4. 기본 정보 및 장비 사양 입력 ---
@@ -155,7 +114,10 @@ st.markdown("---")
 st.subheader("장비 및 배선 사양 입력")
 col1, col2, col3 = st.columns(3)
 with col1:
-    st.selectbox("장비 사양", options=['2A - 10A', '5A - 25A', '10A - 50A', '20A - 100A', '30A - 150A', '40A - 200A', '60A - 300A', '120A - 600A', '180A - 900A', '240A - 1200A', '300A - 1500A', '360A - 1800A', '420A - 2000A'], key='equipment_spec')
+    st.selectbox("장비 사양", options=list(EQUIPMENT_SPECS), key='equipment_spec')
+    cycler_model_options = get_registry().available_models() or [DEFAULT_CYCLER_MODEL]
+    if st.session_state.cycler_model not in cycler_model_options: st.session_state.cycler_model = cycler_model_options[0]
+    st.selectbox("충방전기 모델 (효율 맵)", options=cycler_model_options, key='cycler_model', help="efficiency_maps 폴더의 CSV/Parquet 효율 맵 중 하나를 선택합니다.")
     st.number_input("대기전력 (W)", min_value=0.0, step=1.0, key='standby_power', format="%.2f")
 with col2:
     st.number_input("컨트롤 채널 수 (CH)", min_value=1, step=1, key='control_channels')
@@ -164,24 +126,44 @@ with col3:
     st.number_input("배선 단면적 (SQ)", min_value=1.0, step=1.0, key='cable_area', format="%.1f")
     st.number_input("배선 길이 (M)", min_value=0.1, step=0.1, key='cable_length', format="%.1f")
 
+col_lut1, col_lut2 = st.columns([0.7, 0.3])
+with col_lut1:
+    st.checkbox("사전 계산된 효율 테이블(LUT) 사용", key='use_efficiency_lut', help="현재 장비 사양/배선 조합의 LUT 파일이 있으면 보간 대신 메모리 매핑된 테이블에서 효율을 읽습니다. 파일이 없으면 기존 보간 모델을 사용합니다.")
+with col_lut2:
+    try:
+        lut_ready = get_dense_table(st.session_state.equipment_spec, st.session_state.cable_length, st.session_state.cable_area, cycler_model=st.session_state.cycler_model) is not None
+    except (KeyError, ValueError) as e:
+        st.error(f"효율 맵을 불러오는 중 오류가 발생했습니다: {e}")
+        lut_ready = True
+    if st.button("🧮 현재 사양 LUT 생성", disabled=lut_ready, use_container_width=True, help="이미 생성된 경우 비활성화됩니다."):
+        with st.spinner("효율 LUT 계산 중..."):
+            build_lut(st.session_state.equipment_spec, st.session_state.cable_length, st.session_state.cable_area, cycler_model=st.session_state.cycler_model)
+        st.rerun()
+
 required_equipment = math.ceil(st.session_state.test_channels / st.session_state.control_channels) if st.session_state.control_channels > 0 else 0
 st.metric(label="✅ 필요 장비 수량 (자동 계산)", value=f"{required_equipment} F")
 st.markdown("---")
 st.subheader("테스트 옵션")
 st.number_input("레시피 반복 횟수", min_value=1, step=1, key='repetition_count')
+cv_model_labels = {'exponential': "지수 감쇠 (I = I_cc·e^(-t/τ))", 'average': "평균 전류 ((CC 전류 + 종료 전류) / 2)"}
+st.selectbox("CCCV 의 CV 구간 계산 방식", options=list(CV_MODELS), format_func=lambda x: cv_model_labels[x], key='cv_model',
+             help="지수 감쇠: CV 구간 전류가 종료 전류까지 지수적으로 줄어드는 모델로 시간/전력량을 계산합니다. 평균 전류: 이전 버전의 근사 방식입니다.")
 st.markdown("---")
 
 
 # --- 5. 레시피 테이블 UI (★ 이 부분이 에러의 핵심입니다 ★) ---
 # <editor-fold desc="레시피 테이블 UI">
-uploaded_file = st.file_uploader("엑셀 파일로 레시피를 업로드하세요 (A:모드, B:테스트, C:전압, D:전류, E:전력, F:시간)", type=['xlsx', 'xls'])
-if uploaded_file is not None:
+uploaded_file = st.file_uploader(f"레시피 파일을 업로드하세요 ({'/'.join(RECIPE_FILE_TYPES)} — A:모드, B:테스트, C:전압, D:전류, E:전력, F:시간, G:루프 시작 스텝, H:루프 횟수, 선택: I:CV 전압, J:종료 전류, K:CV 전환(%), L:CP 시작 전압, M:CP 종료 전압)", type=RECIPE_FILE_TYPES)
+# 업로드한 파일은 한 번만 불러옴 (다시 실행될 때마다 읽으면 표에서 수정한 내용이 파일 내용으로 덮어써짐)
+uploaded_file_id = (getattr(uploaded_file, 'file_id', None) or (uploaded_file.name, uploaded_file.size)) if uploaded_file is not None else None
+if uploaded_file is not None and uploaded_file_id != st.session_state.get('imported_file_id'):
     try:
-        df_from_excel = pd.read_excel(uploaded_file, header=None, names=["모드", "테스트", "전압(V)", "전류(A)", "전력(W)", "시간 제한(H)"])
-        st.session_state.input_df = df_from_excel
-        st.success("엑셀 파일의 내용으로 레시피를 성공적으로 불러왔습니다!")
+        # I ~ M 열에 상세 설정이 있으면 CP/CCCV 상세 설정으로 불러옴 (없으면 빈 설정)
+        st.session_state.input_df, st.session_state.cp_cccv_details = split_recipe_details(normalize_recipe_frame(read_recipe_file(uploaded_file)))
+        st.session_state.imported_file_id = uploaded_file_id
+        st.success(f"'{uploaded_file.name}' 파일의 내용으로 레시피를 성공적으로 불러왔습니다! ({len(st.session_state.input_df)}개 스텝)")
     except Exception as e:
-        st.error(f"엑셀 파일을 읽는 중 오류가 발생했습니다: {e}")
+        st.error(f"레시피 파일을 읽는 중 오류가 발생했습니다: {e}")
 
 if st.button("➕ 스텝 추가"):
     # 새로 추가할 행 생성
@@ -193,37 +175,23 @@ if st.button("➕ 스텝 추가"):
 # [FINAL FIX] 데이터 에디터 진입 전 '초강력' 타입 교정
 # 이 코드가 없으면 순서에 따라 'Object' 타입으로 오인식되어 에러가 납니다.
 # -------------------------------------------------------------
-# 1. 인덱스 초기화 (에디터 에러 방지용 필수)
-st.session_state.input_df.reset_index(drop=True, inplace=True)
-
-# 2. 문자열(Selectbox) 컬럼 강제 교정
-# NaN이나 None이 있으면 문자열로 처리되지 않아 Selectbox가 깨집니다.
-str_cols = {"모드": "Rest", "테스트": "-"}
-for col, default_val in str_cols.items():
-    if col in st.session_state.input_df.columns:
-        # 빈 값은 기본값으로 채우고, 무조건 문자열(str)로 변환
-        st.session_state.input_df[col] = st.session_state.input_df[col].fillna(default_val).astype(str)
-
-# 3. 숫자(Number) 컬럼 강제 교정
-# 데이터가 있든 없든 무조건 float64로 박제해야 합니다.
-numeric_cols = ["전압(V)", "전류(A)", "전력(W)", "시간 제한(H)"]
-for col in numeric_cols:
-    if col in st.session_state.input_df.columns:
-        # 1. 엉뚱한 문자나 공백 -> NaN 변환
-        st.session_state.input_df[col] = pd.to_numeric(st.session_state.input_df[col], errors='coerce')
-        # 2. 무조건 실수형(float64)으로 고정
-        st.session_state.input_df[col] = st.session_state.input_df[col].astype('float64')
+# 인덱스 초기화(에디터 에러 방지용 필수), 문자열(Selectbox) 열의 빈 값 채우기, 숫자 열 float64 고정
+# 표가 이미 이 형식이면(에디터에서 돌아온 표 등) 건너뜀
+if not is_normalized(st.session_state.input_df):
+    st.session_state.input_df = normalize_recipe_frame(st.session_state.input_df)
 # -------------------------------------------------------------
 
 edited_df = st.data_editor(
     st.session_state.input_df,
     column_config={
-        "모드": st.column_config.SelectboxColumn("모드", options=["Charge", "Discharge", "Rest"], required=True),
+        "모드": st.column_config.SelectboxColumn("모드", options=["Charge", "Discharge", "Rest", LOOP_MODE], required=True, help="Loop: '루프 시작 스텝'부터 바로 앞 스텝까지를 '루프 횟수'만큼 반복합니다 (중첩 가능)."),
         "테스트": st.column_config.SelectboxColumn("테스트 방식", options=["CC", "CP", "CCCV", "-"], required=True, help="CP모드는 전력(W) 필수, 전압(V)과 전류(A) 중 하나만 입력. CCCV는 아래 상세설정 필수."),
         "전압(V)": st.column_config.NumberColumn("전압 (V)", format="%.2f", step=0.01, help="CCCV모드에서는 CC구간의 평균전압을 입력하세요."),
         "전류(A)": st.column_config.NumberColumn("전류 (A)", format="%.2f", step=0.01, help="CCCV모드에서는 CC구간의 전류를 입력하세요."),
         "전력(W)": st.column_config.NumberColumn("전력 (W)", format="%.2f", step=0.01),
         "시간 제한(H)": st.column_config.NumberColumn("시간 제한 (H)", format="%.2f", step=0.1),
+        LOOP_START_COLUMN: st.column_config.NumberColumn("루프 시작 스텝", format="%d", step=1, min_value=1, help="Loop 행에서만 사용: 반복을 시작할 스텝 번호"),
+        LOOP_COUNT_COLUMN: st.column_config.NumberColumn("루프 횟수", format="%d", step=1, min_value=1, help="Loop 행에서만 사용: 구간을 실행할 총 횟수"),
     },
     hide_index=True,
     num_rows="dynamic",
@@ -310,191 +278,67 @@ with st.expander("💡 CP / CCCV 모드 상세 조건 설정 (고급)"):
 # </editor-fold>
 
 
+# --- 6-1. 장비 사양 자동 선택 ---
+# <editor-fold desc="장비 사양 자동 선택">
+def apply_equipment_spec_callback(spec):
+    """자동 선택 결과의 장비 사양을 적용하는 콜백 함수"""
+    st.session_state.equipment_spec = spec
+
+with st.expander("🤖 장비 사양 자동 선택"):
+    auto_select = st.checkbox("레시피 편집 중 실시간으로 모든 장비 사양 비교", key="auto_select_spec", help="13개 장비 사양 전체를 한 번에 계산해 순위를 매깁니다. 레시피나 사양이 바뀌면 자동으로 다시 계산합니다.")
+    ranking_key = st.selectbox("1순위 기준", options=list(RANKING_CRITERIA), format_func=lambda x: RANKING_CRITERIA[x], key="auto_select_criterion")
+    if auto_select and not edited_df.empty:
+        ranking_specs = CyclerSpecs.from_mapping(st.session_state)
+        ranking_key_tuple = (recipe_fingerprint(edited_df, st.session_state.cp_cccv_details, st.session_state.repetition_count, ranking_specs, exclude=('equipment_spec',)), ranking_key)
+        if st.session_state.get('spec_ranking_key') != ranking_key_tuple:
+            st.session_state.spec_ranking, st.session_state.spec_ranking_error = None, None
+            try:
+                find_loops(edited_df)
+                sort_by = (ranking_key,) + tuple(k for k in RANKING_CRITERIA if k != ranking_key)
+                st.session_state.spec_ranking = rank_equipment_specs(edited_df, ranking_specs, st.session_state.cp_cccv_details, st.session_state.repetition_count, sort_by=sort_by)
+            except Exception as e:
+                st.session_state.spec_ranking_error = str(e)
+            st.session_state.spec_ranking_key = ranking_key_tuple
+
+        if st.session_state.get('spec_ranking_error'): st.caption(f"레시피를 완성하면 순위가 표시됩니다. ({st.session_state.spec_ranking_error})")
+        spec_ranking = st.session_state.get('spec_ranking')
+        if spec_ranking is not None:
+            ranking_display = spec_ranking[['rank', 'equipment_spec', 'total_kwh', 'max_peak_power', 'demand_peak_power', 'load_ratio', 'exceeds_range']].rename(columns={
+                'rank': "순위", 'equipment_spec': "장비 사양", 'total_kwh': "총 전력량 (kWh)", 'max_peak_power': "최대 피크 (kW)",
+                'demand_peak_power': "수용률 적용 피크 (kW)", 'load_ratio': "최대 전류 부하율",
+                'exceeds_range': "전류 범위 초과"})
+            st.dataframe(ranking_display.style.format({"총 전력량 (kWh)": "{:.2f}", "최대 피크 (kW)": "{:.2f}", "수용률 적용 피크 (kW)": "{:.2f}", "최대 전류 부하율": "{:.1%}"}),
+                         use_container_width=True, hide_index=True)
+            exceeded = spec_ranking.loc[spec_ranking['exceeds_range'], 'equipment_spec'].tolist()
+            if exceeded: st.warning(f"레시피 최대 전류가 장비 최대 전류를 넘는 사양: {', '.join(exceeded)}")
+            best_spec = spec_ranking.iloc[0]['equipment_spec']
+            if best_spec != st.session_state.equipment_spec:
+                st.button(f"✅ 1순위 사양({best_spec}) 적용", on_click=apply_equipment_spec_callback, args=(best_spec,))
+# </editor-fold>
+
+
 # --- 7. 계산 로직 ---
 # <editor-fold desc="계산 로직">
 if st.button("⚙️ 레시피 계산 실행"):
     try:
-        is_valid = True
-        error_messages = []
-        for index, row in edited_df.iterrows():
-            if row['테스트'] == 'CP':
-                if not (pd.notna(row['전력(W)']) and row['전력(W)'] > 0):
-                    is_valid = False
-                    error_messages.append(f"➡️ {index + 1}번 스텝: CP 모드는 '전력(W)' 값을 필수로 입력해야 합니다.")
-                if index not in st.session_state.cp_cccv_details:
-                    v_filled = pd.notna(row['전압(V)']) and row['전압(V)'] > 0
-                    c_filled = pd.notna(row['전류(A)']) and row['전류(A)'] > 0
-                    if v_filled and c_filled:
-                        is_valid = False
-                        error_messages.append(f"➡️ {index+1}번 스텝(CP): 상세 설정이 없으면 '전압'과 '전류' 중 하나만 입력해야 합니다.")
-                    if not v_filled and not c_filled:
-                        is_valid = False
-                        error_messages.append(f"➡️ {index+1}번 스텝(CP): 상세 설정이 없으면 '전압' 또는 '전류' 중 하나를 입력해야 합니다.")
-            elif row['테스트'] == 'CCCV':
-                if not (pd.notna(row['전류(A)']) and row['전류(A)'] > 0):
-                    is_valid = False
-                    error_messages.append(f"➡️ {index + 1}번 스텝(CCCV): '전류(A)'(CC전류) 값을 필수로 입력해야 합니다.")
-                if index not in st.session_state.cp_cccv_details or not st.session_state.cp_cccv_details[index].get('cv_v') or not st.session_state.cp_cccv_details[index].get('cutoff_a'):
-                    is_valid = False
-                    error_messages.append(f"➡️ {index + 1}번 스텝(CCCV): 상세 설정에서 'CV 목표 전압'과 '종료 전류'를 반드시 입력해야 합니다.")
-        
-        if not is_valid:
-            for msg in sorted(list(set(error_messages))): st.error(msg)
+        error_messages = validate_recipe(edited_df, st.session_state.cp_cccv_details)
+        if error_messages:
+            for msg in error_messages: st.error(msg)
             st.stop()
 
-        repetition_count = st.session_state.repetition_count
-        input_df_for_calc = pd.concat([edited_df.copy()] * repetition_count, ignore_index=True)
-        calculated_df = input_df_for_calc
-        
-        calculated_columns = ["C-rate", "실제 테스트 시간(H)", "효율(%)", "전력(kW)", "전력량(kWh)", "누적 충전량(Ah)", "SoC(%)"]
-        for col in calculated_columns: calculated_df[col] = 0.0
-        
-        current_charge_ah = 0.0
-        specs = st.session_state
-        max_capacity_ah = specs.cell_capacity
-        
-        for index, row in calculated_df.iterrows():
-            original_index = index % len(edited_df)
-            mode = row['모드']
-            test_type = row['테스트']
-            
-            if mode == 'Rest':
-                time_limit = row['시간 제한(H)']
-                actual_time = time_limit if pd.notna(time_limit) else 0.0
-                total_power_w = specs.standby_power * required_equipment
-                total_power_kw = total_power_w / 1000.0
-                kwh = total_power_kw * actual_time
-                soc_val = (current_charge_ah / max_capacity_ah) * 100 if max_capacity_ah > 0 else 0
-                calculated_df.loc[index, ['실제 테스트 시간(H)', '전력(kW)', '전력량(kWh)', '누적 충전량(Ah)', 'SoC(%)']] = [actual_time, total_power_kw, kwh, current_charge_ah, soc_val]
-            
-            elif test_type == 'CCCV' and mode == 'Charge':
-                details = st.session_state.cp_cccv_details[original_index]
-                cc_current = row['전류(A)']
-                avg_v_cc = row['전압(V)'] if pd.notna(row['전압(V)']) else 3.8
-                cv_v = details['cv_v']
-                cutoff_a = details['cutoff_a']
-                transition_ratio = details['transition'] / 100.0
-                
-                chargeable_ah = max_capacity_ah - current_charge_ah
-                ah_for_cc = chargeable_ah * transition_ratio
-                ah_for_cv = chargeable_ah * (1 - transition_ratio)
-                
-                time_cc = ah_for_cc / cc_current if cc_current > 0 else 0
-                avg_current_cv = (cc_current + cutoff_a) / 2.0 if cc_current and cutoff_a else 0
-                time_cv = ah_for_cv / avg_current_cv if avg_current_cv > 0 else 0
-                
-                calculated_full_time = time_cc + time_cv
-                time_limit = row['시간 제한(H)']
-                actual_time = calculated_full_time
-                if pd.notna(time_limit) and time_limit > 0 and time_limit < calculated_full_time:
-                    actual_time = time_limit
-                
-                time_spent_in_cc, time_spent_in_cv = 0, 0
-                if actual_time <= time_cc:
-                    time_spent_in_cc = actual_time
-                    actual_charge_change = time_spent_in_cc * cc_current
-                else:
-                    time_spent_in_cc = time_cc
-                    time_spent_in_cv = actual_time - time_cc
-                    actual_charge_change = ah_for_cc + (time_spent_in_cv * avg_current_cv)
-                
-                eff_cc = get_efficiency(mode, avg_v_cc, cc_current, specs.equipment_spec, specs.cable_length, specs.cable_area)
-                p_out_cc = avg_v_cc * cc_current
-                p_in_cc = p_out_cc / eff_cc if eff_cc > 0 else 0
-                
-                eff_cv = get_efficiency(mode, cv_v, avg_current_cv, specs.equipment_spec, specs.cable_length, specs.cable_area)
-                p_out_cv = cv_v * avg_current_cv
-                p_in_cv = p_out_cv / eff_cv if eff_cv > 0 else 0
-                
-                total_energy_wh_in = (p_in_cc * time_spent_in_cc) + (p_in_cv * time_spent_in_cv)
-                avg_p_in_w = total_energy_wh_in / actual_time if actual_time > 0 else 0
-                
-                num_full = specs.test_channels // specs.control_channels
-                rem_ch = specs.test_channels % specs.control_channels
-                
-                p_full_total = num_full * ((avg_p_in_w * specs.control_channels) + specs.standby_power)
-                p_partial = (avg_p_in_w * rem_ch) + specs.standby_power if rem_ch > 0 else 0
-                
-                total_power_w = p_full_total + p_partial
-                total_power_kw = total_power_w / 1000.0
-                kwh = total_power_kw * actual_time
-                
-                current_charge_ah += actual_charge_change
-                current_charge_ah = np.clip(current_charge_ah, 0, max_capacity_ah)
-                soc_percent = (current_charge_ah / max_capacity_ah) * 100 if max_capacity_ah > 0 else 0
-                
-                calculated_df.loc[index, ['실제 테스트 시간(H)', '누적 충전량(Ah)', 'SoC(%)', '전력(kW)', '전력량(kWh)']] = [actual_time, current_charge_ah, soc_percent, total_power_kw, kwh]
-            
-            elif mode in ['Charge', 'Discharge']: # CC, CP 처리
-                voltage, current, power_w = row['전압(V)'], row['전류(A)'], row['전력(W)']
-                
-                if test_type == 'CC':
-                    current = abs(row['전류(A)']) if pd.notna(row['전류(A)']) else 0
-                elif test_type == 'CP':
-                    avg_v = None
-                    if original_index in st.session_state.cp_cccv_details:
-                        details = st.session_state.cp_cccv_details[original_index]
-                        start_v_in = details.get('start_v')
-                        end_v_in = details.get('end_v')
-                        start_v = start_v_in if (start_v_in is not None and start_v_in > 0) else (2.7 if mode == 'Charge' else 4.2)
-                        
-                        if end_v_in is not None and end_v_in > 0: avg_v = (start_v + end_v_in) / 2.0
-                        elif start_v_in is not None and start_v_in > 0: avg_v = start_v_in
-                    
-                    if avg_v is not None and avg_v > 0:
-                        voltage = avg_v
-                    elif pd.notna(row['전류(A)']) and row['전류(A)'] > 0:
-                        current = row['전류(A)']
-                        voltage = abs(power_w / current) if power_w > 0 else 0
-                    else:
-                        voltage = row['전압(V)']
-                        
-                    current = abs(power_w / voltage) if power_w > 0 and voltage > 0 else 0
-                    calculated_df.loc[index, ['전압(V)', '전류(A)']] = [voltage, current]
-                
-                charge_change = 0.0
-                if pd.notna(voltage) and pd.notna(current) and current > 0:
-                    efficiency = get_efficiency(mode, voltage, current, specs.equipment_spec, specs.cable_length, specs.cable_area)
-                    time_limit = row['시간 제한(H)']
-                    c_rate = current / specs.cell_capacity if specs.cell_capacity > 0 else 0
-                    c_rate_time = specs.cell_capacity / current if current > 0 else float('inf')
-                    
-                    if mode == 'Charge':
-                        soc_time_limit = (max_capacity_ah - current_charge_ah) / current if current > 0 else float('inf')
-                    else:
-                        soc_time_limit = current_charge_ah / current if current > 0 else float('inf')
-                    
-                    possible_times = [soc_time_limit, c_rate_time]
-                    if time_limit is not None and time_limit > 0: possible_times.append(time_limit)
-                    actual_time = min(possible_times)
-                    
-                    charge_change = actual_time * current
-                    current_charge_ah += charge_change if mode == 'Charge' else -charge_change
-                    current_charge_ah = np.clip(current_charge_ah, 0, max_capacity_ah)
-                    soc_percent = (current_charge_ah / max_capacity_ah) * 100 if max_capacity_ah > 0 else 0
-                    
-                    if mode == 'Charge':
-                        p_out_w = voltage * current
-                        p_in_w = p_out_w / efficiency if efficiency > 0 else 0
-                        num_full = specs.test_channels // specs.control_channels
-                        rem_ch = specs.test_channels % specs.control_channels
-                        
-                        p_full_total = num_full * ((p_in_w * specs.control_channels) + specs.standby_power)
-                        p_partial = (p_in_w * rem_ch) + specs.standby_power if rem_ch > 0 else 0
-                        
-                        total_power_kw = (p_full_total + p_partial) / 1000.0
-                    else: # Discharge
-                        p_rec_w = voltage * current * efficiency
-                        total_rec_w = p_rec_w * specs.test_channels
-                        total_standby_w = specs.standby_power * required_equipment
-                        total_power_w = total_standby_w - total_rec_w # 대기전력에서 회수전력 차감
-                        total_power_kw = total_power_w / 1000.0
-                    
-                    kwh = total_power_kw * actual_time
-                    calculated_df.loc[index, ['C-rate', '효율(%)', '실제 테스트 시간(H)', '누적 충전량(Ah)', 'SoC(%)', '전력(kW)', '전력량(kWh)']] = [c_rate, efficiency * 100.0, actual_time, current_charge_ah, soc_percent, total_power_kw, kwh]
-        
-        st.session_state.result_df = calculated_df
+        simulator = st.session_state.recipe_simulator
+        specs = CyclerSpecs.from_mapping(st.session_state)
+        # 같은 입력의 결과는 결과 그래프 페이지와 공용 캐시에서 가져옴
+        result_key = recipe_fingerprint(edited_df, st.session_state.cp_cccv_details, st.session_state.repetition_count, specs)
+        result, from_cache = get_result_cache().get_or_compute(
+            result_key, lambda: simulator.simulate(edited_df, specs, st.session_state.cp_cccv_details, st.session_state.repetition_count))
+        st.session_state.result_df = result.steps
+        st.session_state.first_run_df = result.first_run_steps()
+        st.session_state.steady_state_cycle = result.steady_state_cycle
+        st.session_state.power_timeline = PowerTimeline.from_result(result)
         st.success("레시피 계산이 완료되었습니다!")
+        if from_cache: st.caption("같은 조건으로 계산한 결과를 캐시에서 불러왔습니다.")
+        elif simulator.reused_steps: st.caption(f"변경되지 않은 앞부분 {simulator.reused_steps}개 스텝의 결과를 재사용했습니다.")
     except Exception as e:
         st.error(f"계산 중 오류가 발생했습니다: {e}")
 # </editor-fold>
@@ -506,45 +350,155 @@ st.markdown("---")
 st.subheader("레시피 상세 결과")
 
 if 'result_df' in st.session_state and not st.session_state.result_df.empty:
-    num_steps_single_cycle = len(edited_df)
-    display_df_table = st.session_state.result_df.head(num_steps_single_cycle)
+    # 레시피 행마다 처음 실행한 결과 (루프 행은 '-', 루프 안 스텝도 원래 스텝 번호로 표시)
+    display_df_table = st.session_state.first_run_df
     if st.session_state.repetition_count > 1:
         st.info(f"결과는 1회 반복 기준으로 표시됩니다. (총 {st.session_state.repetition_count}회 반복 계산됨)")
+        steady_state_cycle = st.session_state.get('steady_state_cycle')
+        if steady_state_cycle:
+            st.caption(f"{steady_state_cycle}회차부터 SoC 가 정상 상태에 도달하여 이후 반복은 {steady_state_cycle}회차 결과로 합산했습니다.")
         
-    columns_to_display = ["모드", "테스트", "전압(V)", "전류(A)", "전력(W)", "실제 테스트 시간(H)", "효율(%)", "전력(kW)", "전력량(kWh)", "누적 충전량(Ah)", "SoC(%)"]
+    columns_to_display = ["모드", "테스트", "전압(V)", "전류(A)", "전력(W)", "실제 테스트 시간(H)", "효율(%)", "전력(kW)", "전력량(kWh)", "누적 충전량(Ah)", "SoC(%)", RUN_COUNT_COLUMN]
     display_df_selected = display_df_table.reindex(columns=columns_to_display).fillna('-')
     st.dataframe(display_df_selected.rename(index=lambda x: x + 1), use_container_width=True)
     
     st.markdown("---")
     st.subheader("최종 결과 요약")
     
-    result_df = st.session_state.result_df
-    total_time = result_df['실제 테스트 시간(H)'].sum()
-    total_kwh = result_df['전력량(kWh)'].sum()
+    summary = summarize_steps(st.session_state.result_df)
+    total_time = summary['total_hours']
+    total_kwh = summary['total_kwh']
     
     col_summary1, col_summary2 = st.columns(2)
     with col_summary1: st.metric("총 테스트 시간 (H)", f"{total_time:.2f}")
     with col_summary2: st.metric("총 전력량 (kWh)", f"{total_kwh:.2f}")
     
     st.write("") 
-    max_peak_power = result_df[result_df['전력(kW)'] >= 0]['전력(kW)'].max()
-    if pd.isna(max_peak_power): max_peak_power = 0
+    max_peak_power = summary['max_peak_power']
+    demand_factor = summary['demand_factor']
+    demand_peak_power = summary['demand_peak_power']
     
-    total_charge_time = result_df[result_df['모드'] == 'Charge']['실제 테스트 시간(H)'].sum()
-    demand_factor = total_charge_time / total_time if total_time > 0 else 0
-    demand_peak_power = max_peak_power * demand_factor
-    
-    col_peak1, col_peak2 = st.columns(2)
+    power_timeline = st.session_state.get('power_timeline')
+    rolling_demand = demand_peak(power_timeline, st.session_state.recipe_demand_window_min / 60, st.session_state.recipe_demand_exclude_h) if power_timeline is not None else None
+
+    col_peak1, col_peak2, col_peak3 = st.columns(3)
     with col_peak1:
         st.metric("최대 피크 전력 (kW)", f"{max_peak_power:.2f}", help="레시피 전체에서 소비 전력이 가장 높은 순간의 값입니다 (회생 전력 제외).")
     with col_peak2:
         st.metric("수용률 적용 피크 전력 (kW)", f"{demand_peak_power:.2f}", help=f"최대 피크 전력에 수용률({demand_factor:.2%})을 적용한 값입니다. (수용률 = 총 충전 시간 / 총 테스트 시간)")
+    with col_peak3:
+        if rolling_demand is not None:
+            st.metric(f"최대 수요전력 ({st.session_state.recipe_demand_window_min:g}분 평균, kW)", f"{rolling_demand.demand_kw:.2f}",
+                      delta=f"{rolling_demand.start_h:.2f} ~ {rolling_demand.end_h:.2f} H", delta_color="off",
+                      help="전기요금 기본요금 기준인 이동 평균 전력의 최댓값입니다. 평균 시간과 제외 시간은 아래 '수요전력 조건'에서 바꿀 수 있습니다.")
+    with st.expander("⚙️ 수요전력 조건"):
+        col_d1, col_d2 = st.columns(2)
+        with col_d1: st.number_input("평균 시간 (분)", min_value=1.0, step=1.0, key='recipe_demand_window_min')
+        with col_d2: st.number_input("시작 후 제외 시간 (H)", min_value=0.0, step=0.5, key='recipe_demand_exclude_h', help="시험 시작 후 이 시간 안에서 시작하는 평균 구간은 제외합니다.")
+
+    if power_timeline is not None and len(power_timeline):
+        with st.expander("🔎 구간 전력 조회"):
+            st.caption("반복/루프를 모두 펼친 실행 순서 기준입니다. 구간 전력량은 누적합, 구간 최대 전력은 구간 최댓값 인덱스로 바로 조회합니다.")
+            col_w1, col_w2 = st.columns(2)
+            with col_w1: window_start = st.number_input("구간 시작 (H)", min_value=0.0, value=0.0, step=1.0, key='recipe_window_start')
+            with col_w2: window_end = st.number_input("구간 끝 (H)", min_value=0.0, value=power_timeline.end, step=1.0, key='recipe_window_end')
+            if window_end <= window_start:
+                st.warning("구간 끝은 구간 시작보다 커야 합니다.")
+            else:
+                window_peak_time, window_peak = power_timeline.peak_in_window(window_start, window_end)
+                col_q1, col_q2, col_q3 = st.columns(3)
+                with col_q1: st.metric("구간 전력량 (kWh)", f"{power_timeline.energy(window_start, window_end):,.2f}")
+                with col_q2: st.metric("구간 평균 전력 (kW)", f"{power_timeline.average_power(window_start, window_end):,.2f}")
+                with col_q3: st.metric("구간 최대 전력 (kW)", f"{window_peak:,.2f}", delta=f"{window_peak_time:.2f} H 시점", delta_color="off")
 
 else:
     st.info("아직 계산된 레시피 데이터가 없습니다.")
 # </editor-fold>
 
 
+# --- 8-1. 몬테카를로 분석 ---
+# <editor-fold desc="몬테카를로 분석">
+if 'result_df' in st.session_state and not st.session_state.result_df.empty:
+    with st.expander("🎲 몬테카를로 분석 (입력 불확실성 반영)"):
+        st.caption("입력값을 분포로 두고 표본마다 레시피 전체를 계산해 총 전력량과 최대 피크 전력의 P50/P90/P99 를 구합니다. 편차는 현재 입력값 대비 비율(%)입니다.")
+        mc_inputs = {'cell_capacity': "셀 용량", 'efficiency_scale': "효율 (배율)", 'cable_length': "배선 길이", 'standby_power': "대기전력"}
+        mc_distributions = {}
+        for name, label in mc_inputs.items():
+            col_kind, col_spread = st.columns(2)
+            with col_kind: kind = st.selectbox(f"{label} 분포", DISTRIBUTION_KINDS, key=f"mc_kind_{name}")
+            with col_spread: spread = st.number_input(f"{label} 편차 (%)", min_value=0.0, max_value=100.0, value=5.0, step=0.5, key=f"mc_spread_{name}")
+            if kind != 'fixed': mc_distributions[name] = InputDistribution(kind, spread / 100.0)
+
+        col_n, col_seed, col_pool = st.columns(3)
+        with col_n: mc_samples = st.number_input("표본 수", min_value=10, max_value=200000, value=2000, step=100, key="mc_samples")
+        with col_seed: mc_seed = st.number_input("난수 시드", min_value=0, value=0, step=1, key="mc_seed")
+        with col_pool: mc_use_pool = st.checkbox("프로세스 풀 사용", value=False, key="mc_use_pool", help="표본 수가 많을 때 CPU 코어를 나눠 계산합니다.")
+
+        if st.button("🎲 몬테카를로 실행"):
+            if not mc_distributions:
+                st.warning("분포를 지정한 입력이 없습니다. 하나 이상의 입력에 'fixed' 가 아닌 분포를 선택하세요.")
+            else:
+                with st.spinner(f"{int(mc_samples)}개 표본 계산 중..."):
+                    st.session_state.monte_carlo_result = run_monte_carlo(
+                        edited_df, CyclerSpecs.from_mapping(st.session_state), mc_distributions, int(mc_samples),
+                        st.session_state.cp_cccv_details, st.session_state.repetition_count, seed=int(mc_seed),
+                        workers=None if mc_use_pool else 1)
+
+        mc_result = st.session_state.get('monte_carlo_result')
+        if mc_result is not None:
+            mc_table = mc_result.percentiles().rename(index={'total_kwh': "총 전력량 (kWh)", 'max_peak_power': "최대 피크 전력 (kW)"})
+            st.dataframe(mc_table.style.format("{:.2f}"), use_container_width=True)
+            st.caption(f"표본 {len(mc_result.samples)}개 기준")
+# </editor-fold>
+
+
+# --- 8-2. 배선/장비 조합 스윕 ---
+# <editor-fold desc="조합 스윕">
+if 'result_df' in st.session_state and not st.session_state.result_df.empty:
+    with st.expander("🔀 배선/장비 조합 스윕 (조달 비교용)"):
+        st.caption("값은 콤마로 구분하거나 '시작:끝:간격' 범위로 입력합니다. 한 번 계산한 조합은 캐시되어, 범위를 넓히면 새 조합만 계산합니다.")
+        if 'sweep_cache' not in st.session_state: st.session_state.sweep_cache = SweepCache()
+        col_sw1, col_sw2 = st.columns(2)
+        with col_sw1:
+            sweep_area_text = st.text_input("배선 단면적 (SQ)", value="95, 120, 150, 185, 240", key="sweep_cable_area")
+            sweep_length_text = st.text_input("배선 길이 (M)", value="3:15:3", key="sweep_cable_length")
+        with col_sw2:
+            sweep_specs = st.multiselect("장비 사양", options=list(EQUIPMENT_SPECS), default=[st.session_state.equipment_spec], key="sweep_equipment_spec")
+            sweep_channels_text = st.text_input("컨트롤 채널 수 (CH)", value=str(st.session_state.control_channels), key="sweep_control_channels")
+        sweep_use_pool = st.checkbox("프로세스 풀 사용", value=True, key="sweep_use_pool", help="조합이 많을 때 CPU 코어를 나눠 계산합니다.")
+
+        if st.button("🔀 스윕 실행"):
+            try:
+                sweep_areas = parse_sweep_values(sweep_area_text)
+                sweep_lengths = parse_sweep_values(sweep_length_text)
+                sweep_channels = parse_sweep_values(sweep_channels_text, int)
+            except ValueError as e:
+                st.error(f"스윕 범위 입력을 확인해주세요: {e}")
+                st.stop()
+            if not (sweep_areas and sweep_lengths and sweep_specs and sweep_channels):
+                st.warning("모든 항목에 하나 이상의 값을 입력해주세요.")
+            else:
+                with st.spinner(f"{len(sweep_areas) * len(sweep_lengths) * len(sweep_specs) * len(sweep_channels)}개 조합 계산 중..."):
+                    st.session_state.sweep_result = run_sweep(
+                        edited_df, CyclerSpecs.from_mapping(st.session_state), sweep_areas, sweep_lengths, sweep_specs, sweep_channels,
+                        st.session_state.cp_cccv_details, st.session_state.repetition_count,
+                        cache=st.session_state.sweep_cache, workers=None if sweep_use_pool else 1)
+
+        sweep_result = st.session_state.get('sweep_result')
+        if sweep_result is not None and not sweep_result.table.empty:
+            st.caption(f"전체 {len(sweep_result.table)}개 조합 중 {sweep_result.computed_points}개를 새로 계산했습니다.")
+            col_hm1, col_hm2 = st.columns(2)
+            with col_hm1: hm_spec = st.selectbox("히트맵 장비 사양", options=list(dict.fromkeys(sweep_result.table['equipment_spec'])), key="sweep_hm_spec")
+            with col_hm2: hm_channels = st.selectbox("히트맵 컨트롤 채널 수", options=list(dict.fromkeys(sweep_result.table['control_channels'])), key="sweep_hm_channels")
+            for metric, label in (('total_kwh', "총 전력량 (kWh)"), ('max_peak_power', "최대 피크 전력 (kW)")):
+                st.markdown(f"**{label}** (행: 배선 단면적 SQ, 열: 배선 길이 M)")
+                heatmap = sweep_result.heatmap(metric, hm_spec, hm_channels)
+                st.dataframe(heatmap.style.background_gradient(cmap='YlOrRd', axis=None).format("{:.2f}"), use_container_width=True)
+            with st.expander("전체 조합 결과표"):
+                st.dataframe(sweep_result.table, use_container_width=True)
+# </editor-fold>
+
+
 # --- 9. 계산 결과 저장 ---
 st.markdown("---")
 st.subheader("💾 현재 레시피 및 결과 저장하기")
@@ -552,24 +506,18 @@ st.subheader("💾 현재 레시피 및 결과 저장하기")
 save_name_input = st.text_input("저장할 레시피 이름을 입력하세요", key="cycler_save_name_input")
 if st.button("현재 레시피 저장"):
     if save_name_input and not st.session_state.input_df.empty:
-        result_df = st.session_state.get('result_df', pd.DataFrame())
-        
-        total_kwh = result_df['전력량(kWh)'].sum() if not result_df.empty else 0
-        max_peak_power = result_df[result_df['전력(kW)'] >= 0]['전력(kW)'].max() if not result_df.empty else 0
-        total_hours = result_df['실제 테스트 시간(H)'].sum() if not result_df.empty else 0
-        if pd.isna(max_peak_power): max_peak_power = 0
-        
-        total_charge_time = result_df[result_df['모드'] == 'Charge']['실제 테스트 시간(H)'].sum()
-        demand_factor = total_charge_time / total_hours if total_hours > 0 else 0
-        demand_peak_power = max_peak_power * demand_factor
+        summary = summarize_steps(st.session_state.get('result_df', pd.DataFrame()))
+        saved_timeline = st.session_state.get('power_timeline')
+        saved_demand = demand_peak(saved_timeline, st.session_state.recipe_demand_window_min / 60, st.session_state.recipe_demand_exclude_h) if saved_timeline is not None else None
 
         data_to_save = {
             'recipe_table': st.session_state.input_df.copy().to_dict('records'),
             'cp_cccv_details': st.session_state.cp_cccv_details.copy(),
-            'total_kwh': total_kwh,
-            'max_peak_power': max_peak_power,
-            'total_hours': total_hours,
-            'demand_peak_power': demand_peak_power,
+            'total_kwh': summary['total_kwh'],
+            'max_peak_power': summary['max_peak_power'],
+            'total_hours': summary['total_hours'],
+            'demand_peak_power': summary['demand_peak_power'],
+            'rolling_demand_peak_power': saved_demand.demand_kw if saved_demand is not None else None,
         }
         for key in DEFAULT_SPECS:
             data_to_save[key] = st.session_state[key]
@@ -582,6 +530,56 @@ if st.button("현재 레시피 저장"):
     else:
         st.warning("저장할 레시피 이름을 입력해주세요.")
 
+# --- 9-1. 레시피 일괄 가져오기 ---
+# <editor-fold desc="레시피 일괄 가져오기">
+with st.expander("📚 레시피 일괄 가져오기 (여러 파일 / 여러 시트 / 폴더)"):
+    st.caption("엑셀은 시트마다, CSV/Parquet 는 파일마다 레시피 하나로 읽어 위에서 입력한 현재 장비 사양과 반복 횟수로 모두 계산한 뒤 저장된 레시피에 등록합니다. "
+               "CP/CCCV 상세 설정은 I ~ M 열(I:CV 전압, J:종료 전류, K:CV 전환(%), L:CP 시작 전압, M:CP 종료 전압)에서 읽습니다. "
+               "CCCV 스텝에 CV 전압/종료 전류가 없는 레시피는 건너뛰므로 계산기에서 직접 불러와 상세 설정을 입력해주세요.")
+    batch_files = st.file_uploader("레시피 파일 (여러 개 선택 가능)", type=RECIPE_FILE_TYPES, accept_multiple_files=True, key="batch_import_files")
+    batch_folder = st.text_input("또는 서버 폴더 경로 (하위 폴더 포함)", key="batch_import_folder", help="앱이 실행 중인 컴퓨터의 폴더입니다. 레시피 이름은 폴더 기준 상대 경로가 됩니다.")
+    col_b1, col_b2 = st.columns(2)
+    with col_b1: batch_overwrite = st.checkbox("같은 이름의 저장된 레시피 덮어쓰기", key="batch_import_overwrite")
+    with col_b2: batch_use_pool = st.checkbox("프로세스 풀 병렬 계산", value=True, key="batch_import_pool")
+
+    if st.button("📥 일괄 가져오기 및 계산"):
+        sources = list(batch_files or [])
+        if batch_folder:
+            if os.path.isdir(batch_folder): sources.append(batch_folder)
+            else: st.error(f"폴더를 찾을 수 없습니다: {batch_folder}")
+        if not sources:
+            st.warning("가져올 파일이나 폴더를 선택해주세요.")
+        else:
+            with st.spinner("레시피 파일 읽는 중..."):
+                batch_recipes = read_recipe_library(sources)
+            batch_settings = {key: st.session_state[key] for key in DEFAULT_SPECS}
+            progress_bar = st.progress(0.0, text="레시피 계산 중...")
+            calculate_recipes(batch_recipes, CyclerSpecs.from_mapping(batch_settings), st.session_state.repetition_count,
+                              workers=None if batch_use_pool else 1,
+                              progress=lambda done, total: progress_bar.progress(done / total, text=f"레시피 계산 중... ({done}/{total})"))
+            progress_bar.empty()
+
+            registered, skipped = 0, sum(recipe.skipped is not None for recipe in batch_recipes)
+            for recipe in batch_recipes:
+                if not recipe.ok: continue
+                if recipe.name in st.session_state.saved_recipes and not batch_overwrite:
+                    recipe.skipped = "같은 이름의 저장된 레시피가 있어 건너뛰었습니다."
+                    skipped += 1
+                    continue
+                st.session_state.saved_recipes[recipe.name] = recipe.saved_record(batch_settings)
+                registered += 1
+            st.session_state.batch_import_table = batch_table(batch_recipes)
+            failed = len(batch_recipes) - registered - skipped
+            st.success(f"{len(batch_recipes)}개 레시피 중 {registered}개를 저장된 레시피에 등록했습니다. (건너뜀 {skipped}개, 오류 {failed}개)")
+
+    if st.session_state.get('batch_import_table') is not None and not st.session_state.batch_import_table.empty:
+        st.dataframe(st.session_state.batch_import_table.rename(columns={
+            'name': "레시피", 'ok': "계산 성공", 'steps': "스텝 수", 'details': "상세 설정 수", 'total_kwh': "총 전력량 (kWh)", 'max_peak_power': "최대 피크 (kW)",
+            'total_hours': "총 시간 (H)", 'demand_peak_power': "수용률 적용 피크 (kW)",
+            'rolling_demand_peak_power': "최대 수요전력 (kW)", 'skipped': "건너뜀", 'errors': "오류"}),
+            use_container_width=True, hide_index=True)
+# </editor-fold>
+
 # --- [비상용] 데이터 꼬임 방지용 초기화 버튼 ---
 st.markdown("---")
 if st.button("🚨 에러 해결용 데이터 강제 초기화 (누르면 새로고침 됨)"):
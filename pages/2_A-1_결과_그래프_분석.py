@@ -1,11 +1,16 @@
 import streamlit as st
 import matplotlib.pyplot as plt
 import matplotlib.font_manager as fm
-import numpy as np
 import pandas as pd
-import math
-from bisect import bisect_right
-from scipy.interpolate import griddata
+import io
+
+from powercalc.demand import DEFAULT_DEMAND_WINDOW_H, demand_peak, top_demand_intervals
+from powercalc.fleet import OFFSET_DISTRIBUTIONS, StartOffsetDistribution, cached_simulate_fleet, fleet_resolution, unit_channel_counts
+from powercalc.power_timeline import PowerTimeline
+from powercalc.power_trace import (TRACE_RESOLUTIONS, cached_trace_summary, decimate_plot_coords, iter_power_trace, merge_step_curves,
+                                   plot_buckets, step_curve, step_plot_coords, sum_power_traces, write_power_trace_csv)
+from powercalc.result_cache import cached_simulate_recipe, recipe_fingerprint
+from powercalc.stagger import STAGGER_OBJECTIVES, optimize_start_offsets
 
 # --- 0. 기본 설정 및 한글 폰트 ---
 st.set_page_config(layout="wide")
@@ -28,194 +33,8 @@ except Exception:
 plt.rc('axes', unicode_minus=False)
 
 
-# --- 1. 효율 데이터 테이블 및 계산 함수 정의 (계산기와 동일) ---
-#<editor-fold desc="효율 계산 함수">
-COPPER_RESISTIVITY = 1.72e-8
-charge_currents = np.array([10, 20, 30, 40, 50, 60, 70, 80, 90, 100, 110, 120, 130, 140, 150, 160, 170, 180, 190, 200, 210, 220, 230, 240, 250, 260, 270, 280, 290, 300])
-charge_voltages = np.array([3.3, 4.2, 5.0])
-charge_eff_3_3V = np.array([48.62, 63.88, 71.01, 75.43, 78.54, 80.64, 81.90, 82.71, 83.32, 83.78, 84.07, 84.25, 84.25, 84.09, 83.95, 83.75, 83.63, 83.48, 83.33, 83.11, 82.81, 82.49, 82.17, 81.83, 81.51, 81.16, 80.78, 80.38, 79.99, 79.56]) / 100.0
-charge_eff_4_2V = np.array([49.46, 64.42, 72.12, 76.76, 79.58, 81.46, 82.81, 83.85, 84.56, 84.90, 85.15, 85.37, 85.44, 85.49, 85.38, 85.25, 85.15, 85.02, 84.89, 84.71, 84.50, 84.28, 83.99, 83.70, 83.40, 83.09, 82.76, 82.42, 82.06, 81.68]) / 100.0
-charge_eff_5_0V = np.array([53.24, 67.85, 75.24, 79.30, 81.82, 83.63, 84.88, 85.71, 86.15, 86.55, 86.82, 87.01, 86.99, 86.95, 86.83, 86.75, 86.68, 86.56, 86.36, 86.18, 85.94, 85.73, 85.48, 85.22, 84.94, 84.64, 84.32, 84.00, 83.65, 83.31]) / 100.0
-discharge_currents = np.array([10, 20, 30, 40, 50, 60, 70, 80, 90, 100, 110, 120, 130, 140, 150, 160, 170, 180, 190, 200, 210, 220, 230, 240, 250, 260, 270, 280, 290, 300])
-discharge_voltages = np.array([3.3, 4.2, 5.0])
-discharge_eff_3_3V = np.array([-16.20, 39.95, 56.71, 65.99, 70.81, 74.11, 76.21, 77.63, 78.69, 79.58, 80.14, 80.52, 80.77, 80.78, 80.75, 80.58, 80.47, 79.42, 79.99, 79.68, 79.31, 78.93, 78.55, 78.13, 77.62, 77.10, 76.61, 76.05, 75.40, 74.87]) / 100.0
-discharge_eff_4_2V = np.array([-6.35, 45.02, 61.23, 70.32, 74.83, 77.77, 79.81, 81.19, 82.18, 82.85, 83.29, 83.56, 83.63, 83.72, 83.75, 83.70, 83.56, 83.37, 83.16, 82.83, 82.59, 82.28, 81.93, 81.57, 81.17, 80.76, 80.33, 79.83, 79.36, 78.88]) / 100.0
-discharge_eff_5_0V = np.array([9.00, 51.99, 65.99, 74.24, 78.26, 80.71, 82.37, 83.62, 84.36, 84.89, 85.24, 85.44, 85.63, 85.71, 85.66, 85.60, 85.46, 85.27, 85.06, 84.83, 84.58, 84.27, 83.99, 83.65, 83.29, 82.92, 82.53, 82.10, 81.66, 81.23]) / 100.0
-
-def structure_data_for_interpolation(currents, voltages, eff_data_list):
-    points, values = [], []
-    for i, current in enumerate(currents):
-        for j, voltage in enumerate(voltages):
-            points.append([current, voltage])
-            values.append(eff_data_list[j][i])
-    return np.array(points), np.array(values)
-
-charge_points, charge_values = structure_data_for_interpolation(charge_currents, charge_voltages, [charge_eff_3_3V, charge_eff_4_2V, charge_eff_5_0V])
-discharge_points, discharge_values = structure_data_for_interpolation(discharge_currents, discharge_voltages, [discharge_eff_3_3V, discharge_eff_4_2V, discharge_eff_5_0V])
-
-def calculate_cable_resistance(length_m, area_sqmm):
-    if area_sqmm <= 0: return 0
-    area_m2 = area_sqmm * 1e-6
-    return COPPER_RESISTIVITY * (length_m * 2) / area_m2
-
-def get_efficiency(mode, voltage, current, equipment_spec, cable_length_m, cable_area_sqmm):
-    current = abs(current)
-    try:
-        max_current_str = equipment_spec.split('-')[1].strip().replace('A', '')
-        max_current = int(max_current_str)
-        scaling_factor = max_current / 300.0
-    except (IndexError, ValueError):
-        scaling_factor = 1.0
-    
-    equivalent_current = current / scaling_factor if scaling_factor > 0 else 0
-    voltage_clipped = np.clip(voltage, 3.3, 5.0)
-    current_clipped = np.clip(equivalent_current, 10, 300)
-
-    if mode == 'Charge': points, values = charge_points, charge_values
-    elif mode == 'Discharge': points, values = discharge_points, discharge_values
-    else: return 1.0
-
-    eta_table = griddata(points, values, (current_clipped, voltage_clipped), method='linear')
-    if np.isnan(eta_table):
-        eta_table = griddata(points, values, (current_clipped, voltage_clipped), method='nearest')
-
-    R_3m_150sq = calculate_cable_resistance(3.0, 150.0)
-    R_new = calculate_cable_resistance(cable_length_m, cable_area_sqmm)
-
-    eta_adjusted = eta_table
-    if voltage > 0 and current > 0 :
-        if mode == 'Charge':
-            eta_pure = eta_table * (1 + (equivalent_current * R_3m_150sq) / voltage)
-            eta_adjusted = eta_pure / (1 + (current * R_new) / voltage)
-        else: # Discharge
-            denominator = 1 - (equivalent_current * R_3m_150sq) / voltage
-            if denominator <= 0: return -1.0
-            eta_pure = eta_table / denominator
-            eta_adjusted = eta_pure * (1 - (current * R_new) / voltage)
-    
-    if mode == 'Charge': return np.clip(eta_adjusted, 0, 1.0)
-    else: return np.clip(eta_adjusted, -np.inf, 1.0)
-#</editor-fold>
-
-# --- 2. 계산 함수 (최신 로직으로 업데이트) ---
-def calculate_power_profile(input_df, specs):
-    calculated_df = input_df.copy()
-    
-    cell_capacity = specs.get('cell_capacity', 211.1)
-    equipment_spec = specs.get('equipment_spec', '60A - 300A')
-    control_channels = specs.get('control_channels', 16)
-    standby_power = specs.get('standby_power', 1572.0)
-    test_channels = specs.get('test_channels', 800)
-    cable_length = specs.get('cable_length', 3.0)
-    cable_area = specs.get('cable_area', 150.0)
-    cp_cccv_details = {int(k): v for k, v in specs.get('cp_cccv_details', {}).items()}
-    
-    required_equipment = math.ceil(test_channels / control_channels) if control_channels > 0 else 0
-    max_capacity_ah = cell_capacity
-    current_charge_ah = 0.0
-    
-    calculated_columns = ["C-rate", "실제 테스트 시간(H)", "효율(%)", "전력(kW)", "전력량(kWh)", "누적 충전량(Ah)", "SoC(%)"]
-    for col in calculated_columns: calculated_df[col] = 0.0
-
-    for index, row in calculated_df.iterrows():
-        original_index = index % len(input_df) if len(input_df) > 0 else 0
-        mode = row['모드']; test_type = row['테스트']
-
-        if mode == 'Rest':
-            time_limit = row['시간 제한(H)']; actual_time = time_limit if pd.notna(time_limit) else 0.0
-            total_power_w = standby_power * required_equipment; total_power_kw = total_power_w / 1000.0
-            kwh = total_power_kw * actual_time
-            soc_val = (current_charge_ah / max_capacity_ah) * 100 if max_capacity_ah > 0 else 0
-            calculated_df.loc[index, ['실제 테스트 시간(H)', '전력(kW)', '전력량(kWh)', '누적 충전량(Ah)', 'SoC(%)']] = [actual_time, total_power_kw, kwh, current_charge_ah, soc_val]
-
-        elif test_type == 'CCCV' and mode == 'Charge':
-            details = cp_cccv_details.get(original_index, {})
-            if not details: continue
-            cc_current = row['전류(A)']; avg_v_cc = row['전압(V)'] if pd.notna(row['전압(V)']) else 3.8
-            cv_v = details.get('cv_v'); cutoff_a = details.get('cutoff_a'); transition_ratio = details.get('transition', 80.0) / 100.0
-            chargeable_ah = max_capacity_ah - current_charge_ah
-            ah_for_cc = chargeable_ah * transition_ratio; ah_for_cv = chargeable_ah * (1 - transition_ratio)
-            time_cc = ah_for_cc / cc_current if cc_current > 0 else 0
-            avg_current_cv = (cc_current + cutoff_a) / 2.0 if cc_current and cutoff_a else 0
-            time_cv = ah_for_cv / avg_current_cv if avg_current_cv > 0 else 0
-            calculated_full_time = time_cc + time_cv
-            time_limit = row['시간 제한(H)']
-            actual_time = calculated_full_time
-            if pd.notna(time_limit) and time_limit > 0 and time_limit < calculated_full_time: actual_time = time_limit
-            time_spent_in_cc, time_spent_in_cv = 0, 0
-            if actual_time <= time_cc:
-                time_spent_in_cc = actual_time
-                actual_charge_change = time_spent_in_cc * cc_current
-            else:
-                time_spent_in_cc = time_cc; time_spent_in_cv = actual_time - time_cc
-                actual_charge_change = ah_for_cc + (time_spent_in_cv * avg_current_cv)
-            eff_cc = get_efficiency(mode, avg_v_cc, cc_current, equipment_spec, cable_length, cable_area)
-            p_out_cc = avg_v_cc * cc_current; p_in_cc = p_out_cc / eff_cc if eff_cc > 0 else 0
-            eff_cv = get_efficiency(mode, cv_v, avg_current_cv, equipment_spec, cable_length, cable_area)
-            p_out_cv = cv_v * avg_current_cv; p_in_cv = p_out_cv / eff_cv if eff_cv > 0 else 0
-            total_energy_wh_in = (p_in_cc * time_spent_in_cc) + (p_in_cv * time_spent_in_cv)
-            avg_p_in_w = total_energy_wh_in / actual_time if actual_time > 0 else 0
-            num_full = test_channels // control_channels; rem_ch = test_channels % control_channels
-            p_full_total = num_full * ((avg_p_in_w * control_channels) + standby_power)
-            p_partial = (avg_p_in_w * rem_ch) + standby_power if rem_ch > 0 else 0
-            total_power_w = p_full_total + p_partial; total_power_kw = total_power_w / 1000.0
-            kwh = total_power_kw * actual_time
-            current_charge_ah += actual_charge_change
-            current_charge_ah = np.clip(current_charge_ah, 0, max_capacity_ah)
-            soc_percent = (current_charge_ah / max_capacity_ah) * 100 if max_capacity_ah > 0 else 0
-            calculated_df.loc[index, ['실제 테스트 시간(H)', '누적 충전량(Ah)', 'SoC(%)', '전력(kW)', '전력량(kWh)']] = [actual_time, current_charge_ah, soc_percent, total_power_kw, kwh]
-        elif mode in ['Charge', 'Discharge']:
-            voltage, current, power_w = row['전압(V)'], row['전류(A)'], row['전력(W)']
-            if test_type == 'CC': current = abs(row['전류(A)']) if pd.notna(row['전류(A)']) else 0
-            elif test_type == 'CP':
-                avg_v = None
-                details = cp_cccv_details.get(original_index)
-                if details:
-                    start_v_in = details.get('start_v'); end_v_in = details.get('end_v')
-                    start_v = start_v_in if (start_v_in is not None and start_v_in > 0) else (2.7 if mode == 'Charge' else 4.2)
-                    if end_v_in is not None and end_v_in > 0: avg_v = (start_v + end_v_in) / 2.0
-                    elif start_v_in is not None and start_v_in > 0: avg_v = start_v_in
-                if avg_v is not None and avg_v > 0: voltage = avg_v
-                elif pd.notna(row['전류(A)']) and row['전류(A)'] > 0: current = row['전류(A)']; voltage = abs(power_w / current) if power_w > 0 else 0
-                else: voltage = row['전압(V)']
-                current = abs(power_w / voltage) if power_w > 0 and voltage > 0 else 0
-                calculated_df.loc[index, ['전압(V)', '전류(A)']] = [voltage, current]
-            charge_change = 0.0
-            if pd.notna(voltage) and pd.notna(current) and current > 0:
-                efficiency = get_efficiency(mode, voltage, current, equipment_spec, cable_length, cable_area)
-                time_limit = row['시간 제한(H)']; c_rate = current / cell_capacity if cell_capacity > 0 else 0
-                c_rate_time = cell_capacity / current if current > 0 else float('inf')
-                if mode == 'Charge': soc_time_limit = (max_capacity_ah - current_charge_ah) / current if current > 0 else float('inf')
-                else: soc_time_limit = current_charge_ah / current if current > 0 else float('inf')
-                possible_times = [soc_time_limit, c_rate_time]
-                if time_limit is not None and time_limit > 0: possible_times.append(time_limit)
-                actual_time = min(possible_times)
-                charge_change = actual_time * current
-                current_charge_ah += charge_change if mode == 'Charge' else -charge_change
-                current_charge_ah = np.clip(current_charge_ah, 0, max_capacity_ah)
-                soc_percent = (current_charge_ah / max_capacity_ah) * 100 if max_capacity_ah > 0 else 0
-                if mode == 'Charge':
-                    p_out_w = voltage * current; p_in_w = p_out_w / efficiency if efficiency > 0 else 0
-                    num_full = test_channels // control_channels; rem_ch = test_channels % control_channels
-                    p_full_total = num_full * ((p_in_w * control_channels) + standby_power)
-                    p_partial = (p_in_w * rem_ch) + standby_power if rem_ch > 0 else 0
-                    total_power_kw = (p_full_total + p_partial) / 1000.0
-                else:
-                    p_rec_w = voltage * current * efficiency
-                    total_rec_w = p_rec_w * test_channels
-                    total_standby_w = standby_power * required_equipment
-                    total_power_w = total_standby_w - total_rec_w
-                    total_power_kw = total_power_w / 1000.0
-                kwh = total_power_kw * actual_time
-                calculated_df.loc[index, ['C-rate', '효율(%)', '실제 테스트 시간(H)', '누적 충전량(Ah)', 'SoC(%)', '전력(kW)', '전력량(kWh)']] = \
-                    [c_rate, efficiency * 100.0, actual_time, current_charge_ah, soc_percent, total_power_kw, kwh]
-    return calculated_df
-
-def get_power_at_time(t, time_data, power_data):
-    idx = bisect_right(time_data, t)
-    if idx == 0:
-        return power_data[0] if power_data else 0
-    return power_data[idx - 1]
+# --- 1. 계산 함수 ---
+# 레시피 계산은 계산기 페이지와 같은 powercalc.recipe_engine 을 사용하며, 결과는 프로세스 공용 캐시(powercalc.result_cache)에서 공유합니다.
 
 # --- 3. 메인 앱 UI ---
 st.title("📊 저장된 레시피 비교 분석")
@@ -230,6 +49,14 @@ else:
     )
     
     repetition_counts = {}
+    st.sidebar.header("최대 수요전력 옵션")
+    demand_window_min = st.sidebar.number_input("수요전력 평균 시간 (분)", min_value=1.0, value=DEFAULT_DEMAND_WINDOW_H * 60, step=1.0, key='demand_window_min',
+                                                help="전기요금 기본요금은 이 시간 동안의 평균 전력 중 최댓값(최대 수요전력)으로 정해집니다.")
+    demand_exclude_h = st.sidebar.number_input("시작 후 제외 시간 (H)", min_value=0.0, value=0.0, step=0.5, key='demand_exclude_h',
+                                               help="시험 시작 후 이 시간 안에서 시작하는 평균 구간은 제외합니다 (초기 기동 구간 등).")
+    demand_top_n = st.sidebar.number_input("상위 수요전력 구간 수", min_value=1, max_value=50, value=5, step=1, key='demand_top_n')
+    demand_window_h = demand_window_min / 60
+
     if selected_recipe_names:
         st.sidebar.header("개별 반복 횟수 설정")
         for name in selected_recipe_names:
@@ -240,9 +67,12 @@ else:
 
     if selected_recipe_names:
         fig, ax = plt.subplots(figsize=(16, 8))
-        all_recipe_coords = []
-        all_time_points = {0.0}
+        # 그래프에는 가로 픽셀마다 최소/최대 점만 그림 (반복 횟수가 많아도 피크는 그대로)
+        buckets = plot_buckets(fig)
+        all_step_curves = []
         individual_peaks = {}
+        recipe_results = {}
+        recipe_keys = {}  # 레시피 결과 지문 (플릿/시차 최적화 결과 캐시 키)
         max_total_time = 0
 
         for name in selected_recipe_names:
@@ -256,64 +86,35 @@ else:
                 recipe_df = pd.DataFrame() 
             
             if not recipe_df.empty:
-                recipe_to_calc = pd.concat([recipe_df.copy()] * individual_repetition_count, ignore_index=True)
-                result_df = calculate_power_profile(recipe_to_calc, saved_data)
-                
-                time_points, power_values = [], []
-                current_time = 0.0
-                
-                for _, row in result_df.iterrows():
-                    step_time = row['실제 테스트 시간(H)']
-                    step_power = row['전력(kW)']
-                    
-                    if step_time > 0:
-                        last_power = power_values[-1] if power_values else step_power
-                        time_points.append(current_time)
-                        power_values.append(last_power)
-
-                        time_points.append(current_time)
-                        power_values.append(step_power)
-                        
-                        current_time += step_time
-                        
-                        time_points.append(current_time)
-                        power_values.append(step_power)
-
-                        all_time_points.add(current_time)
-                
-                if not time_points:
-                    time_points = [0]
-                    power_values = [0]
+                result = cached_simulate_recipe(recipe_df, saved_data, saved_data.get('cp_cccv_details', {}), individual_repetition_count)
+                recipe_results[name] = result
+                recipe_keys[name] = recipe_fingerprint(recipe_df, saved_data.get('cp_cccv_details', {}), individual_repetition_count, saved_data)
+                starts, ends, powers = step_curve(result)
+                all_step_curves.append((starts, ends, powers))
+                time_points, power_values = step_plot_coords(starts, ends, powers)
 
-                max_total_time = max(max_total_time, current_time)
-                individual_peaks[name] = max((p for p in power_values if p >= 0), default=0)
-                all_recipe_coords.append({'name': name, 'times': time_points, 'powers': power_values})
-                ax.plot(time_points, power_values, linestyle='--', alpha=0.4, label=f"{name} ({individual_repetition_count}회 반복)")
-
-        if all_recipe_coords:
-            unified_timeline = sorted(list(all_time_points))
-            
-            power_combined = []
-            for t in unified_timeline:
-                current_total_power = sum(get_power_at_time(t, recipe['times'], recipe['powers']) for recipe in all_recipe_coords)
-                power_combined.append(current_total_power)
+                max_total_time = max(max_total_time, ends[-1] if len(ends) else 0.0)
+                individual_peaks[name] = max(PowerTimeline.from_step_curve(starts, ends, powers).max_value, 0.0)
+                ax.plot(*decimate_plot_coords(time_points, power_values, buckets), linestyle='--', alpha=0.4, label=f"{name} ({individual_repetition_count}회 반복)")
 
-            ax.step(unified_timeline, power_combined, where='post', linestyle='-', color='black', linewidth=2.5, label='종합 전력')
+        if all_step_curves:
+            # 모든 레시피의 전력 변화량을 시각 순으로 정렬해 누적합으로 종합 전력 계단 함수를 만듦
+            unified_timeline, power_combined = merge_step_curves(all_step_curves)
 
-            if power_combined:
-                peak_power_after_5h, peak_time_after_5h = -float('inf'), 0
-                for t, p in zip(unified_timeline, power_combined):
-                    if t > 5.0 and p >= 0 and p > peak_power_after_5h:
-                        peak_power_after_5h, peak_time_after_5h = p, t
-                
-                if peak_time_after_5h > 0:
-                    ax.plot(peak_time_after_5h, peak_power_after_5h, 'ro', markersize=8)
-                    annotation_text = f'최대 피크 (5H 이후)\n시간: {peak_time_after_5h:.2f}H\n전력: {peak_power_after_5h:.2f}kW'
-                    ax.annotate(annotation_text, xy=(peak_time_after_5h, peak_power_after_5h),
-                                xytext=(peak_time_after_5h + (max_total_time * 0.05 if max_total_time > 0 else 1), peak_power_after_5h),
-                                fontsize=12, ha='left', va='center',
-                                bbox=dict(boxstyle='round,pad=0.5', fc='yellow', alpha=0.7),
-                                arrowprops=dict(facecolor='red', shrink=0.05, width=2))
+            # 종합 전력 인덱스: 피크/구간 조회를 이분 탐색으로 처리
+            combined_timeline = PowerTimeline(unified_timeline, power_combined)
+            combined_coords = step_plot_coords(combined_timeline.times, combined_timeline.ends, combined_timeline.values)
+            ax.plot(*decimate_plot_coords(*combined_coords, buckets), linestyle='-', color='black', linewidth=2.5, label='종합 전력')
+            combined_demand = demand_peak(combined_timeline, demand_window_h, demand_exclude_h)
+            if combined_demand is not None and combined_demand.demand_kw > 0:
+                ax.axvspan(combined_demand.start_h, combined_demand.end_h, color='red', alpha=0.25)
+                ax.plot(combined_demand.end_h, combined_demand.demand_kw, 'ro', markersize=8)
+                annotation_text = f'최대 수요전력 ({demand_window_min:g}분 평균)\n구간: {combined_demand.start_h:.2f} ~ {combined_demand.end_h:.2f}H\n전력: {combined_demand.demand_kw:.2f}kW'
+                ax.annotate(annotation_text, xy=(combined_demand.end_h, combined_demand.demand_kw),
+                            xytext=(combined_demand.end_h + (max_total_time * 0.05 if max_total_time > 0 else 1), combined_demand.demand_kw),
+                            fontsize=12, ha='left', va='center',
+                            bbox=dict(boxstyle='round,pad=0.5', fc='yellow', alpha=0.7),
+                            arrowprops=dict(facecolor='red', shrink=0.05, width=2))
             
             ax.set_title(f'저장된 레시피 비교 및 종합 전력 분석', fontsize=18)
             ax.set_xlabel('총 경과 시간 (H)'); ax.set_ylabel('전력 (kW)')
@@ -331,14 +132,145 @@ else:
                     st.metric(label=f"'{name}' 최대 피크", value=f"{peak:.2f} kW")
                 i += 1
 
-            if power_combined:
+            if len(combined_timeline):
                 st.markdown("---")
                 st.subheader("종합 전력 분석 결과")
-                overall_peak_power = max((p for p in power_combined if p >= 0), default=0)
+                overall_peak_power = max(combined_timeline.max_value, 0.0)
                 col1, col2 = st.columns(2)
                 with col1:
-                    st.metric("전체 기간 최대 피크 (kW)", f"{overall_peak_power:.2f}")
+                    st.metric("전체 기간 최대 피크 (kW)", f"{overall_peak_power:.2f}", help="순간 최대 전력입니다.")
                 with col2:
-                    if peak_time_after_5h > 0:
-                        st.metric("최대 피크 (5H 이후)", f"{peak_power_after_5h:.2f} kW", delta=f"{peak_time_after_5h:.2f} H 시점")
+                    if combined_demand is not None:
+                        st.metric(f"최대 수요전력 ({demand_window_min:g}분 평균)", f"{combined_demand.demand_kw:.2f} kW",
+                                  delta=f"{combined_demand.start_h:.2f} ~ {combined_demand.end_h:.2f} H", delta_color="off")
+
+                top_intervals = top_demand_intervals(combined_timeline, int(demand_top_n), demand_window_h, demand_exclude_h)
+                if top_intervals:
+                    st.markdown(f"**{demand_window_min:g}분 평균 전력 상위 {len(top_intervals)}개 구간** (서로 겹치지 않는 구간)")
+                    st.dataframe(pd.DataFrame([{"순위": rank, "시작 (H)": interval.start_h, "끝 (H)": interval.end_h, "평균 전력 (kW)": interval.demand_kw}
+                                               for rank, interval in enumerate(top_intervals, start=1)]).style.format(precision=2),
+                                 use_container_width=True, hide_index=True)
+
+                with st.expander("🔎 종합 전력 구간 조회"):
+                    col_w1, col_w2 = st.columns(2)
+                    with col_w1: window_start = st.number_input("구간 시작 (H)", min_value=0.0, value=0.0, step=1.0, key='combined_window_start')
+                    with col_w2: window_end = st.number_input("구간 끝 (H)", min_value=0.0, value=combined_timeline.end, step=1.0, key='combined_window_end')
+                    if window_end <= window_start:
+                        st.warning("구간 끝은 구간 시작보다 커야 합니다.")
+                    else:
+                        window_peak_time, window_peak = combined_timeline.peak_in_window(window_start, window_end)
+                        col_q1, col_q2, col_q3 = st.columns(3)
+                        with col_q1: st.metric("구간 전력량 (kWh)", f"{combined_timeline.energy(window_start, window_end):,.2f}")
+                        with col_q2: st.metric("구간 평균 전력 (kW)", f"{combined_timeline.average_power(window_start, window_end):,.2f}")
+                        with col_q3: st.metric("구간 최대 전력 (kW)", f"{window_peak:,.2f}", delta=f"{window_peak_time:.2f} H 시점", delta_color="off")
+
+            # --- 균일 샘플링 트레이스 (청크 단위로 계산하므로 긴 시험도 전체를 메모리에 올리지 않음) ---
+            st.markdown("---")
+            st.subheader("⏱️ 균일 샘플링 종합 전력")
+            resolution_label = st.selectbox("샘플링 간격", options=list(TRACE_RESOLUTIONS), index=1, key='trace_resolution',
+                                            help="모든 레시피를 0H 에 시작한다고 보고 설비 전력을 일정 간격으로 샘플링합니다. CCCV 의 CV 구간 감쇠가 반영됩니다.")
+            resolution_h = TRACE_RESOLUTIONS[resolution_label]
+
+            def combined_trace():
+                return sum_power_traces([iter_power_trace(result, resolution_h) for result in recipe_results.values()])
+
+            # 다른 위젯을 바꿀 때마다 전체 반복을 다시 샘플링하지 않도록 (결과 지문, 간격) 기준으로 캐시
+            trace_summary = cached_trace_summary(tuple(recipe_keys[name] for name in recipe_results), recipe_results.values(), resolution_h)
+            col_t1, col_t2, col_t3 = st.columns(3)
+            with col_t1: st.metric("샘플 최대 전력 (kW)", f"{trace_summary['peak_kw']:.2f}", delta=f"{trace_summary['peak_time_h']:.2f} H 시점")
+            with col_t2: st.metric("샘플 기준 전력량 (kWh)", f"{trace_summary['energy_kwh']:.2f}")
+            with col_t3: st.metric("샘플 수", f"{trace_summary['samples']:,}")
+
+            if st.button("📄 종합 전력 트레이스 CSV 만들기"):
+                csv_buffer = io.StringIO()
+                write_power_trace_csv(combined_trace(), csv_buffer)
+                st.download_button("⬇️ CSV 다운로드", csv_buffer.getvalue().encode('utf-8-sig'),
+                                   file_name=f"power_trace_{resolution_label}.csv", mime='text/csv')
+
+            # --- 채널/장비 시작 시차 (플릿) 시뮬레이션 ---
+            st.markdown("---")
+            st.subheader("🏭 시작 시차 반영 (플릿) 시뮬레이션")
+            st.caption("모든 채널이 동시에 같은 스텝을 실행한다는 가정 대신, 장비(프레임) 또는 채널마다 시작 시각을 다르게 주어 실제에 가까운 피크를 계산합니다.")
+            distribution_labels = {'lockstep': "동시 시작", 'interval': "일정 간격", 'uniform': "균등 분포", 'normal': "정규 분포"}
+            col_f1, col_f2, col_f3 = st.columns(3)
+            with col_f1:
+                fleet_recipe = st.selectbox("대상 레시피", options=list(recipe_results), key='fleet_recipe')
+                fleet_granularity = st.radio("시차 단위", options=['frame', 'channel'], format_func=lambda x: "장비(프레임)" if x == 'frame' else "채널", horizontal=True, key='fleet_granularity')
+            with col_f2:
+                fleet_kind = st.selectbox("시작 시차 분포", options=list(OFFSET_DISTRIBUTIONS), index=2, format_func=lambda x: distribution_labels[x], key='fleet_kind')
+                fleet_spread = st.number_input("간격 / 최대 시차 / 평균 시차 (H)", min_value=0.0, value=1.0, step=0.25, key='fleet_spread',
+                                               help="일정 간격: 단위마다 늦어지는 시간, 균등 분포: 최대 시차, 정규 분포: 평균 시차")
+            with col_f3:
+                fleet_std = st.number_input("표준편차 (H, 정규 분포)", min_value=0.0, value=0.5, step=0.1, key='fleet_std')
+                fleet_seed = st.number_input("난수 시드", min_value=0, value=0, step=1, key='fleet_seed')
+
+            fleet_result = recipe_results[fleet_recipe]
+            fleet_distribution = StartOffsetDistribution(fleet_kind, fleet_spread, fleet_std)
+            # 긴 수명 시험은 샘플 수가 FLEET_MAX_SAMPLES 를 넘지 않도록 간격을 늘림
+            fleet_units = len(unit_channel_counts(fleet_result.trace_context[3], fleet_granularity))
+            fleet_span_h = fleet_result.total_hours + fleet_distribution.max_offset_h(fleet_units)
+            fleet_resolution_h = fleet_resolution(fleet_span_h, resolution_h)
+            if fleet_resolution_h > resolution_h:
+                st.caption(f"시험 기간이 길어 플릿 시뮬레이션은 {fleet_resolution_h * 60:g}분 간격으로 계산합니다.")
+            fleet = cached_simulate_fleet(recipe_keys[fleet_recipe], fleet_result, fleet_distribution,
+                                          fleet_granularity, fleet_resolution_h, seed=int(fleet_seed))
+            col_m1, col_m2, col_m3 = st.columns(3)
+            with col_m1: st.metric("동시 시작 피크 (kW)", f"{fleet.lockstep_peak_kw:.2f}")
+            with col_m2: st.metric("시차 반영 피크 (kW)", f"{fleet.peak_kw:.2f}", delta=f"{fleet.peak_time_h:.2f} H 시점", delta_color="off")
+            with col_m3: st.metric("피크 비율 (시차 / 동시)", f"{fleet.diversity_factor:.1%}")
+
+            fig_fleet, ax_fleet = plt.subplots(figsize=(16, 5))
+            ax_fleet.plot(*decimate_plot_coords(fleet.times, fleet.power_kw, plot_buckets(fig_fleet)), color='tab:blue', linewidth=1.2, label='시차 반영 설비 전력')
+            ax_fleet.axhline(fleet.lockstep_peak_kw, color='red', linestyle='--', linewidth=1, label='동시 시작 피크')
+            ax_fleet.set_xlabel('경과 시간 (H)'); ax_fleet.set_ylabel('전력 (kW)')
+            ax_fleet.grid(True, linestyle='--', alpha=0.5); ax_fleet.legend(); ax_fleet.set_xlim(left=0)
+            st.pyplot(fig_fleet)
+
+            # --- 레시피 시작 시차 자동 최적화 (계산된 계단 함수만 옮겨 평가하므로 다시 시뮬레이션하지 않음) ---
+            if len(all_step_curves) >= 2:
+                st.markdown("---")
+                st.subheader("🗓️ 시작 시차 자동 최적화")
+                st.caption("선택한 레시피마다 시작 시각을 늦춰 종합 전력의 피크가 겹치지 않도록 시차를 찾습니다. "
+                           "각 레시피는 시작 전과 종료 후 대기전력만 씁니다 (위 종합 그래프는 먼저 끝난 레시피의 마지막 스텝 전력을 유지하므로, "
+                           "마지막 스텝이 휴지(Rest)가 아니면 '동시 시작' 값이 위 그래프와 다를 수 있습니다).")
+                col_s1, col_s2, col_s3 = st.columns(3)
+                with col_s1: stagger_max_h = st.number_input("최대 시작 시차 (H)", min_value=0.0, value=4.0, step=0.5, key='stagger_max_h')
+                with col_s2: stagger_step_h = st.number_input("시차 간격 (H)", min_value=0.01, value=0.25, step=0.05, key='stagger_step_h')
+                with col_s3: stagger_objective = st.radio("최소화 대상", options=list(STAGGER_OBJECTIVES), format_func=lambda x: STAGGER_OBJECTIVES[x],
+                                                          horizontal=True, key='stagger_objective',
+                                                          help="최대 수요전력은 사이드바의 평균 시간 / 제외 시간을 사용합니다.")
+                stagger_names = list(recipe_results)
+                # 같은 이름으로 다시 계산·저장한 레시피도 구분되도록 결과 지문을 키로 사용
+                stagger_key = (tuple(stagger_names), tuple(recipe_keys[name] for name in stagger_names),
+                               stagger_max_h, stagger_step_h, stagger_objective, demand_window_h, demand_exclude_h)
+                stagger_standby_kw = [result.trace_context[3].standby_power * result.trace_context[3].required_equipment / 1000.0
+                                      for result in recipe_results.values()]
+
+                if st.button("🚀 시작 시차 최적화 실행"):
+                    with st.spinner("시작 시차를 찾는 중..."):
+                        st.session_state.stagger_result = (stagger_key, optimize_start_offsets(
+                            all_step_curves, stagger_max_h, stagger_step_h, objective=stagger_objective,
+                            window_h=demand_window_h, exclude_h=demand_exclude_h, standby_kw=stagger_standby_kw))
+
+                saved_stagger = st.session_state.get('stagger_result')
+                if saved_stagger is not None and saved_stagger[0] == stagger_key:
+                    stagger = saved_stagger[1]
+                    objective_label = STAGGER_OBJECTIVES[stagger_objective]
+                    col_r1, col_r2, col_r3 = st.columns(3)
+                    with col_r1: st.metric(f"동시 시작 {objective_label} (kW)", f"{stagger.baseline:.2f}")
+                    with col_r2: st.metric(f"시차 적용 {objective_label} (kW)", f"{stagger.optimized:.2f}")
+                    with col_r3: st.metric("감소량 (kW)", f"{stagger.reduction:.2f}", delta=f"-{stagger.reduction_ratio:.1%}", delta_color="inverse")
+                    st.dataframe(pd.DataFrame({"레시피": stagger_names, "시작 시차 (H)": stagger.offsets,
+                                               "종료 시각 (H)": [curve[1][-1] + offset if len(curve[1]) else offset
+                                                               for curve, offset in zip(all_step_curves, stagger.offsets)]}).style.format(precision=2),
+                                 use_container_width=True, hide_index=True)
 
+                    fig_stagger, ax_stagger = plt.subplots(figsize=(16, 5))
+                    for label, timeline, style in (('동시 시작', stagger.baseline_timeline, dict(color='gray', alpha=0.6, linewidth=1)),
+                                                   ('시차 적용', stagger.timeline, dict(color='tab:green', linewidth=1.5))):
+                        ax_stagger.plot(*decimate_plot_coords(*step_plot_coords(timeline.times, timeline.ends, timeline.values), plot_buckets(fig_stagger)),
+                                        label=label, **style)
+                    ax_stagger.set_xlabel('경과 시간 (H)'); ax_stagger.set_ylabel('전력 (kW)')
+                    ax_stagger.axhline(0, color='black', linestyle='-', linewidth=0.8)
+                    ax_stagger.grid(True, linestyle='--', alpha=0.5); ax_stagger.legend(); ax_stagger.set_xlim(left=0)
+                    st.pyplot(fig_stagger)
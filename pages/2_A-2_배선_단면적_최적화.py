@@ -0,0 +1,77 @@
+import streamlit as st
+import pandas as pd
+
+from powercalc.cable_sizing import STANDARD_CABLE_AREAS, cable_lifetime_costs, optimal_cable_areas
+from powercalc.efficiency import EQUIPMENT_SPECS
+from powercalc.recipe_engine import CyclerSpecs
+
+# --- 0. 기본 설정 ---
+st.set_page_config(layout="wide")
+st.title("🧵 배선 단면적 최적화 (수명 비용 기준)")
+st.info("저장된 레시피를 장비 사양(프레임)별로 모든 후보 단면적에 대해 한 번에 계산하고, 구리 비용 + N 년간 전기 요금이 가장 작은 단면적을 찾습니다.")
+
+# --- 1. st.session_state 초기화 ---
+def initialize_state():
+    """세션 상태 초기화"""
+    if 'cable_copper_cost' not in st.session_state: st.session_state.cable_copper_cost = 200.0
+    if 'cable_years' not in st.session_state: st.session_state.cable_years = 10
+    if 'cable_operating_hours' not in st.session_state: st.session_state.cable_operating_hours = 8760.0
+    # 연간 전기요금 페이지와 같은 단가를 기본값으로 사용
+    if 'cable_rate_kwh' not in st.session_state: st.session_state.cable_rate_kwh = st.session_state.get('rate_kwh', 147.8)
+    if 'cable_rate_peak_kw' not in st.session_state: st.session_state.cable_rate_peak_kw = st.session_state.get('rate_peak_kw', 9810.0)
+
+initialize_state()
+
+# --- 2. 입력 ---
+saved_recipes = st.session_state.get('saved_recipes', {})
+if not saved_recipes:
+    st.warning("분석할 저장된 레시피가 없습니다. '레시피 계산기' 페이지에서 먼저 레시피를 저장해주세요.")
+    st.stop()
+
+recipe_name = st.selectbox("레시피 선택", options=list(saved_recipes.keys()))
+saved_data = saved_recipes[recipe_name]
+recipe_df = pd.DataFrame(saved_data.get('recipe_table') or [])
+specs = CyclerSpecs.from_mapping(saved_data)
+st.caption(f"배선 길이 {specs.cable_length} M, 테스트 채널 {specs.test_channels} CH, 컨트롤 채널 {specs.control_channels} CH (저장된 레시피 기준)")
+
+col1, col2, col3 = st.columns(3)
+with col1:
+    st.number_input("구리 비용 (원/SQ·m)", min_value=0.0, step=10.0, key='cable_copper_cost', format="%.1f", help="배선 단면적 1 SQ, 길이 1 m 당 비용입니다. 채널마다 왕복(길이 x 2) 배선으로 계산합니다.")
+    st.number_input("검토 기간 (년)", min_value=1, step=1, key='cable_years')
+with col2:
+    st.number_input("전력량요금 단가 (원/kWh)", min_value=0.0, key='cable_rate_kwh', format="%.1f")
+    st.number_input("기본요금 단가 (원/kW)", min_value=0.0, key='cable_rate_peak_kw', format="%.1f", help="수용률 적용 피크 전력 x 단가 x 12개월을 연간 요금에 더합니다. 0 이면 전력량요금만 반영합니다.")
+with col3:
+    st.number_input("연간 가동 시간 (H)", min_value=0.0, max_value=8760.0, step=100.0, key='cable_operating_hours', format="%.0f")
+    candidate_areas = st.multiselect("후보 단면적 (SQ)", options=list(STANDARD_CABLE_AREAS), default=list(STANDARD_CABLE_AREAS))
+candidate_specs = st.multiselect("검토할 장비 사양", options=list(EQUIPMENT_SPECS), default=list(EQUIPMENT_SPECS))
+
+# --- 3. 계산 및 결과 ---
+if recipe_df.empty:
+    st.warning("선택한 레시피의 스텝 정보가 비어 있습니다.")
+elif not candidate_areas or not candidate_specs:
+    st.warning("후보 단면적과 장비 사양을 하나 이상 선택해주세요.")
+else:
+    with st.spinner("후보 단면적 계산 중..."):
+        costs = cable_lifetime_costs(
+            recipe_df, specs, st.session_state.cable_copper_cost, st.session_state.cable_rate_kwh, st.session_state.cable_years,
+            annual_operating_hours=st.session_state.cable_operating_hours, rate_peak_kw=st.session_state.cable_rate_peak_kw,
+            cable_areas=sorted(candidate_areas), equipment_specs=candidate_specs,
+            cp_cccv_details={int(k): v for k, v in saved_data.get('cp_cccv_details', {}).items()},
+            repetition_count=saved_data.get('repetition_count', 1))
+    best = optimal_cable_areas(costs)
+
+    st.subheader("장비 사양별 최적 단면적")
+    column_names = {'equipment_spec': "장비 사양", 'cable_area': "배선 단면적 (SQ)", 'annual_kwh': "연간 전력량 (kWh)",
+                    'demand_peak_power': "수용률 적용 피크 (kW)", 'annual_energy_cost': "연간 전기 요금 (원)",
+                    'copper_cost': "구리 비용 (원)", 'lifetime_cost': f"{st.session_state.cable_years}년 수명 비용 (원)"}
+    st.dataframe(best.rename(columns=column_names).style.format(precision=0, thousands=','), use_container_width=True, hide_index=True)
+    if specs.equipment_spec in set(best['equipment_spec']):
+        current = best[best['equipment_spec'] == specs.equipment_spec].iloc[0]
+        st.success(f"현재 장비 사양({specs.equipment_spec})의 최적 단면적은 **{current['cable_area']:.0f} SQ** 입니다. (저장된 레시피: {specs.cable_area:.0f} SQ)")
+
+    st.subheader("후보 단면적별 수명 비용")
+    spec_for_curve = st.selectbox("장비 사양", options=candidate_specs, index=candidate_specs.index(specs.equipment_spec) if specs.equipment_spec in candidate_specs else 0)
+    curve = costs[costs['equipment_spec'] == spec_for_curve].set_index('cable_area')
+    st.line_chart(curve[['copper_cost', 'annual_energy_cost', 'lifetime_cost']].assign(annual_energy_cost=lambda d: d['annual_energy_cost'] * st.session_state.cable_years)
+                  .rename(columns={'copper_cost': "구리 비용", 'annual_energy_cost': "전기 요금 (검토 기간)", 'lifetime_cost': "수명 비용"}))
@@ -3,6 +3,9 @@ import pandas as pd
 import numpy as np
 import math
 
+from powercalc.disk_cache import get_disk_cache
+from powercalc.result_cache import content_key
+
 # --- 0. 기본 설정 ---
 st.set_page_config(layout="wide")
 st.title("🌡️ 챔버 온도 프로파일 계산기")
@@ -111,6 +114,62 @@ def calculate_chamber_power(specs):
     except Exception:
         return {"power_ramp_kw": 0, "power_soak_kw": 0}
 
+def calculate_profile(profile_df, chamber_specs, initial_temp, reps, chamber_count):
+    """온도 프로파일(목표 온도/유지 시간 표)을 reps 회 반복했을 때의 구간별 시간/전력량과 합계를 계산하는 함수."""
+    profile_to_calc = pd.concat([profile_df.copy()] * reps, ignore_index=True)
+    results = []
+    total_time = 0.0
+    total_kwh_single_chamber = 0.0
+    current_temp = initial_temp
+    has_ramp = False
+
+    for index, row in profile_to_calc.iterrows():
+        target_temp_step = row['목표 온도 (°C)']
+        soak_time = row['유지 시간 (H)']
+
+        specs_for_step = chamber_specs.copy()
+        specs_for_step['target_temp'] = target_temp_step
+
+        if target_temp_step != current_temp:
+            has_ramp = True
+            delta_t = abs(target_temp_step - current_temp)
+            ramp_rate = chamber_specs.get('ramp_rate', 1.0)
+            ramp_time = (delta_t / ramp_rate) / 60.0 if ramp_rate > 0 else 0
+
+            avg_ramp_temp = (current_temp + target_temp_step) / 2
+            specs_for_ramp = specs_for_step.copy()
+            specs_for_ramp['target_temp'] = avg_ramp_temp
+
+            power_values = calculate_chamber_power(specs_for_ramp)
+            power_ramp_kw = power_values['power_ramp_kw']
+
+            ramp_kwh = power_ramp_kw * ramp_time
+            total_time += ramp_time
+            total_kwh_single_chamber += ramp_kwh
+            results.append([f"반복 {index // len(profile_df) + 1} - 스텝 {index % len(profile_df) + 1} Ramp", f"{current_temp:.1f} → {target_temp_step:.1f}", f"{ramp_time:.2f}", f"{ramp_kwh:.2f}"])
+            current_temp = target_temp_step
+
+        if soak_time > 0:
+            power_values = calculate_chamber_power(specs_for_step)
+            power_soak_kw = power_values['power_soak_kw']
+            soak_kwh = power_soak_kw * soak_time
+            total_time += soak_time
+            total_kwh_single_chamber += soak_kwh
+            results.append([f"반복 {index // len(profile_df) + 1} - 스텝 {index % len(profile_df) + 1} Soak", f"{current_temp:.1f} 유지", f"{soak_time:.2f}", f"{soak_kwh:.2f}"])
+
+    if has_ramp:
+        peak_power_for_profile = chamber_specs.get('total_consumption_ramp_kw', 0)
+    else:
+        peak_power_for_profile = chamber_specs.get('total_consumption_soak_kw', 0)
+
+    return {
+        "results_table": results,
+        "total_time": total_time,
+        "single_chamber_kwh": total_kwh_single_chamber,
+        "total_kwh_all_chambers": total_kwh_single_chamber * chamber_count,
+        "peak_power_kw": peak_power_for_profile * chamber_count
+    }
+
 # --- 2. st.session_state 초기화 및 콜백 함수 ---
 if 'profile_df' not in st.session_state:
     st.session_state.profile_df = pd.DataFrame(
@@ -254,64 +313,16 @@ if st.button("⚙️ 프로파일 계산 실행"):
             st.session_state.profile_df = edited_df
             
             reps = st.session_state.profile_reps
-            if not edited_df.empty:
-                profile_to_calc = pd.concat([edited_df.copy()] * reps, ignore_index=True)
-            else:
+            if edited_df.empty:
                 st.warning("계산할 프로파일 스텝을 1개 이상 입력해주세요.")
                 st.stop()
-            
-            results = []
-            total_time = 0.0
-            total_kwh_single_chamber = 0.0
-            current_temp = st.session_state.initial_temp
-            has_ramp = False
-            
-            for index, row in profile_to_calc.iterrows():
-                target_temp_step = row['목표 온도 (°C)']
-                soak_time = row['유지 시간 (H)']
-                
-                specs_for_step = chamber_specs_for_profile.copy()
-                specs_for_step['target_temp'] = target_temp_step
-                
-                if target_temp_step != current_temp:
-                    has_ramp = True
-                    delta_t = abs(target_temp_step - current_temp)
-                    ramp_rate = chamber_specs_for_profile.get('ramp_rate', 1.0)
-                    ramp_time = (delta_t / ramp_rate) / 60.0 if ramp_rate > 0 else 0
-                    
-                    avg_ramp_temp = (current_temp + target_temp_step) / 2
-                    specs_for_ramp = specs_for_step.copy()
-                    specs_for_ramp['target_temp'] = avg_ramp_temp
-
-                    power_values = calculate_chamber_power(specs_for_ramp)
-                    power_ramp_kw = power_values['power_ramp_kw']
-                    
-                    ramp_kwh = power_ramp_kw * ramp_time
-                    total_time += ramp_time
-                    total_kwh_single_chamber += ramp_kwh
-                    results.append([f"반복 {index // len(edited_df) + 1} - 스텝 {index % len(edited_df) + 1} Ramp", f"{current_temp:.1f} → {target_temp_step:.1f}", f"{ramp_time:.2f}", f"{ramp_kwh:.2f}"])
-                    current_temp = target_temp_step
-
-                if soak_time > 0:
-                    power_values = calculate_chamber_power(specs_for_step)
-                    power_soak_kw = power_values['power_soak_kw']
-                    soak_kwh = power_soak_kw * soak_time
-                    total_time += soak_time
-                    total_kwh_single_chamber += soak_kwh
-                    results.append([f"반복 {index // len(edited_df) + 1} - 스텝 {index % len(edited_df) + 1} Soak", f"{current_temp:.1f} 유지", f"{soak_time:.2f}", f"{soak_kwh:.2f}"])
-            
-            if has_ramp:
-                peak_power_for_profile = chamber_specs_for_profile.get('total_consumption_ramp_kw', 0)
-            else:
-                peak_power_for_profile = chamber_specs_for_profile.get('total_consumption_soak_kw', 0)
-            
-            st.session_state.profile_results = {
-                "results_table": results,
-                "total_time": total_time,
-                "single_chamber_kwh": total_kwh_single_chamber,
-                "total_kwh_all_chambers": total_kwh_single_chamber * st.session_state.chamber_count,
-                "peak_power_kw": peak_power_for_profile * st.session_state.chamber_count
-            }
+
+            # 같은 사양/프로파일의 결과는 디스크 캐시에서 불러옴 (재시작 후에도 유지)
+            profile_key = content_key('chamber_profile', {
+                'chamber_specs': chamber_specs_for_profile, 'profile': edited_df[['목표 온도 (°C)', '유지 시간 (H)']].to_numpy().tolist(),
+                'initial_temp': st.session_state.initial_temp, 'reps': reps, 'chamber_count': st.session_state.chamber_count})
+            st.session_state.profile_results, _ = get_disk_cache().get_or_compute(profile_key, lambda: calculate_profile(
+                edited_df, chamber_specs_for_profile, st.session_state.initial_temp, reps, st.session_state.chamber_count))
             st.success("프로파일 계산이 완료되었습니다!")
 
         except Exception as e:
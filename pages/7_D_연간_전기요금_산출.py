@@ -2,6 +2,10 @@ import streamlit as st
 import pandas as pd
 import math
 
+from powercalc.disk_cache import get_disk_cache
+from powercalc.power_timeline import PowerTimeline
+from powercalc.result_cache import content_key
+
 # --- 0. 기본 설정 ---
 st.set_page_config(layout="wide")
 st.title("💰 연간 전기 요금 산출")
@@ -39,37 +43,36 @@ initialize_state()
 def calculate_all_power(cycler_plan_df, 
                         chamber_op_mode, chamber_spec_name, chamber_quantity, chamber_profile_name,
                         chiller_spec_name):
-    """모든 설비의 전력 정보를 계산하는 중앙 함수"""
+    """모든 설비의 전력 정보를 계산하는 중앙 함수 (디스크 캐시에 저장되므로 화면 출력 없이 값만 계산, 계획 시간 검사는 호출 전에)"""
     results = {}
-    plan_is_valid = True
 
     # --- 1. 충방전기 계산 ---
     cycler_annual_kwh, cycler_peak_kw = 0.0, 0.0
     plan_total_kwh = 0.0
     plan_total_hours = cycler_plan_df["계획 시간 (H)"].sum()
 
-    if plan_total_hours > 8760:
-        st.error(f"충방전기 총 계획 시간({plan_total_hours:,.1f} H)이 1년(8760 H)을 초과합니다.")
-        plan_is_valid = False
-    
-    if not cycler_plan_df.empty and plan_is_valid:
-        all_demand_peaks_in_plan = [0]
+    if not cycler_plan_df.empty:
+        # 계획 순서대로 (계획 시간, 수용률 적용 피크, 계획 전력량) 구간을 이어 붙인 타임라인에서 피크/전력량 조회
+        plan_hours, plan_peaks, plan_kwh = [], [], []
         for _, row in cycler_plan_df.iterrows():
-            recipe_name = row["저장된 레시피"] 
-            if recipe_name not in saved_cycler_recipes or recipe_name == "선택하세요": continue
-            
+            recipe_name = row["저장된 레시피"]
+            planned_hours = row["계획 시간 (H)"]
+            if recipe_name not in saved_cycler_recipes or recipe_name == "선택하세요":
+                # 레시피가 없는 행도 계획 시간은 차지함
+                plan_hours.append(planned_hours); plan_peaks.append(0.0); plan_kwh.append(0.0)
+                continue
+
             spec = saved_cycler_recipes[recipe_name]
-            all_demand_peaks_in_plan.append(spec.get('demand_peak_power', 0.0))
-            
             kwh_per_run = spec.get('total_kwh', 0.0)
             hours_per_run = spec.get('total_hours', 1.0)
             if hours_per_run <= 0: hours_per_run = 1.0
-            
-            planned_hours = row["계획 시간 (H)"]
+
             num_runs_in_plan = planned_hours / hours_per_run
-            plan_total_kwh += kwh_per_run * num_runs_in_plan
-        
-        cycler_peak_kw = max(all_demand_peaks_in_plan)
+            plan_hours.append(planned_hours); plan_peaks.append(spec.get('demand_peak_power', 0.0)); plan_kwh.append(kwh_per_run * num_runs_in_plan)
+
+        plan_timeline = PowerTimeline.from_segments(pd.Series(plan_hours, dtype=float).fillna(0.0), plan_peaks, plan_kwh)
+        plan_total_kwh = plan_timeline.total_energy
+        cycler_peak_kw = max(plan_timeline.max_value, 0.0)
 
         if plan_total_hours > 0:
             annual_repetition_factor = 8760 / plan_total_hours
@@ -133,7 +136,7 @@ def calculate_all_power(cycler_plan_df,
     total_annual_kwh = results['cycler']['kwh'] + results['chamber']['kwh'] + results['chiller']['kwh']
     results['total'] = {'peak': total_peak_kw, 'kwh': total_annual_kwh}
     
-    return results if plan_is_valid else None
+    return results
 
 # ★★★★★ 추가: 프로파일 삭제 콜백 함수 ★★★★★
 def delete_summary_profile_callback(profile_name):
@@ -219,16 +222,33 @@ st.markdown("---")
 # --- 4. 전력 정보 종합 및 저장 ---
 st.subheader("3. 계산된 전력 정보 종합")
 if st.button("현재 설정값으로 전력 정보 계산 및 불러오기", type="primary"):
-    summary = calculate_all_power(
-        st.session_state.cycler_plan_df,
-        st.session_state.chamber_op_mode,
-        st.session_state.chamber_spec_select,
-        st.session_state.chamber_qty,
-        st.session_state.chamber_profile_select,
-        st.session_state.chiller_spec_select
-    )
-    if summary:
-        st.session_state.current_summary = summary
+    plan_total_hours = st.session_state.cycler_plan_df["계획 시간 (H)"].sum()
+    if plan_total_hours > 8760:
+        # 잘못된 계획은 계산하지 않으므로 디스크 캐시에도 남지 않음
+        st.error(f"충방전기 총 계획 시간({plan_total_hours:,.1f} H)이 1년(8760 H)을 초과합니다.")
+    else:
+        # 계획에 쓰인 저장 데이터와 설정값이 같으면 디스크 캐시의 결과를 사용 (재시작 후에도 유지)
+        plan_recipes = {name: saved_cycler_recipes[name] for name in st.session_state.cycler_plan_df["저장된 레시피"] if name in saved_cycler_recipes}
+        plan_key = content_key('annual_plan', {
+            'cycler_plan': st.session_state.cycler_plan_df.to_numpy(dtype=object).tolist(),
+            'cycler_recipes': {name: {k: data.get(k) for k in ('total_kwh', 'total_hours', 'demand_peak_power')} for name, data in plan_recipes.items()},
+            'chamber_op_mode': st.session_state.chamber_op_mode,
+            'chamber_spec': saved_chamber_specs.get(st.session_state.chamber_spec_select),
+            'chamber_qty': st.session_state.chamber_qty,
+            'chamber_schedule': [st.session_state.chamber_cycles_per_day, st.session_state.chamber_soak_hours_per_day, st.session_state.chamber_operating_days],
+            'chamber_profile': {k: v for k, v in saved_chamber_profiles.get(st.session_state.chamber_profile_select, {}).items() if k != 'profile_df'},
+            'chiller': saved_chiller_calcs.get(st.session_state.chiller_spec_select),
+        })
+        summary, _ = get_disk_cache().get_or_compute(plan_key, lambda: calculate_all_power(
+            st.session_state.cycler_plan_df,
+            st.session_state.chamber_op_mode,
+            st.session_state.chamber_spec_select,
+            st.session_state.chamber_qty,
+            st.session_state.chamber_profile_select,
+            st.session_state.chiller_spec_select
+        ))
+        if summary:
+            st.session_state.current_summary = summary
 
 if st.session_state.current_summary:
     summary = st.session_state.current_summary
@@ -0,0 +1 @@
+"""충방전기 전력 계산 공용 모듈 (Streamlit 페이지에서 import 하여 사용)"""
@@ -0,0 +1,144 @@
+"""레시피 일괄 가져오기
+
+여러 시트의 엑셀 파일, 여러 파일, 폴더에 있는 레시피를 한 번에 읽어 현재 장비 사양으로 모두 계산하고
+'저장된 레시피' 형식(계산기 페이지의 저장 버튼과 같은 dict)으로 만듭니다.
+
+- 엑셀 파일은 시트마다 레시피 하나 (시트가 여러 개면 이름은 '파일 - 시트'), CSV/Parquet 파일은 파일마다 하나
+- CP/CCCV 상세 설정은 I ~ M 열(recipe_io.DETAIL_COLUMNS)에서 읽어 계산과 저장된 레시피에 함께 사용
+  (CCCV 스텝에 CV 전압/종료 전류가 없는 레시피는 오류가 아니라 '건너뜀'으로 표시 — 계산기에서 직접 입력 필요)
+- 레시피마다 계산 전 검증(recipe_io.validate_recipe)을 거치고, 통과한 레시피만 프로세스 풀에서 병렬 계산
+- 결과는 공용 결과 캐시(result_cache)를 거치므로 같은 레시피를 다시 가져오면 계산하지 않음
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+from powercalc.demand import demand_peak
+from powercalc.power_timeline import PowerTimeline
+from powercalc.recipe_engine import CyclerSpecs
+from powercalc.recipe_io import RECIPE_FILE_TYPES, missing_cccv_details, normalize_recipe_frame, read_recipe_sheets, split_recipe_details, validate_recipe
+from powercalc.result_cache import cached_simulate_recipe
+
+SAVED_SUMMARY_KEYS = ['total_kwh', 'max_peak_power', 'total_hours', 'demand_peak_power', 'rolling_demand_peak_power']
+
+
+@dataclass
+class BatchRecipe:
+    """일괄 가져오기의 레시피 하나 (읽기/검증/계산 오류는 errors, 계산하지 않은 이유는 skipped, 계산 결과 요약은 summary)"""
+    name: str
+    recipe_df: pd.DataFrame = None
+    errors: list = field(default_factory=list)
+    summary: dict = None
+    cp_cccv_details: dict = field(default_factory=dict)
+    skipped: str = None
+
+    @property
+    def ok(self):
+        return self.summary is not None and not self.errors and not self.skipped
+
+    def saved_record(self, settings):
+        """saved_recipes 에 넣을 dict (settings: 계산에 사용한 사양/반복 횟수 등 계산기 페이지의 설정 값)"""
+        record = {'recipe_table': self.recipe_df.to_dict('records'), 'cp_cccv_details': dict(self.cp_cccv_details)}
+        record.update({key: self.summary[key] for key in SAVED_SUMMARY_KEYS})
+        record.update(settings)
+        return record
+
+
+# --- 1. 읽기 ---
+def _iter_source_files(source):
+    """(파일, 이름 접두어) — 폴더는 하위 폴더까지 레시피 파일을 찾아 상대 경로를 이름으로 사용"""
+    if isinstance(source, (str, os.PathLike)) and os.path.isdir(source):
+        for root, _, names in sorted(os.walk(source)):
+            for file_name in sorted(names):
+                if os.path.splitext(file_name)[1].lower().lstrip('.') not in RECIPE_FILE_TYPES: continue
+                path = os.path.join(root, file_name)
+                yield path, os.path.splitext(os.path.relpath(path, source))[0].replace(os.sep, '/')
+    else:
+        name = getattr(source, 'name', None) or str(source)
+        yield source, os.path.splitext(os.path.basename(name))[0]
+
+
+def _trim_empty_rows(df):
+    """끝에 있는 빈 행 제거 (중간의 빈 행은 루프 시작 스텝 번호가 바뀌지 않도록 그대로 둠)"""
+    filled = df.notna().any(axis=1).to_numpy()
+    return df.iloc[:filled.nonzero()[0][-1] + 1] if filled.any() else df.iloc[:0]
+
+
+def read_recipe_library(sources):
+    """파일/폴더 경로 또는 업로드 파일 목록을 BatchRecipe 목록으로 읽음 (빈 시트는 건너뛰고, 읽을 수 없는 파일은 오류로 기록)"""
+    recipes = []
+    for source in sources:
+        for file, stem in _iter_source_files(source):
+            try:
+                sheets = read_recipe_sheets(file)
+            except Exception as e:
+                recipes.append(BatchRecipe(stem, errors=[f"파일을 읽을 수 없습니다: {e}"]))
+                continue
+            sheets = {sheet: trimmed for sheet, trimmed in ((sheet, _trim_empty_rows(df)) for sheet, df in sheets.items()) if not trimmed.empty}
+            for sheet, df in sheets.items():
+                name = f"{stem} - {sheet}" if len(sheets) > 1 else stem
+                recipe_df, details = split_recipe_details(normalize_recipe_frame(df))
+                recipe = BatchRecipe(name, recipe_df, cp_cccv_details=details)
+                missing = missing_cccv_details(recipe_df, details)
+                if missing: recipe.skipped = f"CCCV 상세 설정(CV 전압/종료 전류)이 없어 계산기에서 직접 입력해야 합니다 ({', '.join(map(str, missing))}번 스텝)"
+                recipes.append(recipe)
+    return recipes
+
+
+# --- 2. 계산 ---
+def _calculate(args):
+    """프로세스 풀 작업 단위: (요약, 오류 목록)"""
+    recipe_df, details, specs, repetition_count = args
+    errors = validate_recipe(recipe_df, details)
+    if errors: return None, errors
+    try:
+        result = cached_simulate_recipe(recipe_df, specs, details, repetition_count)
+        summary = result.summary()
+        # 최대 수요전력은 기본 평균 시간(15분) 기준
+        rolling = demand_peak(PowerTimeline.from_result(result))
+        summary['rolling_demand_peak_power'] = rolling.demand_kw if rolling is not None else 0.0
+        return summary, []
+    except Exception as e:
+        return None, [f"계산 중 오류가 발생했습니다: {e}"]
+
+
+def calculate_recipes(recipes, specs, repetition_count=1, workers=None, progress=None):
+    """읽기 오류가 없고 건너뛰지 않은 레시피를 모두 계산해 summary/errors 를 채우고 recipes 를 반환
+
+    workers: 프로세스 수 (기본: CPU 수, 1 이하이거나 레시피가 하나면 현재 프로세스에서 계산)
+    progress: 레시피 하나가 끝날 때마다 progress(완료 수, 전체 수) 호출
+    """
+    if not isinstance(specs, CyclerSpecs): specs = CyclerSpecs.from_mapping(specs)
+    pending = [recipe for recipe in recipes if not recipe.errors and not recipe.skipped]
+    workers = workers if workers is not None else (os.cpu_count() or 1)
+    total = len(pending)
+    if workers <= 1 or total <= 1:
+        for done, recipe in enumerate(pending, start=1):
+            recipe.summary, recipe.errors = _calculate((recipe.recipe_df, recipe.cp_cccv_details, specs, repetition_count))
+            if progress: progress(done, total)
+        return recipes
+
+    with ProcessPoolExecutor(max_workers=min(workers, total)) as executor:
+        futures = {executor.submit(_calculate, (recipe.recipe_df, recipe.cp_cccv_details, specs, repetition_count)): recipe for recipe in pending}
+        for done, future in enumerate(as_completed(futures), start=1):
+            recipe = futures[future]
+            try:
+                recipe.summary, recipe.errors = future.result()
+            except Exception as e:
+                recipe.summary, recipe.errors = None, [f"계산 중 오류가 발생했습니다: {e}"]
+            if progress: progress(done, total)
+    return recipes
+
+
+def batch_table(recipes):
+    """결과 요약표 (레시피, 상태, 스텝 수, 상세 설정 수, 요약 값, 건너뛴 이유, 오류)"""
+    return pd.DataFrame([{
+        'name': recipe.name, 'ok': recipe.ok,
+        'steps': len(recipe.recipe_df) if recipe.recipe_df is not None else 0,
+        'details': len(recipe.cp_cccv_details),
+        **{key: (recipe.summary or {}).get(key) for key in SAVED_SUMMARY_KEYS},
+        'skipped': recipe.skipped or "",
+        'errors': "\n".join(recipe.errors),
+    } for recipe in recipes])
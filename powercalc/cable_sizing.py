@@ -0,0 +1,51 @@
+"""수명 비용 기준 배선 단면적 최적화
+
+배선 단면적이 클수록 구리 비용은 늘고 배선 저항(I²R 손실)은 줄어듭니다. 장비 사양(프레임)마다 후보 단면적 전체를
+scenario_engine 으로 한 번에 계산해 (구리 비용 + N 년간 전기 요금) 이 가장 작은 단면적을 찾습니다.
+
+    구리 비용 = 단면적(SQ) x 배선 길이(M) x 2 (왕복) x 테스트 채널 수 x SQ·m 당 단가
+    연간 전기 요금 = 연간 전력량 x 전력량요금 단가 + 수용률 적용 피크 x 기본요금 단가 x 12
+    연간 전력량 = 레시피 평균 전력(총 전력량 / 총 시간) x 연간 가동 시간
+"""
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from powercalc.efficiency import EQUIPMENT_SPECS
+from powercalc.recipe_engine import CyclerSpecs
+from powercalc.scenario_engine import ScenarioSet, simulate_scenarios
+
+STANDARD_CABLE_AREAS = (16.0, 25.0, 35.0, 50.0, 70.0, 95.0, 120.0, 150.0, 185.0, 240.0, 300.0, 400.0)
+
+
+def cable_lifetime_costs(recipe_df, specs, copper_cost_per_sqm, rate_kwh, years, annual_operating_hours=8760.0,
+                         rate_peak_kw=0.0, cable_areas=STANDARD_CABLE_AREAS, equipment_specs=None,
+                         cp_cccv_details=None, repetition_count=1):
+    """장비 사양 x 후보 단면적 전체의 비용표 (열: equipment_spec, cable_area, 연간 전력량/요금, 구리 비용, 수명 비용)"""
+    if not isinstance(specs, CyclerSpecs): specs = CyclerSpecs.from_mapping(specs)
+    equipment_specs = list(equipment_specs or EQUIPMENT_SPECS)
+    points = list(itertools.product(equipment_specs, [float(a) for a in cable_areas]))
+    spec_values = np.array([p[0] for p in points], dtype=object)
+    area_values = np.array([p[1] for p in points])
+
+    scenarios = ScenarioSet.from_specs(specs, len(points), equipment_spec=spec_values, cable_area=area_values)
+    summary = simulate_scenarios(recipe_df, specs, scenarios, cp_cccv_details, repetition_count)
+
+    total_hours, demand_peak = summary['total_hours'].to_numpy(), summary['demand_peak_power'].to_numpy()
+    average_kw = np.where(total_hours > 0, summary['total_kwh'].to_numpy() / np.where(total_hours > 0, total_hours, 1.0), 0.0)
+    annual_kwh = average_kw * annual_operating_hours
+    annual_energy_cost = annual_kwh * rate_kwh + demand_peak * rate_peak_kw * 12
+    copper_cost = area_values * specs.cable_length * 2 * specs.test_channels * copper_cost_per_sqm
+    return pd.DataFrame({
+        'equipment_spec': spec_values, 'cable_area': area_values,
+        'annual_kwh': annual_kwh, 'demand_peak_power': demand_peak,
+        'annual_energy_cost': annual_energy_cost, 'copper_cost': copper_cost,
+        'lifetime_cost': copper_cost + annual_energy_cost * years,
+    })
+
+
+def optimal_cable_areas(costs):
+    """cable_lifetime_costs 결과에서 장비 사양별 수명 비용 최소 행 (장비 사양 순서 유지)"""
+    best = costs.loc[costs.groupby('equipment_spec', sort=False)['lifetime_cost'].idxmin()]
+    return best.reset_index(drop=True)
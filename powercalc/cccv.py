@@ -0,0 +1,129 @@
+"""CCCV 충전 스텝의 CV 구간 모델
+
+CV 구간 전류는 I(t) = I_cc · exp(-t/τ) 로 감쇠해 종료 전류 I_cut 에서 끝난다고 봅니다.
+CV 구간 충전량 Q_cv 를 맞추도록 τ = Q_cv / (I_cc - I_cut) 로 정하면
+    - 소요 시간: τ · ln(I_cc / I_cut)
+    - t 시점까지 충전량: τ · (I_cc - I(t))
+    - t 시점까지 채널 입력 에너지: V_cv · τ · ∫_{I(t)}^{I_cc} dI / η(I)
+으로 모두 닫힌 형태로 계산됩니다. ∫ dI/η 는 스텝마다 한 번 만든 누적 테이블(CVEfficiencyTable)에서 읽습니다.
+"""
+import math
+
+import numpy as np
+
+CV_MODELS = ('exponential', 'average')  # average: 기존 방식 ((I_cc + I_cut) / 2 의 일정 전류)
+LEGACY_CV_MODEL = 'average'  # cv_model 없이 저장된(지수 감쇠 도입 전) 레시피는 저장 당시 방식으로 계산
+CV_TABLE_POINTS = 33
+
+
+def cv_table_currents(cc_current, cutoff_current, points=CV_TABLE_POINTS):
+    """효율 누적 테이블을 만들 전류 격자 (I_cut ~ I_cc)"""
+    return np.linspace(cutoff_current, cc_current, points)
+
+
+class CVEfficiencyTable:
+    """CV 전압에서의 1/η(I) 와 그 누적 적분 ∫_{I_cut}^{I} dI/η 테이블
+
+    efficiencies 가 (시나리오 수, 격자 점 수) 배열이면 시나리오별 테이블이 되고,
+    조회 시 전류도 시나리오별 배열(시나리오 수,)로 전달합니다 (scenario_engine).
+    """
+
+    def __init__(self, currents, efficiencies):
+        self.currents = np.asarray(currents, dtype=float)
+        efficiencies = np.asarray(efficiencies, dtype=float)
+        # 효율이 0 이하인 운전점은 기존과 같이 입력 전력 0 으로 처리
+        self.inverse_efficiency = np.where(efficiencies > 0, 1.0 / np.where(efficiencies > 0, efficiencies, 1.0), 0.0)
+        segments = np.diff(self.currents) * (self.inverse_efficiency[..., 1:] + self.inverse_efficiency[..., :-1]) / 2.0
+        self.integral = np.concatenate([np.zeros(segments.shape[:-1] + (1,)), np.cumsum(segments, axis=-1)], axis=-1)
+
+    def _lookup(self, values, current):
+        if values.ndim == 1: return np.interp(current, self.currents, values)
+        # 시나리오별 테이블: 행마다 선형 보간 (범위 밖은 끝 값)
+        current = np.clip(np.asarray(current, dtype=float), self.currents[0], self.currents[-1])
+        idx = np.clip(np.searchsorted(self.currents, current, side='right') - 1, 0, len(self.currents) - 2)
+        x0, x1 = self.currents[idx], self.currents[idx + 1]
+        w = np.where(x1 > x0, (current - x0) / np.where(x1 > x0, x1 - x0, 1.0), 0.0)
+        rows = np.arange(values.shape[0])
+        return values[rows, idx] * (1 - w) + values[rows, idx + 1] * w
+
+    def inverse_at(self, current):
+        return self._lookup(self.inverse_efficiency, current)
+
+    def integral_at(self, current):
+        return self._lookup(self.integral, current)
+
+
+class ExponentialCV:
+    """지수 감쇠 CV 구간 (t 는 CV 시작부터의 시간, H)"""
+
+    def __init__(self, cv_voltage, cc_current, cutoff_current, cv_charge_ah, table):
+        self.cv_voltage, self.cc_current, self.cutoff_current = cv_voltage, cc_current, cutoff_current
+        self.tau_h = cv_charge_ah / (cc_current - cutoff_current)
+        self.full_duration_h = self.tau_h * math.log(cc_current / cutoff_current)
+        self.table = table
+
+    def current_at(self, t):
+        if self.tau_h <= 0: return np.zeros_like(np.asarray(t, dtype=float)) + self.cutoff_current
+        return self.cc_current * np.exp(-np.asarray(t, dtype=float) / self.tau_h)
+
+    def charge_ah(self, t):
+        return self.tau_h * (self.cc_current - self.current_at(t))
+
+    def energy_wh(self, t):
+        """CV 시작부터 t 까지 채널 입력 에너지 (Wh)"""
+        return self.cv_voltage * self.tau_h * (self.table.integral_at(self.cc_current) - self.table.integral_at(self.current_at(t)))
+
+    def power_w(self, t):
+        current = self.current_at(t)
+        return self.cv_voltage * current * self.table.inverse_at(current)
+
+
+class AverageCV:
+    """(I_cc + I_cut) / 2 의 일정 전류로 근사한 CV 구간 (기존 계산 방식)"""
+
+    def __init__(self, cv_voltage, cc_current, cutoff_current, cv_charge_ah, efficiency):
+        self.cv_voltage = cv_voltage
+        self.current = (cc_current + cutoff_current) / 2.0 if cc_current and cutoff_current else 0
+        self.full_duration_h = cv_charge_ah / self.current if self.current > 0 else 0
+        self.p_in_w = cv_voltage * self.current / efficiency if efficiency > 0 else 0
+
+    def current_at(self, t):
+        return np.zeros_like(np.asarray(t, dtype=float)) + self.current
+
+    def charge_ah(self, t):
+        return np.asarray(t, dtype=float) * self.current
+
+    def energy_wh(self, t):
+        return np.asarray(t, dtype=float) * self.p_in_w
+
+    def power_w(self, t):
+        return np.zeros_like(np.asarray(t, dtype=float)) + self.p_in_w
+
+
+class CCCVProfile:
+    """CCCV 충전 스텝 1회 실행의 전류/채널 입력 전력 (CC 구간 후 CV 구간, 시간 제한으로 중간에 끝날 수 있음)"""
+
+    def __init__(self, cc_current, cc_power_w, cc_time_h, cv, duration_h):
+        self.cc_current, self.cc_power_w, self.cc_time_h = cc_current, cc_power_w, cc_time_h
+        self.cv, self.duration_h = cv, duration_h
+
+    @property
+    def cv_time_h(self):
+        return max(self.duration_h - self.cc_time_h, 0.0)
+
+    def charge_ah(self):
+        if self.duration_h <= self.cc_time_h: return self.duration_h * self.cc_current
+        return self.cc_time_h * self.cc_current + float(self.cv.charge_ah(self.cv_time_h))
+
+    def energy_wh(self):
+        if self.duration_h <= self.cc_time_h: return self.duration_h * self.cc_power_w
+        return self.cc_time_h * self.cc_power_w + float(self.cv.energy_wh(self.cv_time_h))
+
+    def current_at(self, t):
+        t = np.asarray(t, dtype=float)
+        return np.where(t < self.cc_time_h, self.cc_current, self.cv.current_at(np.maximum(t - self.cc_time_h, 0.0)))
+
+    def power_w(self, t):
+        """t (스텝 시작부터의 시간, H) 시점의 채널 입력 전력 (W)"""
+        t = np.asarray(t, dtype=float)
+        return np.where(t < self.cc_time_h, self.cc_power_w, self.cv.power_w(np.maximum(t - self.cc_time_h, 0.0)))
@@ -0,0 +1,59 @@
+"""이동 구간 최대 수요전력 (기본 15분 평균)
+
+전기요금의 기본요금은 순간 최대 전력이 아니라 일정 시간(보통 15분) 평균 전력의 최댓값(최대 수요전력)으로 정합니다.
+PowerTimeline(계단 함수) 위에서 길이 window_h 인 구간을 밀어 가며 평균 전력을 구합니다.
+
+평균 전력은 구간 끝 시각에 대해 구간별 선형 함수이므로 최댓값은 구간 시작이나 끝이 전력 변화 시각과 만나는 곳에서 나옵니다.
+그래서 '변화 시각' 과 '변화 시각 + window_h' 만 후보 구간 끝으로 보고, 각 후보의 전력량은 누적합 조회로 구합니다
+(변화 시각 수 n 에 대해 후보 2n 개 — 이미 정렬된 두 배열을 병합하므로 정렬 없이 선형 시간).
+
+구간은 타임라인 안에 있는 것만 봅니다 (구간 끝 <= 타임라인 끝). 타임라인이 window_h 보다 짧으면
+시작 구간 하나만 보며, 이때 타임라인이 끝난 뒤는 0 kW 로 계산합니다.
+
+exclude_h: 시작 후 이 시간 안에서 시작하는 구간은 제외 (초기 기동 구간 등)
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+DEFAULT_DEMAND_WINDOW_H = 0.25
+
+
+@dataclass(frozen=True)
+class DemandInterval:
+    """평균 전력 구간 [start_h, end_h) 와 평균 전력 demand_kw"""
+    start_h: float
+    end_h: float
+    demand_kw: float
+
+
+def rolling_demand(timeline, window_h=DEFAULT_DEMAND_WINDOW_H, exclude_h=0.0):
+    """(후보 구간 끝 시각 배열, 구간 평균 전력 배열) — 시각 순, 구간 끝은 [시작 + exclude_h + window_h, 타임라인 끝]"""
+    if window_h <= 0: raise ValueError("수요전력 구간 길이는 0 보다 커야 합니다.")
+    if not len(timeline): return np.zeros(0), np.zeros(0)
+    lo = max(timeline.start, timeline.start + exclude_h) + window_h
+    hi = max(timeline.end, lo)
+    knots = np.append(timeline.times, timeline.end)
+    # 정렬된 두 구간(run)의 병합 — stable 정렬(timsort)은 이미 정렬된 구간을 선형 시간에 병합
+    merged = np.sort(np.concatenate([knots, knots + window_h]), kind='stable')
+    candidates = np.concatenate([[lo], merged[(merged > lo) & (merged < hi)], [hi]])
+    candidates = candidates[np.append(True, np.diff(candidates) > 0)]
+    return candidates, timeline.energy(candidates - window_h, candidates) / window_h
+
+
+def demand_peak(timeline, window_h=DEFAULT_DEMAND_WINDOW_H, exclude_h=0.0):
+    """최대 수요전력 구간 (DemandInterval, 빈 타임라인은 None)"""
+    peaks = top_demand_intervals(timeline, 1, window_h, exclude_h)
+    return peaks[0] if peaks else None
+
+
+def top_demand_intervals(timeline, n=5, window_h=DEFAULT_DEMAND_WINDOW_H, exclude_h=0.0):
+    """서로 겹치지 않는 평균 전력 상위 n 개 구간 (큰 순서)"""
+    ends, demand = rolling_demand(timeline, window_h, exclude_h)
+    picked = []
+    for i in np.argsort(-demand, kind='stable'):
+        if len(picked) >= n: break
+        start, end = ends[i] - window_h, ends[i]
+        if any(start < other.end_h and other.start_h < end for other in picked): continue
+        picked.append(DemandInterval(float(start), float(end), float(demand[i])))
+    return picked
@@ -0,0 +1,124 @@
+"""내용 주소 기반 디스크 결과 저장소 (SQLite)
+
+입력 해시(result_cache.content_key)를 키로 계산 결과를 pickle + zlib 압축해 SQLite 파일 하나에 저장합니다.
+Streamlit 프로세스가 재시작되거나 재배포된 뒤에도 같은 입력의 레시피/챔버 프로파일/연간 계획 결과를
+다시 계산하지 않습니다.
+
+- 용량 제한: 저장 후 전체 크기가 max_bytes 를 넘으면 가장 오래 조회하지 않은 항목부터 삭제 (LRU)
+- 동시 접근: WAL 모드 + 쓰기 트랜잭션(BEGIN IMMEDIATE) 으로 여러 워커 프로세스/스레드가 같은 파일을 안전하게 공유
+- 디스크 오류(읽기 전용 배포 등)는 캐시 미스로 처리하며 계산에는 영향을 주지 않습니다.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import zlib
+
+DEFAULT_CACHE_PATH = os.environ.get(
+    'POWERCALC_CACHE_PATH',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'result_cache', 'results.sqlite3'))
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+class DiskCache:
+    """키 -> 결과 영구 저장소 (연결은 스레드마다 하나씩 열어 재사용)"""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES, timeout=30.0):
+        self.path, self.max_bytes, self.timeout = path, max_bytes, timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            # isolation_level=None: 트랜잭션은 아래에서 직접 BEGIN/COMMIT
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value BLOB NOT NULL, "
+                         "size INTEGER NOT NULL, accessed_at REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at)")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        """저장된 결과 (없거나 읽을 수 없으면 None)"""
+        try:
+            conn = self._connection()
+            row = conn.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None: return None
+            conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        except (sqlite3.Error, OSError):
+            return None
+        try:
+            return pickle.loads(zlib.decompress(row[0]))
+        except Exception:
+            # 코드 변경 등으로 복원할 수 없는 항목은 지움
+            self.delete(key)
+            return None
+
+    def put(self, key, value):
+        """결과를 저장하고 용량을 넘으면 오래된 항목부터 삭제 (max_bytes 보다 큰 결과는 저장하지 않음)"""
+        blob = zlib.compress(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        if len(blob) > self.max_bytes: return
+        try:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("INSERT OR REPLACE INTO entries (key, value, size, accessed_at) VALUES (?, ?, ?, ?)",
+                             (key, blob, len(blob), time.time()))
+                self._evict(conn)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        except (sqlite3.Error, OSError):
+            pass
+
+    def get_or_compute(self, key, compute):
+        """(결과, 저장소 적중 여부) — 없으면 compute() 로 계산해 저장 (None 결과는 저장하지 않음)"""
+        value = self.get(key)
+        if value is not None: return value, True
+        value = compute()
+        if value is not None: self.put(key, value)
+        return value, False
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes: return
+        stale = []
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed_at"):
+            if total <= self.max_bytes: break
+            stale.append((key,))
+            total -= size
+        conn.executemany("DELETE FROM entries WHERE key = ?", stale)
+
+    def delete(self, key):
+        try:
+            self._connection().execute("DELETE FROM entries WHERE key = ?", (key,))
+        except (sqlite3.Error, OSError):
+            pass
+
+    def clear(self, namespace=None):
+        """전체 또는 namespace ('recipe' 등 content_key 의 접두어) 항목 삭제"""
+        try:
+            if namespace is None: self._connection().execute("DELETE FROM entries")
+            else: self._connection().execute("DELETE FROM entries WHERE key LIKE ?", (f"{namespace}:%",))
+        except (sqlite3.Error, OSError):
+            pass
+
+    def stats(self):
+        """{'entries': 항목 수, 'bytes': 저장 크기}"""
+        try:
+            count, size = self._connection().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        except (sqlite3.Error, OSError):
+            count, size = 0, 0
+        return {'entries': count, 'bytes': size}
+
+
+_disk_cache = DiskCache()
+
+
+def get_disk_cache():
+    return _disk_cache
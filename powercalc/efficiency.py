@@ -0,0 +1,307 @@
+"""충방전기 효율 모델
+
+효율 맵(efficiency_maps/*.csv, *.parquet — Parquet 는 pyarrow 가 있을 때만)을 프로세스당 한 번만 읽어 검증하고,
+삼각분할(Delaunay)과 보간기를 미리 만들어 두어 매 호출마다 griddata 를 다시 수행하지 않도록 합니다.
+맵 파일의 수정 시각(mtime)이 바뀐 경우에만 해당 맵을 다시 읽습니다.
+
+효율 맵 형식 (한 행 = 한 측정점, 모드별로 전압 × 전류 격자가 빠짐없이 있어야 함):
+    mode,voltage,current,efficiency_pct
+    Charge,3.3,10,48.62
+"""
+import hashlib
+import os
+import threading
+import time
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from scipy.interpolate import LinearNDInterpolator, NearestNDInterpolator
+from scipy.spatial import Delaunay
+
+COPPER_RESISTIVITY = 1.72e-8
+EFFICIENCY_MAP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'efficiency_maps')
+DEFAULT_CYCLER_MODEL = 'default'
+EFFICIENCY_MODES = ('Charge', 'Discharge')
+
+
+# --- 1. 장비 사양 / 배선 저항 ---
+EQUIPMENT_SPECS = ('2A - 10A', '5A - 25A', '10A - 50A', '20A - 100A', '30A - 150A', '40A - 200A', '60A - 300A',
+                   '120A - 600A', '180A - 900A', '240A - 1200A', '300A - 1500A', '360A - 1800A', '420A - 2000A')
+
+
+def calculate_cable_resistance(length_m, area_sqmm):
+    if area_sqmm <= 0: return 0
+    area_m2 = area_sqmm * 1e-6
+    return COPPER_RESISTIVITY * (length_m * 2) / area_m2
+
+# 효율 테이블이 측정된 기준 배선 (3m / 150SQ)
+REFERENCE_CABLE_RESISTANCE = calculate_cable_resistance(3.0, 150.0)
+
+
+@lru_cache(maxsize=None)
+def parse_max_current(equipment_spec):
+    """'60A - 300A' 형식의 장비 사양에서 최대 전류(A)를 읽음 (형식이 다르면 None)"""
+    try:
+        max_current_str = equipment_spec.split('-')[1].strip().replace('A', '')
+        return int(max_current_str)
+    except (IndexError, ValueError, AttributeError):
+        return None
+
+
+@lru_cache(maxsize=256)
+def cached_cable_resistance(length_m, area_sqmm):
+    return calculate_cable_resistance(length_m, area_sqmm)
+
+
+# --- 2. 효율 모델 ---
+class EfficiencyModel:
+    """충전/방전 효율 보간기를 미리 준비해 두고 재사용하는 효율 모델
+
+    tables: {'Charge': (points, values), 'Discharge': (points, values)}, points 의 열은 (전류, 전압).
+    전류는 장비 최대 전류와 효율 맵의 최대 측정 전류의 비율로 환산한 뒤 맵 범위로 제한합니다.
+    """
+
+    def __init__(self, tables):
+        self._interpolators = {}
+        self._ranges = {}
+        for mode, (points, values) in tables.items():
+            triangulation = Delaunay(points)
+            self._interpolators[mode] = (
+                LinearNDInterpolator(triangulation, values),
+                NearestNDInterpolator(points, values),
+            )
+            self._ranges[mode] = (points[:, 0].min(), points[:, 0].max(), points[:, 1].min(), points[:, 1].max())
+
+    def scaling_factor(self, mode, equipment_spec):
+        max_current = parse_max_current(equipment_spec)
+        if max_current is None: return 1.0
+        return max_current / self._ranges[mode][1]
+
+    def current_range(self, equipment_spec):
+        """효율 맵이 측정된 실제 전류 범위 (장비 사양 환산, 두 모드의 최대값)"""
+        return max(self._ranges[mode][1] * self.scaling_factor(mode, equipment_spec) for mode in self._ranges)
+
+    def efficiency(self, mode, voltage, current, equipment_spec, cable_length_m, cable_area_sqmm):
+        """단일 운전점의 효율 (기존 get_efficiency 와 동일한 결과)"""
+        if mode not in self._interpolators: return 1.0
+        current = abs(current)
+        scaling_factor = self.scaling_factor(mode, equipment_spec)
+        i_min, i_max, v_min, v_max = self._ranges[mode]
+
+        equivalent_current = current / scaling_factor if scaling_factor > 0 else 0
+        voltage_clipped = np.clip(voltage, v_min, v_max)
+        current_clipped = np.clip(equivalent_current, i_min, i_max)
+
+        linear, nearest = self._interpolators[mode]
+        eta_table = linear(current_clipped, voltage_clipped)[()]
+        if np.isnan(eta_table):
+            eta_table = nearest(current_clipped, voltage_clipped)[()]
+
+        R_new = cached_cable_resistance(cable_length_m, cable_area_sqmm)
+
+        eta_adjusted = eta_table
+        if voltage > 0 and current > 0:
+            if mode == 'Charge':
+                eta_pure = eta_table * (1 + (equivalent_current * REFERENCE_CABLE_RESISTANCE) / voltage)
+                eta_adjusted = eta_pure / (1 + (current * R_new) / voltage)
+            else: # Discharge
+                denominator = 1 - (equivalent_current * REFERENCE_CABLE_RESISTANCE) / voltage
+                if denominator <= 0: return -1.0
+                eta_pure = eta_table / denominator
+                eta_adjusted = eta_pure * (1 - (current * R_new) / voltage)
+
+        if mode == 'Charge': return np.clip(eta_adjusted, 0, 1.0)
+        else: return np.clip(eta_adjusted, -np.inf, 1.0)
+
+    def efficiency_batch(self, modes, voltages, currents, equipment_spec, cable_length_m, cable_area_sqmm):
+        """여러 운전점의 효율을 한 번의 배열 연산으로 계산 (efficiency 와 동일한 규칙)
+
+        전압/전류가 NaN 인 운전점은 NaN, Charge/Discharge 가 아닌 모드는 1.0 을 반환합니다.
+        """
+        R_new = cached_cable_resistance(cable_length_m, cable_area_sqmm)
+        return self.efficiency_batch_resistances(modes, voltages, currents, equipment_spec, [R_new])[0]
+
+    def efficiency_batch_resistances(self, modes, voltages, currents, equipment_spec, cable_resistances):
+        """efficiency_batch 를 여러 배선 저항(Ω)에 대해 한 번에 계산 -> shape (저항 수, 운전점 수)
+
+        보간(효율 맵 조회)은 운전점마다 한 번만 하고 배선 보정만 저항별로 브로드캐스트합니다.
+        """
+        modes = np.asarray(modes, dtype=object)
+        voltages = np.asarray(voltages, dtype=float)
+        currents = np.abs(np.asarray(currents, dtype=float))
+        R_new = np.asarray(cable_resistances, dtype=float).reshape(-1, 1)
+        result = np.ones((len(R_new),) + voltages.shape, dtype=float)
+
+        valid = np.isfinite(voltages) & np.isfinite(currents)
+
+        for mode, (linear, nearest) in self._interpolators.items():
+            is_mode = modes == mode
+            result[:, is_mode & ~valid] = np.nan
+            selected = is_mode & valid
+            if not selected.any(): continue
+
+            scaling_factor = self.scaling_factor(mode, equipment_spec)
+            i_min, i_max, v_min, v_max = self._ranges[mode]
+            voltage = voltages[selected]
+            current = currents[selected]
+            equivalent_current = current / scaling_factor if scaling_factor > 0 else np.zeros_like(current)
+            voltage_clipped = np.clip(voltage, v_min, v_max)
+            current_clipped = np.clip(equivalent_current, i_min, i_max)
+
+            eta_table = linear(current_clipped, voltage_clipped)
+            missing = np.isnan(eta_table)
+            if missing.any():
+                eta_table[missing] = nearest(current_clipped[missing], voltage_clipped[missing])
+
+            eta_adjusted = np.broadcast_to(eta_table, (len(R_new), len(eta_table))).copy()
+            corrected = (voltage > 0) & (current > 0)
+            safe_voltage = np.where(corrected, voltage, 1.0)
+            if mode == 'Charge':
+                eta_pure = eta_table * (1 + (equivalent_current * REFERENCE_CABLE_RESISTANCE) / safe_voltage)
+                eta_adjusted[:, corrected] = (eta_pure / (1 + (current * R_new) / safe_voltage))[:, corrected]
+                result[:, selected] = np.clip(eta_adjusted, 0, 1.0)
+            else: # Discharge
+                denominator = 1 - (equivalent_current * REFERENCE_CABLE_RESISTANCE) / safe_voltage
+                safe_denominator = np.where(denominator > 0, denominator, 1.0)
+                eta_pure = eta_table / safe_denominator
+                eta_adjusted[:, corrected] = (eta_pure * (1 - (current * R_new) / safe_voltage))[:, corrected]
+                eta_adjusted[:, corrected & (denominator <= 0)] = -1.0
+                result[:, selected] = np.clip(eta_adjusted, -np.inf, 1.0)
+        return result
+
+
+# --- 3. 효율 맵 레지스트리 ---
+@lru_cache(maxsize=None)
+def parquet_available():
+    """pd.read_parquet 에 필요한 엔진(pyarrow 또는 fastparquet)이 설치되어 있으면 True"""
+    for module in ('pyarrow', 'fastparquet'):
+        try:
+            __import__(module)
+            return True
+        except ImportError:
+            continue
+    return False
+
+
+def _map_extensions():
+    """읽을 수 있는 효율 맵 확장자 (같은 이름이면 앞쪽 우선 — Parquet 는 엔진이 있을 때만)"""
+    return ('.parquet', '.csv') if parquet_available() else ('.csv',)
+
+
+def load_efficiency_map(path):
+    """효율 맵 파일(CSV/Parquet)을 읽어 검증하고 {모드: (points, values)} 로 변환"""
+    if path.endswith('.parquet'):
+        if not parquet_available(): raise ValueError(f"Parquet 효율 맵 '{os.path.basename(path)}'을 읽으려면 pyarrow 를 설치해야 합니다.")
+        df = pd.read_parquet(path)
+    else:
+        df = pd.read_csv(path)
+    name = os.path.basename(path)
+
+    missing = {'mode', 'voltage', 'current', 'efficiency_pct'} - set(df.columns)
+    if missing:
+        raise ValueError(f"효율 맵 '{name}'에 필수 컬럼이 없습니다: {', '.join(sorted(missing))}")
+    df = df[['mode', 'voltage', 'current', 'efficiency_pct']].copy()
+    df['mode'] = df['mode'].astype(str).str.strip()
+    for col in ['voltage', 'current', 'efficiency_pct']:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+    if df[['voltage', 'current', 'efficiency_pct']].isna().any().any():
+        raise ValueError(f"효율 맵 '{name}'에 숫자가 아니거나 비어 있는 값이 있습니다.")
+    unknown = set(df['mode']) - set(EFFICIENCY_MODES)
+    if unknown:
+        raise ValueError(f"효율 맵 '{name}'에 알 수 없는 모드가 있습니다: {', '.join(sorted(unknown))}")
+
+    tables = {}
+    for mode in EFFICIENCY_MODES:
+        mode_df = df[df['mode'] == mode]
+        voltages, currents = mode_df['voltage'].unique(), mode_df['current'].unique()
+        if len(voltages) < 2 or len(currents) < 2:
+            raise ValueError(f"효율 맵 '{name}'의 {mode} 데이터는 전압/전류가 각각 2개 이상이어야 합니다.")
+        if len(mode_df) != len(voltages) * len(currents) or mode_df.duplicated(['voltage', 'current']).any():
+            raise ValueError(f"효율 맵 '{name}'의 {mode} 데이터가 전압 × 전류 격자를 빠짐없이(중복 없이) 채우지 않습니다.")
+        if (currents <= 0).any():
+            raise ValueError(f"효율 맵 '{name}'의 {mode} 전류는 0보다 커야 합니다.")
+        # 기존 테이블과 같은 점 순서(전류 → 전압)로 정렬해 삼각분할 결과를 동일하게 유지
+        mode_df = mode_df.sort_values(['current', 'voltage'])
+        points = mode_df[['current', 'voltage']].to_numpy(dtype=float)
+        values = mode_df['efficiency_pct'].to_numpy(dtype=float) / 100.0
+        tables[mode] = (points, values)
+    return tables
+
+
+class EfficiencyMapRegistry:
+    """충방전기 모델별 효율 맵을 프로세스당 한 번만 읽고 준비하는 레지스트리 (mtime 변경 시 재로드)
+
+    파일 상태(stat)는 모델마다 check_interval 초에 한 번만 확인합니다.
+    """
+
+    def __init__(self, map_dir=EFFICIENCY_MAP_DIR, check_interval=1.0):
+        self.map_dir = map_dir
+        self.check_interval = check_interval
+        self._entries = {}  # 모델명 -> (경로, mtime, 지문, EfficiencyModel)
+        self._checked_at = {}
+        self._lock = threading.Lock()
+
+    def _path_for(self, name):
+        for ext in _map_extensions():
+            path = os.path.join(self.map_dir, name + ext)
+            if os.path.exists(path): return path
+        raise KeyError(f"효율 맵 '{name}'을(를) 찾을 수 없습니다. ({self.map_dir})")
+
+    def available_models(self):
+        try:
+            files = os.listdir(self.map_dir)
+        except OSError:
+            return []
+        names = {os.path.splitext(f)[0] for f in files if f.endswith(_map_extensions())}
+        return sorted(names, key=lambda n: (n != DEFAULT_CYCLER_MODEL, n))
+
+    def _entry(self, name):
+        entry = self._entries.get(name)
+        now = time.monotonic()
+        if entry is not None and now - self._checked_at.get(name, -np.inf) < self.check_interval:
+            return entry
+        path = self._path_for(name)
+        mtime = os.stat(path).st_mtime_ns
+        self._checked_at[name] = now
+        if entry is not None and entry[0] == path and entry[1] == mtime:
+            return entry
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None or entry[0] != path or entry[1] != mtime:
+                with open(path, 'rb') as f:
+                    fingerprint = hashlib.sha1(f.read()).hexdigest()[:12]
+                entry = (path, mtime, fingerprint, EfficiencyModel(load_efficiency_map(path)))
+                self._entries[name] = entry
+        return entry
+
+    def get_model(self, name=DEFAULT_CYCLER_MODEL):
+        return self._entry(name)[3]
+
+    def fingerprint(self, name=DEFAULT_CYCLER_MODEL):
+        """맵 파일 내용의 지문 (LUT 등 파생 파일의 무효화 키로 사용)"""
+        return self._entry(name)[2]
+
+
+_registry = EfficiencyMapRegistry()
+
+
+def get_registry():
+    return _registry
+
+
+def get_efficiency_model(cycler_model=DEFAULT_CYCLER_MODEL):
+    """프로세스 전체에서 공유되는 효율 모델 (맵 파일이 바뀌지 않는 한 다시 만들지 않음)"""
+    return _registry.get_model(cycler_model)
+
+
+def get_efficiency(mode, voltage, current, equipment_spec, cable_length_m, cable_area_sqmm, cycler_model=DEFAULT_CYCLER_MODEL):
+    return get_efficiency_model(cycler_model).efficiency(mode, voltage, current, equipment_spec, cable_length_m, cable_area_sqmm)
+
+
+def get_efficiency_batch(modes, voltages, currents, equipment_spec, cable_length_m, cable_area_sqmm, use_lut=False, cycler_model=DEFAULT_CYCLER_MODEL):
+    """use_lut=True 이면 사전 계산된 LUT 파일(powercalc.efficiency_lut)이 있을 때 그 값을 사용"""
+    if use_lut:
+        from powercalc.efficiency_lut import lut_efficiency_batch
+        return lut_efficiency_batch(modes, voltages, currents, equipment_spec, cable_length_m, cable_area_sqmm, cycler_model=cycler_model)
+    return get_efficiency_model(cycler_model).efficiency_batch(modes, voltages, currents, equipment_spec, cable_length_m, cable_area_sqmm)
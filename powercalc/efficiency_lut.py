@@ -0,0 +1,159 @@
+"""사전 계산된 고밀도 효율 테이블 (LUT)
+
+효율 맵(충방전기 모델) × 장비 사양 × 배선(길이/단면적) 조합마다 전압 × 전류 격자 위의 효율을 미리 계산해
+.npy 파일로 저장하고, 조회 시에는 memory-map 으로 열어 O(1) 인덱스 연산으로 값을 읽습니다.
+파일은 읽기 전용으로 열리므로 여러 Streamlit 세션/워커 프로세스가 OS 페이지 캐시를 공유합니다.
+
+사전 계산 예:
+    python -m powercalc.efficiency_lut --lengths 3 5 10 --areas 95 150 240
+"""
+import argparse
+import os
+import tempfile
+from functools import lru_cache
+
+import numpy as np
+
+from powercalc.efficiency import DEFAULT_CYCLER_MODEL, EQUIPMENT_SPECS, get_efficiency_model, get_registry
+
+DEFAULT_LUT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'efficiency_lut')
+LUT_VERSION = 1
+LUT_MODES = ('Charge', 'Discharge')
+
+# 격자 범위 (범위를 벗어난 운전점은 정밀 모델로 계산)
+LUT_VOLTAGE_MIN, LUT_VOLTAGE_MAX, LUT_VOLTAGE_POINTS = 2.5, 5.0, 501
+LUT_CURRENT_POINTS = 1001
+
+
+def lut_path(equipment_spec, cable_length_m, cable_area_sqmm, lut_dir=DEFAULT_LUT_DIR, cycler_model=DEFAULT_CYCLER_MODEL):
+    """LUT 파일 경로 (효율 맵 내용의 지문이 포함되어 맵이 바뀌면 자동으로 다른 파일을 사용)"""
+    spec_slug = str(equipment_spec).replace(' ', '')
+    map_tag = f"{cycler_model}-{get_registry().fingerprint(cycler_model)}"
+    return os.path.join(lut_dir, f"v{LUT_VERSION}__{map_tag}__{spec_slug}__L{float(cable_length_m):g}m__A{float(cable_area_sqmm):g}sq.npy")
+
+
+def lut_current_max(equipment_spec, cycler_model=DEFAULT_CYCLER_MODEL):
+    """격자의 전류 상한: 효율 맵의 측정 범위를 장비 사양으로 환산한 최대 전류"""
+    return get_efficiency_model(cycler_model).current_range(equipment_spec)
+
+
+class DenseEfficiencyTable:
+    """(모드, 전압, 전류) 격자 위에 저장된 효율 값을 쌍선형 보간으로 조회"""
+
+    def __init__(self, grid, current_max):
+        self.grid = grid  # shape: (모드, 전압, 전류)
+        self.current_max = current_max
+        self._v_step = (LUT_VOLTAGE_MAX - LUT_VOLTAGE_MIN) / (LUT_VOLTAGE_POINTS - 1)
+        self._i_step = current_max / (LUT_CURRENT_POINTS - 1)
+
+    def in_domain(self, voltages, currents):
+        currents = np.abs(currents)
+        return ((voltages >= LUT_VOLTAGE_MIN) & (voltages <= LUT_VOLTAGE_MAX)
+                & (currents <= self.current_max) & np.isfinite(currents))
+
+    def lookup(self, mode_index, voltages, currents):
+        """in_domain 이 참인 운전점만 전달해야 합니다."""
+        v_pos = (voltages - LUT_VOLTAGE_MIN) / self._v_step
+        i_pos = np.abs(currents) / self._i_step
+        v0 = np.minimum(v_pos.astype(np.intp), LUT_VOLTAGE_POINTS - 2)
+        i0 = np.minimum(i_pos.astype(np.intp), LUT_CURRENT_POINTS - 2)
+        dv, di = v_pos - v0, i_pos - i0
+        g = self.grid
+        return ((g[mode_index, v0, i0] * (1 - dv) + g[mode_index, v0 + 1, i0] * dv) * (1 - di)
+                + (g[mode_index, v0, i0 + 1] * (1 - dv) + g[mode_index, v0 + 1, i0 + 1] * dv) * di)
+
+
+def build_lut(equipment_spec, cable_length_m, cable_area_sqmm, lut_dir=DEFAULT_LUT_DIR, cycler_model=DEFAULT_CYCLER_MODEL):
+    """정밀 모델로 격자를 계산해 .npy 로 저장 (다른 프로세스와 충돌하지 않도록 원자적으로 교체)"""
+    model = get_efficiency_model(cycler_model)
+    voltages = np.linspace(LUT_VOLTAGE_MIN, LUT_VOLTAGE_MAX, LUT_VOLTAGE_POINTS)
+    currents = np.linspace(0.0, lut_current_max(equipment_spec, cycler_model), LUT_CURRENT_POINTS)
+    v_grid, i_grid = np.meshgrid(voltages, currents, indexing='ij')
+    grid = np.empty((len(LUT_MODES), LUT_VOLTAGE_POINTS, LUT_CURRENT_POINTS), dtype=np.float64)
+    for k, mode in enumerate(LUT_MODES):
+        modes = np.full(v_grid.size, mode, dtype=object)
+        grid[k] = model.efficiency_batch(modes, v_grid.ravel(), i_grid.ravel(),
+                                         equipment_spec, cable_length_m, cable_area_sqmm).reshape(v_grid.shape)
+
+    os.makedirs(lut_dir, exist_ok=True)
+    path = lut_path(equipment_spec, cable_length_m, cable_area_sqmm, lut_dir, cycler_model)
+    fd, tmp_path = tempfile.mkstemp(dir=lut_dir, suffix='.npy.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.save(f, grid)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path): os.remove(tmp_path)
+        raise
+    return path
+
+
+def precompute_luts(equipment_specs=EQUIPMENT_SPECS, cable_lengths=(3.0,), cable_areas=(150.0,), lut_dir=DEFAULT_LUT_DIR, overwrite=False, cycler_model=DEFAULT_CYCLER_MODEL):
+    """장비 사양 × 배선 길이 × 단면적 전체 조합의 LUT 를 생성하고 생성된 경로 목록을 반환"""
+    paths = []
+    for spec in equipment_specs:
+        for length in cable_lengths:
+            for area in cable_areas:
+                path = lut_path(spec, length, area, lut_dir, cycler_model)
+                if overwrite or not os.path.exists(path):
+                    build_lut(spec, length, area, lut_dir, cycler_model)
+                paths.append(path)
+    return paths
+
+
+@lru_cache(maxsize=64)
+def _open_lut(path, mtime):
+    return np.load(path, mmap_mode='r')
+
+
+def get_dense_table(equipment_spec, cable_length_m, cable_area_sqmm, lut_dir=DEFAULT_LUT_DIR, cycler_model=DEFAULT_CYCLER_MODEL):
+    """LUT 파일이 있으면 memory-map 으로 연 테이블을, 없으면 None 을 반환"""
+    path = lut_path(equipment_spec, cable_length_m, cable_area_sqmm, lut_dir, cycler_model)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    current_max = lut_current_max(equipment_spec, cycler_model)
+    if current_max <= 0: return None
+    return DenseEfficiencyTable(_open_lut(path, mtime), current_max)
+
+
+def lut_efficiency_batch(modes, voltages, currents, equipment_spec, cable_length_m, cable_area_sqmm, lut_dir=DEFAULT_LUT_DIR, cycler_model=DEFAULT_CYCLER_MODEL):
+    """get_efficiency_batch 와 같은 규칙이지만 LUT 범위 안의 운전점은 LUT 에서 읽음 (LUT 가 없으면 정밀 모델)"""
+    model = get_efficiency_model(cycler_model)
+    table = get_dense_table(equipment_spec, cable_length_m, cable_area_sqmm, lut_dir, cycler_model)
+    if table is None:
+        return model.efficiency_batch(modes, voltages, currents, equipment_spec, cable_length_m, cable_area_sqmm)
+
+    modes = np.asarray(modes, dtype=object)
+    voltages = np.asarray(voltages, dtype=float)
+    currents = np.asarray(currents, dtype=float)
+    result = np.empty(voltages.shape, dtype=float)
+    from_lut = np.zeros(voltages.shape, dtype=bool)
+    for k, mode in enumerate(LUT_MODES):
+        selected = (modes == mode) & table.in_domain(voltages, currents)
+        if selected.any():
+            result[selected] = table.lookup(k, voltages[selected], currents[selected])
+            from_lut |= selected
+    rest = ~from_lut
+    if rest.any():
+        result[rest] = model.efficiency_batch(modes[rest], voltages[rest], currents[rest],
+                                              equipment_spec, cable_length_m, cable_area_sqmm)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="충방전기 효율 LUT 사전 계산")
+    parser.add_argument('--specs', nargs='*', default=list(EQUIPMENT_SPECS), help="장비 사양 (예: '60A - 300A')")
+    parser.add_argument('--lengths', nargs='*', type=float, default=[3.0], help="배선 길이 (m)")
+    parser.add_argument('--areas', nargs='*', type=float, default=[150.0], help="배선 단면적 (SQ)")
+    parser.add_argument('--model', default=DEFAULT_CYCLER_MODEL, help="효율 맵(충방전기 모델) 이름")
+    parser.add_argument('--lut-dir', default=DEFAULT_LUT_DIR)
+    parser.add_argument('--overwrite', action='store_true')
+    args = parser.parse_args()
+    for path in precompute_luts(args.specs, args.lengths, args.areas, args.lut_dir, args.overwrite, args.model):
+        print(path)
+
+
+if __name__ == '__main__':
+    main()
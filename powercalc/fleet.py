@@ -0,0 +1,160 @@
+"""채널/장비별 시작 시차를 반영한 설비 전력 (플릿 시뮬레이션)
+
+기본 계산은 모든 테스트 채널이 같은 스텝을 동시에 실행한다고 보지만(최악의 동시 피크), 실제 현장에서는
+채널이나 장비(프레임)마다 수 분~수 시간씩 시작 시각이 다릅니다.
+
+채널 i 의 시작 시차를 o_i 라 하면 설비 전력은
+    P(t) = 대기전력 x 장비 대수 + Σ_i p_ch(t - o_i)
+입니다. 시차를 샘플링 간격 단위로 맞추면 이 합은 채널 전력 트레이스 p_ch 와
+'시차별 채널 수' 히스토그램의 합성곱이 되므로, 채널 수와 무관하게 FFT 로 계산됩니다.
+채널 전력 트레이스는 iter_power_trace 의 청크마다 합성곱해 이어 붙이므로(overlap-add) 전체 트레이스를 만들지 않습니다.
+"""
+import math
+from dataclasses import dataclass
+
+import numpy as np
+from scipy.signal import fftconvolve
+
+from powercalc.power_trace import TRACE_RESOLUTIONS, iter_power_trace
+from powercalc.result_cache import ResultCache, content_key
+
+OFFSET_DISTRIBUTIONS = ('lockstep', 'interval', 'uniform', 'normal')
+OFFSET_GRANULARITIES = ('frame', 'channel')
+FLEET_MAX_SAMPLES = 2_000_000  # 화면용 플릿 시계열의 최대 샘플 수 (넘으면 샘플링 간격을 늘림)
+
+
+@dataclass(frozen=True)
+class StartOffsetDistribution:
+    """시작 시차 분포 (H)
+
+    lockstep: 모두 동시에 시작, interval: 단위마다 spread_h 씩 순서대로 늦게 시작,
+    uniform: 0 ~ spread_h 균등 분포, normal: 평균 spread_h, 표준편차 std_h 의 정규 분포 (음수는 0)
+    """
+    kind: str = 'uniform'
+    spread_h: float = 1.0
+    std_h: float = 0.5
+
+    def sample(self, n, rng=None):
+        rng = np.random.default_rng(rng)
+        if self.kind == 'lockstep': return np.zeros(n)
+        if self.kind == 'interval': return np.arange(n) * self.spread_h
+        if self.kind == 'uniform': return rng.uniform(0.0, self.spread_h, n)
+        if self.kind == 'normal': return np.maximum(rng.normal(self.spread_h, self.std_h, n), 0.0)
+        raise ValueError(f"알 수 없는 시차 분포입니다: {self.kind} (가능한 값: {', '.join(OFFSET_DISTRIBUTIONS)})")
+
+    def max_offset_h(self, n):
+        """n 개 단위 시차의 최댓값 (정규 분포는 평균 + 4 x 표준편차로 어림)"""
+        if self.kind == 'interval': return max(n - 1, 0) * self.spread_h
+        if self.kind == 'uniform': return self.spread_h
+        if self.kind == 'normal': return max(self.spread_h + 4 * self.std_h, 0.0)
+        return 0.0
+
+
+@dataclass
+class FleetResult:
+    """플릿 시뮬레이션 결과 (power_kw[k] 는 시각 k x resolution_h 의 설비 전력)"""
+    resolution_h: float
+    power_kw: np.ndarray
+    offsets_h: np.ndarray  # 단위(장비 또는 채널)별 시작 시차
+    lockstep_peak_kw: float
+
+    @property
+    def times(self):
+        return np.arange(len(self.power_kw)) * self.resolution_h
+
+    @property
+    def peak_kw(self):
+        return float(self.power_kw.max()) if len(self.power_kw) else 0.0
+
+    @property
+    def peak_time_h(self):
+        return float(np.argmax(self.power_kw)) * self.resolution_h if len(self.power_kw) else 0.0
+
+    @property
+    def energy_kwh(self):
+        return float(self.power_kw.sum()) * self.resolution_h
+
+    @property
+    def diversity_factor(self):
+        """동시 실행 대비 피크 비율 (1 이면 시차 효과 없음)"""
+        return self.peak_kw / self.lockstep_peak_kw if self.lockstep_peak_kw > 0 else 1.0
+
+
+def iter_channel_power(result, resolution_h):
+    """레시피 결과의 채널 1개 전력(W, 회생은 음수)을 resolution_h 간격으로 샘플링한 청크 배열을 생성"""
+    specs = result.trace_context[3]
+    standby_kw = specs.standby_power * specs.required_equipment / 1000.0
+    for chunk in iter_power_trace(result, resolution_h):
+        yield (chunk.power_kw - standby_kw) * 1000.0 / specs.test_channels if specs.test_channels > 0 else np.zeros(len(chunk))
+
+
+def channel_power_trace(result, resolution_h):
+    """레시피 결과의 채널 1개 전력(W, 회생은 음수)을 resolution_h 간격으로 샘플링한 배열"""
+    chunks = list(iter_channel_power(result, resolution_h))
+    return np.concatenate(chunks) if chunks else np.zeros(0)
+
+
+def fleet_resolution(total_h, resolution_h, max_samples=FLEET_MAX_SAMPLES):
+    """플릿 시계열(total_h: 레시피 길이 + 최대 시차)의 샘플링 간격 — resolution_h 로 샘플이 max_samples 를 넘으면
+    TRACE_RESOLUTIONS 중 넘지 않는 가장 작은 간격"""
+    for candidate in sorted(v for v in TRACE_RESOLUTIONS.values() if v >= resolution_h):
+        if total_h / candidate <= max_samples: return max(candidate, resolution_h)
+    return max(max(TRACE_RESOLUTIONS.values()), resolution_h, total_h / max_samples)
+
+
+def unit_channel_counts(specs, granularity):
+    """시차를 주는 단위별 채널 수 (frame: 장비마다 컨트롤 채널 수, 마지막 장비는 나머지 / channel: 모두 1)"""
+    if granularity == 'channel': return np.ones(specs.test_channels, dtype=np.int64)
+    if granularity != 'frame':
+        raise ValueError(f"알 수 없는 시차 단위입니다: {granularity} (가능한 값: {', '.join(OFFSET_GRANULARITIES)})")
+    num_full, rem_ch = divmod(specs.test_channels, specs.control_channels)
+    return np.array([specs.control_channels] * num_full + ([rem_ch] if rem_ch else []), dtype=np.int64)
+
+
+def simulate_fleet(result, distribution, granularity='frame', resolution_h=1 / 60, seed=None, offsets_h=None):
+    """시작 시차를 반영한 설비 전력 시계열 (offsets_h 를 주면 분포 대신 단위별 시차로 사용)
+
+    전력은 첫 단위 시작부터 마지막 단위가 끝날 때까지 계산하며, 대기전력은 전 기간 모든 장비에 포함됩니다.
+    """
+    specs = result.trace_context[3]
+    counts = unit_channel_counts(specs, granularity)
+    offsets_h = distribution.sample(len(counts), seed) if offsets_h is None else np.asarray(offsets_h, dtype=float)
+    if len(offsets_h) != len(counts): raise ValueError(f"시차 개수({len(offsets_h)})가 단위 수({len(counts)})와 다릅니다.")
+    if not np.isfinite(offsets_h).all() or (offsets_h < 0).any(): raise ValueError("시작 시차는 0 이상의 유한한 값이어야 합니다.")
+
+    # 시차별 채널 수 히스토그램 (시차는 샘플링 간격 단위로 반올림)
+    offset_samples = np.rint(offsets_h / resolution_h).astype(np.int64)
+    channels_per_offset = np.bincount(offset_samples, weights=counts, minlength=1)
+
+    # overlap-add: 청크마다 합성곱해 확정된 앞부분만 이어 붙이고, 뒤로 넘치는 부분(len(히스토그램) - 1)은 다음 청크에 더함
+    pieces, carry, channel_peak_w = [], np.zeros(len(channels_per_offset) - 1), -math.inf
+    shifts = np.flatnonzero(channels_per_offset)
+    for channel_w in iter_channel_power(result, resolution_h):
+        channel_peak_w = max(channel_peak_w, float(channel_w.max()))
+        n = len(channel_w) + len(channels_per_offset) - 1
+        if len(shifts) * len(channel_w) <= 3 * n * math.log2(n + 1):
+            # 시차 종류가 적으면(장비 단위 등) 밀어서 더하는 쪽이 FFT 보다 빠름
+            convolved = np.zeros(n)
+            for shift in shifts: convolved[shift:shift + len(channel_w)] += channels_per_offset[shift] * channel_w
+        else:
+            convolved = fftconvolve(channel_w, channels_per_offset)
+        convolved[:len(carry)] += carry
+        pieces.append(convolved[:len(channel_w)])
+        carry = convolved[len(channel_w):]
+    summed_w = np.concatenate(pieces + [carry]) if pieces else np.zeros(len(channels_per_offset))
+
+    standby_kw = specs.standby_power * specs.required_equipment / 1000.0
+    lockstep_peak_kw = standby_kw + channel_peak_w * specs.test_channels / 1000.0 if pieces else standby_kw
+    return FleetResult(resolution_h, standby_kw + summed_w / 1000.0, offsets_h, lockstep_peak_kw)
+
+
+_fleet_cache = ResultCache(max_entries=8, namespace='fleet')  # 메모리만 사용 (시계열이 커서 디스크에 두지 않음)
+
+
+def cached_simulate_fleet(result_key, result, distribution, granularity='frame', resolution_h=1 / 60, seed=None):
+    """simulate_fleet 결과를 (결과 지문 result_key, 분포, 단위, 시드, 간격) 기준으로 캐시해 반환"""
+    key = content_key('fleet', {'result': result_key, 'distribution': [distribution.kind, distribution.spread_h, distribution.std_h],
+                                'granularity': granularity, 'seed': seed, 'resolution_h': resolution_h})
+    fleet, _ = _fleet_cache.get_or_compute(key, lambda: simulate_fleet(result, distribution, granularity, resolution_h, seed))
+    return fleet
+
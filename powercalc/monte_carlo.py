@@ -0,0 +1,65 @@
+"""입력 불확실성을 반영한 몬테카를로 분석
+
+셀 용량, 효율, 배선 길이, 대기전력 등의 입력을 분포로 주고 N 개 표본을 뽑아 scenario_engine 으로
+한 번에(또는 프로세스 풀에서 나눠) 계산한 뒤, 총 전력량과 최대 피크 전력의 P50/P90/P99 를 구합니다.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from powercalc.recipe_engine import CyclerSpecs
+from powercalc.scenario_engine import ScenarioSet, simulate_scenarios_parallel
+
+DISTRIBUTION_KINDS = ('fixed', 'normal', 'uniform', 'triangular')
+PERCENTILES = (50, 90, 99)
+MONTE_CARLO_METRICS = ('total_kwh', 'max_peak_power')
+
+
+@dataclass(frozen=True)
+class InputDistribution:
+    """입력 하나의 분포 (spread 는 기준값 대비 비율, 예: 0.05 = ±5%)
+
+    normal: 표준편차 = 기준값 x spread, uniform/triangular: 기준값 x (1 ± spread) 범위 (triangular 는 기준값이 최빈값)
+    """
+    kind: str = 'fixed'
+    spread: float = 0.0
+
+    def sample(self, base, n, rng):
+        if self.kind == 'fixed' or self.spread == 0: return np.full(n, float(base))
+        width = abs(base) * self.spread
+        if self.kind == 'normal': return rng.normal(base, width, n)
+        if self.kind == 'uniform': return rng.uniform(base - width, base + width, n)
+        if self.kind == 'triangular': return rng.triangular(base - width, base, base + width, n)
+        raise ValueError(f"알 수 없는 분포입니다: {self.kind} (가능한 값: {', '.join(DISTRIBUTION_KINDS)})")
+
+
+@dataclass
+class MonteCarloResult:
+    """표본별 결과(samples: 입력 표본 + SUMMARY_COLUMNS)와 지표별 백분위수"""
+    samples: pd.DataFrame
+
+    def percentiles(self, metrics=MONTE_CARLO_METRICS, percentiles=PERCENTILES):
+        """행: 지표, 열: 'P50' 등"""
+        values = np.percentile(self.samples[list(metrics)].to_numpy(dtype=float), percentiles, axis=0)
+        return pd.DataFrame(values.T, index=list(metrics), columns=[f"P{p}" for p in percentiles])
+
+
+def sample_scenarios(specs, distributions, n_samples, seed=None):
+    """distributions ({ScenarioSet 항목: InputDistribution}) 로 표본 시나리오를 뽑음 (음수 표본은 0)"""
+    if not isinstance(specs, CyclerSpecs): specs = CyclerSpecs.from_mapping(specs)
+    rng = np.random.default_rng(seed)
+    overrides = {}
+    for name, distribution in distributions.items():
+        base = getattr(specs, name, 1.0)
+        values = np.maximum(distribution.sample(base, n_samples, rng), 0.0)
+        overrides[name] = np.rint(values).astype(np.int64) if name.endswith('_channels') else values
+    return ScenarioSet.from_specs(specs, n_samples, **overrides)
+
+
+def run_monte_carlo(recipe_df, specs, distributions, n_samples=1000, cp_cccv_details=None, repetition_count=1, seed=None, workers=1):
+    """표본 n_samples 개를 계산해 MonteCarloResult 를 반환 (workers > 1 이면 프로세스 풀 사용)"""
+    scenarios = sample_scenarios(specs, distributions, n_samples, seed)
+    summary = simulate_scenarios_parallel(recipe_df, specs, scenarios, cp_cccv_details, repetition_count, workers=workers)
+    inputs = pd.DataFrame({name: getattr(scenarios, name) for name in distributions})
+    return MonteCarloResult(pd.concat([inputs, summary], axis=1))
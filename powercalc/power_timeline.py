@@ -0,0 +1,146 @@
+"""전력 타임라인 인덱스 (계단 함수 + 누적 전력량)
+
+설비 전력을 '구간 시작 시각 / 구간 전력 / 구간 전력량' 배열로 보관하고, 구간 전력량의 누적합(prefix sum)과
+구간 최댓값 희소 테이블(sparse table, 처음 조회할 때 생성)을 만들어 아래 조회를 이분 탐색 한 번(O(log n))으로 처리합니다.
+조회 함수는 시각 하나 또는 시각 배열을 받습니다.
+
+- value_at(t): 시각 t 의 전력 (kW)
+- energy(a, b) / average_power(a, b): [a, b] 구간 전력량 (kWh) / 평균 전력 (kW)
+- max_in_window(a, b) / peak_in_window(a, b): [a, b) 와 겹치는 구간의 최대 전력 / (시각, 최대 전력)
+
+구간 i 는 [times[i], times[i+1]) 동안 values[i] kW 이며 마지막 구간은 end 까지입니다. 길이가 0 인 구간은 버립니다.
+구간 전력량(energies)을 따로 주면(CCCV 처럼 평균 전력과 표시 전력이 다른 스텝) 구간 안에서는 선형으로 나눠 셉니다.
+"""
+import numpy as np
+
+from powercalc.power_trace import step_curve
+
+
+class PowerTimeline:
+    """계단 함수 전력 타임라인 (구간 시작 시각 times, 구간 전력 values, 마지막 구간 종료 시각 end)"""
+
+    def __init__(self, times, values, end=None, energies=None):
+        times, values = np.asarray(times, dtype=float), np.asarray(values, dtype=float)
+        if end is None: end = times[-1] if len(times) else 0.0
+        ends = np.append(times[1:], end)
+        durations = ends - times
+        energies = values * durations if energies is None else np.asarray(energies, dtype=float)
+        keep = durations > 0
+        self.times, self.ends, self.values = times[keep], ends[keep], values[keep]
+        self.durations, self.energies = durations[keep], energies[keep]
+        self.cumulative_energy = np.concatenate([[0.0], np.cumsum(self.energies)])
+        self._knots = np.append(self.times, self.ends[-1:])  # 누적 전력량이 꺾이는 시각 (구간 안에서는 선형)
+        self._sparse = None
+
+    @classmethod
+    def from_segments(cls, durations, values, energies=None, start=0.0):
+        """연속된 구간 (구간 길이 H, 전력 kW, 선택: 구간 전력량 kWh) 로 생성"""
+        durations = np.asarray(durations, dtype=float)
+        bounds = start + np.concatenate([[0.0], np.cumsum(durations)])
+        return cls(bounds[:-1], values, end=bounds[-1], energies=energies)
+
+    @classmethod
+    def from_step_curve(cls, starts, ends, powers, energies=None):
+        """power_trace.step_curve 결과 (시작 시각, 종료 시각, 전력) 로 생성"""
+        return cls(starts, powers, end=ends[-1] if len(ends) else 0.0, energies=energies)
+
+    @classmethod
+    def from_result(cls, result):
+        """RecipeResult 의 실행 순서대로 설비 전력 타임라인 (구간 전력량은 결과표의 전력량(kWh))"""
+        order = np.fromiter(result.iter_row_indices(), dtype=np.intp)
+        energies = result.steps['전력량(kWh)'].to_numpy(dtype=float)[order]
+        energies = energies[result.steps['실제 테스트 시간(H)'].to_numpy(dtype=float)[order] > 0]
+        return cls.from_step_curve(*step_curve(result), energies=energies)
+
+    def __len__(self):
+        return len(self.values)
+
+    @property
+    def start(self):
+        return float(self.times[0]) if len(self) else 0.0
+
+    @property
+    def end(self):
+        return float(self.ends[-1]) if len(self) else 0.0
+
+    @property
+    def total_energy(self):
+        return float(self.cumulative_energy[-1])
+
+    @property
+    def max_value(self):
+        """전체 최대 전력 (빈 타임라인은 0)"""
+        return float(self.values.max()) if len(self) else 0.0
+
+    # --- 시각 조회 ---
+    def _segment_at(self, t):
+        """t 를 포함하는 구간 번호 (범위 밖은 가장 가까운 구간)"""
+        return np.clip(np.searchsorted(self.times, t, side='right') - 1, 0, max(len(self) - 1, 0))
+
+    def value_at(self, t):
+        """시각 t 의 전력 (타임라인 범위 밖은 0)"""
+        t = np.asarray(t, dtype=float)
+        if not len(self): return np.zeros_like(t)[()]
+        inside = (t >= self.times[0]) & (t < self.ends[-1])
+        return np.where(inside, self.values[self._segment_at(t)], 0.0)[()]
+
+    def energy_until(self, t):
+        """타임라인 시작부터 t 까지의 전력량 (kWh)"""
+        t = np.asarray(t, dtype=float)
+        if not len(self): return np.zeros_like(t)[()]
+        return np.interp(t, self._knots, self.cumulative_energy)[()]
+
+    def energy(self, a, b):
+        """[a, b] 구간 전력량 (kWh)"""
+        return np.subtract(self.energy_until(b), self.energy_until(a))[()]
+
+    def average_power(self, a, b):
+        """[a, b] 구간 평균 전력 (kW, 길이가 0 인 구간은 그 시각의 전력)"""
+        a, b = np.asarray(a, dtype=float), np.asarray(b, dtype=float)
+        width = b - a
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(width > 0, self.energy(a, b) / np.where(width > 0, width, 1.0), self.value_at(a))[()]
+
+    # --- 구간 최댓값 ---
+    def _sparse_table(self):
+        """table[j][i]: i 부터 2^j 개 구간 중 최대 전력 구간 번호 (같으면 앞 구간, 메모리를 줄이려고 int32)"""
+        if self._sparse is None:
+            table = [np.arange(len(self), dtype=np.int32)]
+            width = 1
+            while 2 * width <= len(self):
+                prev = table[-1]
+                left, right = prev[:-width], prev[width:]
+                table.append(np.where(self.values[left] >= self.values[right], left, right))
+                width *= 2
+            self._sparse = table
+        return self._sparse
+
+    def _window_argmax(self, a, b):
+        """[a, b) 와 겹치는 구간 중 최대 전력 구간 번호 (b <= a 이면 a 를 포함하는 구간, 겹치는 구간이 없으면 -1)"""
+        a, b = np.broadcast_arrays(np.asarray(a, dtype=float), np.asarray(b, dtype=float))
+        first = np.searchsorted(self.ends, a, side='right')
+        last = np.where(b > a, np.searchsorted(self.times, b, side='left') - 1, first)
+        valid = (first <= last) & (first < len(self)) & (last >= 0)
+        first, last = np.where(valid, first, 0), np.where(valid, last, 0)
+        valid &= (b > a) | (self.times[first] <= a)
+        table = self._sparse_table()
+        level = np.floor(np.log2(last - first + 1)).astype(np.int64)
+        best = np.empty(first.shape, dtype=np.int64)
+        for j in np.unique(level):
+            mask = level == j
+            left, right = table[j][first[mask]], table[j][last[mask] - (1 << j) + 1]
+            best[mask] = np.where(self.values[left] >= self.values[right], left, right)
+        return np.where(valid, best, -1)
+
+    def max_in_window(self, a, b):
+        """[a, b) 와 겹치는 구간의 최대 전력 (겹치는 구간이 없으면 NaN)"""
+        if not len(self): return np.full(np.broadcast(a, b).shape, np.nan)[()]
+        idx = self._window_argmax(a, b)
+        return np.where(idx >= 0, self.values[np.maximum(idx, 0)], np.nan)[()]
+
+    def peak_in_window(self, a, b):
+        """(최대 전력 시각, 최대 전력) — 시각은 최대 전력 구간이 창 안에서 시작하는 시각"""
+        if not len(self): return float(a), float('nan')
+        idx = int(self._window_argmax(float(a), float(b)))
+        if idx < 0: return float(a), float('nan')
+        return max(float(self.times[idx]), float(a)), float(self.values[idx])
@@ -0,0 +1,197 @@
+"""균일 샘플링 설비 전력 트레이스 (청크 단위 스트리밍)
+
+레시피 시뮬레이션 결과(RecipeResult)를 resolution_h 간격(예: 1초 = 1/3600 H)으로 샘플링한 설비 전력(kW)을
+고정 크기 NumPy 청크로 하나씩 생성합니다. 전체 트레이스를 메모리에 올리지 않으므로 수 주~수 개월 길이의
+시험도 피크/전력량/히스토그램 계산이나 파일 저장을 청크 단위로 처리할 수 있습니다.
+
+샘플 k 의 값은 시각 k·resolution_h 에 실행 중인 스텝의 전력입니다 (CCCV 충전 스텝은 CV 감쇠를 반영).
+
+샘플링 없이 스텝 경계만으로 표현한 계단 함수(step_curve)와 여러 레시피의 계단 함수 합(merge_step_curves),
+그래프용 점 줄이기(decimate_plot_coords)도 제공합니다.
+"""
+import math
+from dataclasses import dataclass
+from itertools import zip_longest
+
+import numpy as np
+
+from powercalc.recipe_engine import plant_power_kw
+from powercalc.result_cache import ResultCache, content_key
+
+DEFAULT_CHUNK_SIZE = 65536
+TRACE_RESOLUTIONS = {'1초': 1 / 3600, '1분': 1 / 60, '15분': 0.25, '1시간': 1.0}
+
+
+@dataclass
+class PowerTraceChunk:
+    """균일 샘플 전력 트레이스의 한 조각 (start_index: 첫 샘플 번호)"""
+    start_index: int
+    resolution_h: float
+    power_kw: np.ndarray
+
+    @property
+    def times(self):
+        """각 샘플의 시각 (H)"""
+        return (self.start_index + np.arange(len(self.power_kw))) * self.resolution_h
+
+    def __len__(self):
+        return len(self.power_kw)
+
+
+def iter_power_trace(result, resolution_h, chunk_size=DEFAULT_CHUNK_SIZE):
+    """RecipeResult 의 설비 전력을 resolution_h 간격으로 샘플링해 PowerTraceChunk 를 생성 (마지막 청크만 짧을 수 있음)"""
+    if resolution_h <= 0: raise ValueError("샘플링 간격은 0 보다 커야 합니다.")
+    steps = result.steps
+    durations = steps['실제 테스트 시간(H)'].to_numpy(dtype=float)
+    powers = steps['전력(kW)'].to_numpy(dtype=float)
+    is_cccv = ((steps['테스트'] == 'CCCV') & (steps['모드'] == 'Charge')).to_numpy()
+    specs = result.trace_context[3] if result.trace_context else None
+    profiles = {}
+
+    buffer = np.empty(chunk_size)
+    filled, chunk_start = 0, 0
+    step_start_h, next_sample = 0.0, 0
+    for row in result.iter_row_indices():
+        duration = durations[row]
+        if duration <= 0: continue
+        step_end_h = step_start_h + duration
+        end_sample = math.ceil(step_end_h / resolution_h)
+        profile = None
+        if is_cccv[row]:
+            if row not in profiles: profiles[row] = result.step_profile(row)
+            profile = profiles[row]
+
+        sample = next_sample
+        while sample < end_sample:
+            n = min(end_sample - sample, chunk_size - filled)
+            if profile is None:
+                buffer[filled:filled + n] = powers[row]
+            else:
+                local_h = np.maximum(np.arange(sample, sample + n) * resolution_h - step_start_h, 0.0)
+                buffer[filled:filled + n] = plant_power_kw(profile.power_w(local_h), specs)
+            filled += n
+            sample += n
+            if filled == chunk_size:
+                yield PowerTraceChunk(chunk_start, resolution_h, buffer.copy())
+                chunk_start += chunk_size
+                filled = 0
+        next_sample = max(next_sample, end_sample)
+        step_start_h = step_end_h
+
+    if filled:
+        yield PowerTraceChunk(chunk_start, resolution_h, buffer[:filled].copy())
+
+
+def sum_power_traces(traces):
+    """같은 간격/청크 크기로 만든 여러 트레이스의 합 (먼저 끝난 트레이스는 이후 0 kW)"""
+    for chunks in zip_longest(*traces):
+        present = [c for c in chunks if c is not None]
+        length = max(len(c) for c in present)
+        total = np.zeros(length)
+        for c in present: total[:len(c)] += c.power_kw
+        yield PowerTraceChunk(present[0].start_index, present[0].resolution_h, total)
+
+
+def summarize_power_trace(chunks, histogram_bins=None):
+    """트레이스를 한 번 훑으며 피크(시각 포함)/전력량/샘플 수/히스토그램(선택: 구간 경계 배열)을 계산"""
+    peak_kw, peak_time_h, energy_kwh, samples = -math.inf, 0.0, 0.0, 0
+    histogram = np.zeros(len(histogram_bins) - 1, dtype=np.int64) if histogram_bins is not None else None
+    for chunk in chunks:
+        if not len(chunk): continue
+        i = int(np.argmax(chunk.power_kw))
+        if chunk.power_kw[i] > peak_kw:
+            peak_kw, peak_time_h = float(chunk.power_kw[i]), (chunk.start_index + i) * chunk.resolution_h
+        energy_kwh += float(chunk.power_kw.sum()) * chunk.resolution_h
+        samples += len(chunk)
+        if histogram is not None: histogram += np.histogram(chunk.power_kw, bins=histogram_bins)[0]
+    return {'peak_kw': peak_kw if samples else 0.0, 'peak_time_h': peak_time_h, 'energy_kwh': energy_kwh,
+            'samples': samples, 'histogram': histogram}
+
+
+_summary_cache = ResultCache(max_entries=32, namespace='trace_summary')  # 메모리만 사용
+
+
+def cached_trace_summary(result_keys, results, resolution_h):
+    """여러 레시피 결과를 0H 에 함께 시작한 종합 트레이스의 summarize_power_trace 값 (결과 지문 result_keys 와 간격 기준으로 캐시)"""
+    key = content_key('trace_summary', {'results': list(result_keys), 'resolution_h': resolution_h})
+    summary, _ = _summary_cache.get_or_compute(
+        key, lambda: summarize_power_trace(sum_power_traces([iter_power_trace(result, resolution_h) for result in results])))
+    return summary
+
+
+def write_power_trace_csv(chunks, file):
+    """트레이스를 '시간(H),전력(kW)' CSV 로 청크 단위로 기록 (file: 텍스트 파일 객체)"""
+    file.write("시간(H),전력(kW)\n")
+    for chunk in chunks:
+        np.savetxt(file, np.column_stack([chunk.times, chunk.power_kw]), delimiter=',', fmt='%.6f')
+
+
+# --- 스텝 경계 계단 함수 ---
+def step_curve(result):
+    """실행 순서대로의 (시작 시각, 종료 시각, 전력 kW) 배열 — 시간이 0 인 스텝은 제외"""
+    order = np.fromiter(result.iter_row_indices(), dtype=np.intp)
+    durations = result.steps['실제 테스트 시간(H)'].to_numpy(dtype=float)[order]
+    powers = result.steps['전력(kW)'].to_numpy(dtype=float)[order]
+    keep = durations > 0
+    durations, powers = durations[keep], powers[keep]
+    ends = np.cumsum(durations)
+    starts = np.concatenate([[0.0], ends[:-1]])
+    return starts, ends, powers
+
+
+def step_plot_coords(starts, ends, powers):
+    """계단 함수를 선 그래프 좌표로 변환 — 스텝마다 (시작, 이전 전력), (시작, 전력), (종료, 전력) 세 점"""
+    if not len(powers): return np.zeros(1), np.zeros(1)
+    previous = np.concatenate([powers[:1], powers[:-1]])
+    times = np.column_stack([starts, starts, ends]).ravel()
+    values = np.column_stack([previous, powers, powers]).ravel()
+    return times, values
+
+
+def merge_step_curves(curves, hold_last=True):
+    """여러 계단 함수의 합 — (시각 배열, 합계 전력 배열)
+
+    curves: step_curve 결과 목록 (시작 시각을 옮기면 시작 시차 반영). 시각은 0, 각 레시피 시작 시각, 모든 스텝 종료 시각이며, 각 시각의 값은
+    그 시각에 시작하는 스텝의 전력 (오른쪽 연속). hold_last 이면 먼저 끝난 레시피는 마지막 스텝 전력을 유지하고,
+    아니면 끝난 뒤(그리고 시작 전)는 0 kW 입니다. 모든 전력 변화량을 시각 순으로 정렬해 누적합 한 번으로 계산하므로
+    레시피 수와 반복 횟수가 늘어도 NumPy 정렬 비용만 듭니다.
+    """
+    curves = [(starts, ends, powers) for starts, ends, powers in curves if len(powers)]
+    timeline = np.unique(np.concatenate([[0.0], *(starts[:1] for starts, _, _ in curves), *(ends for _, ends, _ in curves)]))
+    if not curves: return timeline, np.zeros(len(timeline))
+    event_times = [starts for starts, _, _ in curves]
+    deltas = [np.diff(powers, prepend=0.0) for _, _, powers in curves]
+    if not hold_last:
+        event_times += [ends[-1:] for _, ends, _ in curves]
+        deltas += [-powers[-1:] for _, _, powers in curves]
+    event_times, deltas = np.concatenate(event_times), np.concatenate(deltas)
+    order = np.argsort(event_times, kind='stable')
+    event_times, levels = event_times[order], np.cumsum(deltas[order])
+    idx = np.searchsorted(event_times, timeline, side='right')
+    return timeline, np.where(idx > 0, levels[np.maximum(idx - 1, 0)], 0.0)
+
+
+# --- 그래프용 점 줄이기 ---
+def plot_buckets(fig):
+    """그림 가로 픽셀 수 (점 줄이기의 구간 수)"""
+    return max(int(fig.get_figwidth() * fig.dpi), 1)
+
+
+def decimate_plot_coords(x, y, buckets):
+    """선 그래프 좌표를 x 범위를 buckets 개 구간(픽셀)으로 나눠 구간마다 첫 점/최소 점/최대 점/마지막 점만 남김 (M4)
+
+    x 는 오름차순이어야 합니다. 구간마다 그려지는 세로 범위와 양 끝 연결이 그대로이므로 피크가 사라지지 않고,
+    남는 점은 최대 4 x buckets 개입니다. 점이 그보다 적으면 그대로 반환합니다.
+    """
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    if len(x) <= 4 * buckets or x[-1] <= x[0]: return x, y
+    bucket = np.minimum(((x - x[0]) * (buckets / (x[-1] - x[0]))).astype(np.int64), buckets - 1)
+    firsts = np.flatnonzero(np.diff(bucket, prepend=-1))
+    lasts = np.append(firsts[1:] - 1, len(x) - 1)
+    counts = lasts - firsts + 1
+    keep = [firsts, lasts]
+    for extreme in (np.minimum.reduceat(y, firsts), np.maximum.reduceat(y, firsts)):
+        hits = np.flatnonzero(y == np.repeat(extreme, counts))
+        keep.append(hits[np.unique(bucket[hits], return_index=True)[1]])  # 구간마다 처음 나오는 최솟값/최댓값
+    idx = np.unique(np.concatenate(keep))
+    return x[idx], y[idx]
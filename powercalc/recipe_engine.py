@@ -0,0 +1,562 @@
+"""충방전기 레시피 시뮬레이션 엔진 (Streamlit 비의존)
+
+레시피 표(모드/테스트/전압/전류/전력/시간 제한)와 장비 사양을 받아 스텝별 시간·전력·전력량·SoC 를 계산합니다.
+계산기 페이지, 결과 그래프 페이지, 배치 작업과 벤치마크가 모두 이 모듈을 사용합니다.
+"""
+import math
+from dataclasses import dataclass, field, fields
+
+import numpy as np
+import pandas as pd
+
+from powercalc.cccv import CV_MODELS, LEGACY_CV_MODEL, AverageCV, CCCVProfile, CVEfficiencyTable, ExponentialCV, cv_table_currents
+from powercalc.efficiency import DEFAULT_CYCLER_MODEL, get_efficiency_batch, get_registry
+from powercalc.recipe_loops import LoopBlock, StepSpan, compile_recipe
+
+RECIPE_COLUMNS = ["모드", "테스트", "전압(V)", "전류(A)", "전력(W)", "시간 제한(H)"]
+RESULT_COLUMNS = ["C-rate", "실제 테스트 시간(H)", "효율(%)", "전력(kW)", "전력량(kWh)", "누적 충전량(Ah)", "SoC(%)"]
+
+
+# --- 1. 입력 사양 ---
+@dataclass(frozen=True)
+class CyclerSpecs:
+    """레시피 계산에 필요한 셀/장비/배선 사양"""
+    cell_capacity: float = 211.1
+    equipment_spec: str = '60A - 300A'
+    control_channels: int = 16
+    test_channels: int = 800
+    standby_power: float = 1572.0
+    cable_length: float = 3.0
+    cable_area: float = 150.0
+    use_efficiency_lut: bool = False
+    cycler_model: str = DEFAULT_CYCLER_MODEL
+    cv_model: str = CV_MODELS[0]  # CCCV 의 CV 구간 모델 (cccv.CV_MODELS)
+
+    @classmethod
+    def from_mapping(cls, specs):
+        """dict 또는 st.session_state 처럼 .get 을 지원하는 객체에서 사양을 읽음 (없는 값은 기본값)
+
+        cv_model 이 없는 값(지수 감쇠 도입 전에 저장한 레시피)은 저장 당시 결과와 같도록 LEGACY_CV_MODEL 로 읽습니다.
+        """
+        defaults = cls(cv_model=LEGACY_CV_MODEL)
+        return cls(**{f.name: specs.get(f.name, getattr(defaults, f.name)) for f in fields(cls)})
+
+    @property
+    def required_equipment(self):
+        return math.ceil(self.test_channels / self.control_channels) if self.control_channels > 0 else 0
+
+
+# --- 2. 결과 ---
+RUN_COUNT_COLUMN = "반복 횟수"
+
+# 사이클 경계의 누적 충전량 변화가 이 값 이하이면 정상 상태(이후 사이클이 모두 동일)로 판단
+STEADY_STATE_TOL_AH = 1e-9
+
+
+def summarize_steps(result_df):
+    """스텝별 결과표에서 총 시간/전력량/최대 피크/수용률 적용 피크를 계산
+
+    결과표에 RUN_COUNT_COLUMN 이 있으면 각 스텝을 그 횟수만큼 실행한 것으로 합산합니다.
+    """
+    if result_df is None or result_df.empty:
+        return {'total_hours': 0.0, 'total_kwh': 0.0, 'max_peak_power': 0.0, 'demand_factor': 0.0, 'demand_peak_power': 0.0}
+    weights = result_df[RUN_COUNT_COLUMN] if RUN_COUNT_COLUMN in result_df else 1
+    step_hours = result_df['실제 테스트 시간(H)'] * weights
+    total_hours = step_hours.sum()
+    total_kwh = (result_df['전력량(kWh)'] * weights).sum()
+    max_peak_power = result_df[result_df['전력(kW)'] >= 0]['전력(kW)'].max()
+    if pd.isna(max_peak_power): max_peak_power = 0
+    total_charge_time = step_hours[result_df['모드'] == 'Charge'].sum()
+    demand_factor = total_charge_time / total_hours if total_hours > 0 else 0
+    return {'total_hours': total_hours, 'total_kwh': total_kwh, 'max_peak_power': max_peak_power,
+            'demand_factor': demand_factor, 'demand_peak_power': max_peak_power * demand_factor}
+
+
+def iter_run_indices(runs):
+    """실행 구간(runs)을 실행 순서대로의 결과표 행 번호로 펼침
+
+    runs: [(반복 횟수, 본문)] — 본문은 결과표의 [시작 행, 끝 행) 구간 튜플 또는 중첩된 runs 목록
+    """
+    for count, body in runs:
+        for _ in range(count):
+            if isinstance(body, tuple): yield from range(*body)
+            else: yield from iter_run_indices(body)
+
+
+def run_weights(runs, n_rows, multiplier=1):
+    """각 결과표 행이 실제로 실행되는 횟수"""
+    weights = np.zeros(n_rows, dtype=np.int64)
+    for count, body in runs:
+        if isinstance(body, tuple): weights[body[0]:body[1]] += count * multiplier
+        else: weights += run_weights(body, n_rows, count * multiplier)
+    return weights
+
+
+def _append_run(runs, count, body):
+    """runs 끝에 실행 구간을 추가 (이어지는 1회 구간은 합치고 구간 하나짜리 본문은 풀어서 저장)"""
+    while isinstance(body, list) and len(body) == 1:
+        inner_count, body = body[0]
+        count *= inner_count
+    if isinstance(body, list):
+        if not body: return
+        if count == 1:
+            for inner_count, inner_body in body: _append_run(runs, inner_count, inner_body)
+            return
+    elif runs and count == 1 and runs[-1][0] == 1 and isinstance(runs[-1][1], tuple) and runs[-1][1][1] == body[0]:
+        runs[-1] = (1, (runs[-1][1][0], body[1]))
+        return
+    runs.append((count, body))
+
+
+@dataclass
+class RecipeResult:
+    """레시피 시뮬레이션 결과
+
+    steps: 실제로 계산한 스텝별 결과표 (반복/루프가 정상 상태에 도달한 뒤의 실행은 마지막 회차 한 번만 포함하고
+           RUN_COUNT_COLUMN 에 실행 횟수를 기록), runs: steps 행의 실행 순서 (iter_run_indices 참고)
+    cycle_length: 레시피 표의 행 수 (루프 행 포함)
+    """
+    steps: pd.DataFrame
+    runs: list
+    cycle_length: int
+    repetition_count: int
+    steady_state_cycle: int = None  # 정상 상태에 도달한 사이클 번호 (1부터, 도달하지 않았으면 None)
+    step_indices: np.ndarray = None  # steps 각 행의 원본 레시피 스텝 인덱스
+    start_charge_ah: np.ndarray = None  # steps 각 행 실행 직전의 누적 충전량
+    trace_context: tuple = field(default=None, repr=False)  # (스텝 목록, 운전점, 상세 설정, 사양) — 스텝 프로파일용
+
+    def summary(self):
+        return summarize_steps(self.steps)
+
+    def iter_row_indices(self):
+        """실행 순서대로 steps 의 행 번호를 생성 (반복 횟수만큼 메모리를 쓰지 않음)"""
+        return iter_run_indices(self.runs)
+
+    def first_run_steps(self):
+        """레시피 표 행마다 처음 실행한 결과 행 (인덱스: 레시피 행 번호, 루프 행처럼 계산하지 않는 행은 빈 값)"""
+        rows, first = np.unique(self.step_indices, return_index=True)
+        return self.steps.iloc[first].set_axis(rows).reindex(range(self.cycle_length))
+
+    def expanded_steps(self):
+        """모든 반복을 펼친 결과표 (그래프 등 전체 시계열이 필요할 때만 사용)"""
+        order = np.fromiter(self.iter_row_indices(), dtype=np.intp)
+        return self.steps.iloc[order].drop(columns=RUN_COUNT_COLUMN).reset_index(drop=True)
+
+    def step_profile(self, row):
+        """steps 의 row 행 1회 실행의 CCCV 프로파일 (CCCV 충전 스텝이 아니면 None: 스텝 내내 일정)"""
+        steps, operating_points, cp_cccv_details, specs = self.trace_context
+        step = self.steps.iloc[row]
+        if not (step['테스트'] == 'CCCV' and step['모드'] == 'Charge'): return None
+        original_index = self.step_indices[row]
+        return _cccv_profile(steps[original_index], original_index, operating_points, cp_cccv_details, specs, self.start_charge_ah[row])
+
+    def step_trace(self, row, resolution_h):
+        """steps 의 row 행 스텝을 resolution_h 간격으로 샘플링한 채널 전류(A)와 설비 전력(kW) 표
+
+        CCCV 충전 스텝은 CV 구간의 지수 감쇠를 그대로 보여주고, 그 밖의 스텝은 일정한 값입니다.
+        """
+        step = self.steps.iloc[row]
+        duration = step['실제 테스트 시간(H)']
+        times = np.arange(0.0, duration, resolution_h) if duration > 0 else np.zeros(0)
+        profile = self.step_profile(row)
+        if profile is None:
+            current = abs(step['전류(A)']) if step['모드'] != 'Rest' and pd.notna(step['전류(A)']) else 0.0
+            currents, powers = np.full(len(times), current), np.full(len(times), step['전력(kW)'])
+        else:
+            specs = self.trace_context[3]
+            currents = profile.current_at(times)
+            powers = plant_power_kw(profile.power_w(times), specs)
+        return pd.DataFrame({'경과 시간(H)': times, '전류(A)': currents, '전력(kW)': powers})
+
+    @property
+    def total_hours(self): return self.summary()['total_hours']
+
+    @property
+    def total_kwh(self): return self.summary()['total_kwh']
+
+    @property
+    def max_peak_power(self): return self.summary()['max_peak_power']
+
+    @property
+    def demand_peak_power(self): return self.summary()['demand_peak_power']
+
+
+# --- 3. 운전점 / 효율 ---
+def resolve_step_operating_points(recipe_df, cp_cccv_details, specs):
+    """레시피 1회분 각 스텝의 운전점(전압/전류)을 확정하고, 효율을 한 번의 배치 호출로 계산합니다.
+
+    CCCV 충전 스텝은 CC 구간 운전점(voltages/currents)과 CV 구간 운전점(cv_*)을 따로 가지며,
+    CV 구간 전류 범위의 효율 누적 테이블(cv_tables: {스텝 인덱스: CVEfficiencyTable})도 같은 배치 호출로 만듭니다.
+    """
+    points = operating_point_batch(recipe_df, cp_cccv_details)
+    efficiencies = get_efficiency_batch(
+        points['batch_modes'], points['batch_voltages'], points['batch_currents'],
+        specs.equipment_spec, specs.cable_length, specs.cable_area,
+        use_lut=specs.use_efficiency_lut, cycler_model=specs.cycler_model)
+    return attach_efficiencies(points, efficiencies)
+
+
+def operating_point_batch(recipe_df, cp_cccv_details):
+    """스텝별 운전점과, 효율을 한 번에 계산할 (모드, 전압, 전류) 배치 배열을 만듦 (장비 사양/배선과 무관)
+
+    배치 순서: 스텝 운전점 n 개, CV 평균 운전점 n 개, CV 감쇠 테이블 격자점
+    """
+    n = len(recipe_df)
+    voltages, currents = np.full(n, np.nan), np.full(n, np.nan)
+    cv_voltages, cv_currents = np.full(n, np.nan), np.full(n, np.nan)
+    modes = recipe_df['모드'].to_numpy(dtype=object)
+
+    for i, row in enumerate(recipe_df.to_dict('records')):
+        mode, test_type = row['모드'], row['테스트']
+        voltage, current, power_w = row['전압(V)'], row['전류(A)'], row['전력(W)']
+        if mode == 'Rest': continue
+        if test_type == 'CCCV' and mode == 'Charge':
+            details = cp_cccv_details.get(i)
+            if not details: continue
+            cc_current = current; cutoff_a = details.get('cutoff_a')
+            voltage = voltage if pd.notna(voltage) else 3.8
+            cv_voltages[i] = details.get('cv_v')
+            cv_currents[i] = (cc_current + cutoff_a) / 2.0 if cc_current and cutoff_a else 0
+        elif test_type == 'CC':
+            current = abs(current) if pd.notna(current) else 0
+        elif test_type == 'CP':
+            avg_v = None
+            if i in cp_cccv_details:
+                details = cp_cccv_details[i]
+                start_v_in = details.get('start_v')
+                end_v_in = details.get('end_v')
+                start_v = start_v_in if (start_v_in is not None and start_v_in > 0) else (2.7 if mode == 'Charge' else 4.2)
+
+                if end_v_in is not None and end_v_in > 0: avg_v = (start_v + end_v_in) / 2.0
+                elif start_v_in is not None and start_v_in > 0: avg_v = start_v_in
+
+            if avg_v is not None and avg_v > 0:
+                voltage = avg_v
+            elif pd.notna(row['전류(A)']) and row['전류(A)'] > 0:
+                current = row['전류(A)']
+                voltage = abs(power_w / current) if power_w > 0 else 0
+            current = abs(power_w / voltage) if power_w > 0 and voltage > 0 else 0
+        voltages[i], currents[i] = voltage, current
+
+    # CV 지수 감쇠 구간: I_cut ~ I_cc 격자의 효율
+    taper_rows = [i for i in range(n) if pd.notna(cv_voltages[i]) and _has_cv_taper(recipe_df.at[i, '전류(A)'], cp_cccv_details[i].get('cutoff_a'))]
+    taper_currents = [cv_table_currents(recipe_df.at[i, '전류(A)'], cp_cccv_details[i]['cutoff_a']) for i in taper_rows]
+    taper_voltages = [np.full(len(c), cv_voltages[i]) for i, c in zip(taper_rows, taper_currents)]
+
+    return {'voltages': voltages, 'currents': currents, 'cv_voltages': cv_voltages, 'cv_currents': cv_currents,
+            'taper_rows': taper_rows, 'taper_currents': taper_currents,
+            'batch_modes': np.concatenate([modes, np.full(n + sum(map(len, taper_currents)), 'Charge', dtype=object)]),
+            'batch_voltages': np.concatenate([voltages, cv_voltages, *taper_voltages]),
+            'batch_currents': np.concatenate([currents, cv_currents, *taper_currents])}
+
+
+def attach_efficiencies(points, efficiencies):
+    """operating_point_batch 의 배치 순서로 계산한 효율을 스텝별 효율/CV 테이블로 나눔
+
+    efficiencies 가 (시나리오 수, 배치 크기) 배열이면 결과도 시나리오 축을 가집니다.
+    """
+    n = len(points['voltages'])
+    cv_tables, offset = {}, 2 * n
+    for i, table_currents in zip(points['taper_rows'], points['taper_currents']):
+        cv_tables[i] = CVEfficiencyTable(table_currents, efficiencies[..., offset:offset + len(table_currents)])
+        offset += len(table_currents)
+    return {'voltages': points['voltages'], 'currents': points['currents'], 'efficiencies': efficiencies[..., :n],
+            'cv_voltages': points['cv_voltages'], 'cv_currents': points['cv_currents'],
+            'cv_efficiencies': efficiencies[..., n:2 * n], 'cv_tables': cv_tables}
+
+
+def _has_cv_taper(cc_current, cutoff_a):
+    """지수 감쇠 모델을 쓸 수 있는 CCCV 조건 (CC 전류 > 종료 전류 > 0)"""
+    return bool(pd.notna(cc_current) and cutoff_a and 0 < cutoff_a < cc_current)
+
+
+# --- 4. 시뮬레이션 ---
+def _plant_power_kw(p_ch_w, specs):
+    """채널당 입력 전력(W) -> 전체 장비 전력(kW) (장비별 대기전력 포함)"""
+    num_full = specs.test_channels // specs.control_channels
+    rem_ch = specs.test_channels % specs.control_channels
+    p_full_total = num_full * ((p_ch_w * specs.control_channels) + specs.standby_power)
+    p_partial = (p_ch_w * rem_ch) + specs.standby_power if rem_ch > 0 else 0
+    return (p_full_total + p_partial) / 1000.0
+
+
+def _cccv_profile(step, original_index, operating_points, cp_cccv_details, specs, current_charge_ah):
+    """CCCV 충전 스텝 1회 실행의 CC/CV 구간 프로파일 (상세 설정이 없으면 None)
+
+    충전 가능량의 transition 비율까지는 CC, 나머지는 CV 구간으로 충전하며
+    CV 구간은 specs.cv_model 에 따라 지수 감쇠(기본) 또는 평균 전류로 계산합니다.
+    """
+    details = cp_cccv_details.get(original_index, {})
+    if not details: return None
+    cc_current = step['전류(A)']
+    avg_v_cc = step['전압(V)'] if pd.notna(step['전압(V)']) else 3.8
+    cv_v = details.get('cv_v')
+    cutoff_a = details.get('cutoff_a')
+    transition_ratio = details.get('transition', 80.0) / 100.0
+
+    chargeable_ah = specs.cell_capacity - current_charge_ah
+    ah_for_cc = chargeable_ah * transition_ratio
+    ah_for_cv = chargeable_ah * (1 - transition_ratio)
+    time_cc = ah_for_cc / cc_current if cc_current > 0 else 0
+
+    cv_table = operating_points['cv_tables'].get(original_index)
+    if specs.cv_model == 'exponential' and cv_table is not None:
+        cv = ExponentialCV(cv_v, cc_current, cutoff_a, ah_for_cv, cv_table)
+    else:
+        cv = AverageCV(cv_v, cc_current, cutoff_a, ah_for_cv, operating_points['cv_efficiencies'][original_index])
+
+    calculated_full_time = time_cc + cv.full_duration_h
+    time_limit = step['시간 제한(H)']
+    actual_time = calculated_full_time
+    if pd.notna(time_limit) and time_limit > 0 and time_limit < calculated_full_time:
+        actual_time = time_limit
+
+    eff_cc = operating_points['efficiencies'][original_index]
+    p_in_cc = avg_v_cc * cc_current / eff_cc if eff_cc > 0 else 0
+    return CCCVProfile(cc_current, p_in_cc, time_cc, cv, actual_time)
+
+
+def plant_power_kw(p_ch_w, specs):
+    """채널당 전력(W, 회생은 음수) -> 전체 설비 전력(kW) (배열 가능)
+
+    _plant_power_kw 와 같은 값: 채널 전력 x 테스트 채널 수 + 장비 대수 x 대기전력
+    """
+    return (np.asarray(p_ch_w, dtype=float) * specs.test_channels + specs.standby_power * specs.required_equipment) / 1000.0
+
+
+def _simulate_step(step, original_index, operating_points, cp_cccv_details, specs, current_charge_ah):
+    """스텝 하나를 계산해 (RESULT_COLUMNS 순서의 결과 값 또는 None, 계산 후 누적 충전량) 을 반환
+
+    None 은 계산하지 않는 스텝(상세 설정이 없는 CCCV, 전류 0 등)으로 결과가 0 으로 남습니다.
+    """
+    mode = step['모드']
+    test_type = step['테스트']
+    max_capacity_ah = specs.cell_capacity
+
+    if mode == 'Rest':
+        time_limit = step['시간 제한(H)']
+        actual_time = time_limit if pd.notna(time_limit) else 0.0
+        total_power_kw = specs.standby_power * specs.required_equipment / 1000.0
+        soc_val = (current_charge_ah / max_capacity_ah) * 100 if max_capacity_ah > 0 else 0
+        return (0.0, actual_time, 0.0, total_power_kw, total_power_kw * actual_time, current_charge_ah, soc_val), current_charge_ah
+
+    if test_type == 'CCCV' and mode == 'Charge':
+        profile = _cccv_profile(step, original_index, operating_points, cp_cccv_details, specs, current_charge_ah)
+        if profile is None: return None, current_charge_ah
+        actual_time = profile.duration_h
+        avg_p_in_w = profile.energy_wh() / actual_time if actual_time > 0 else 0
+        total_power_kw = _plant_power_kw(avg_p_in_w, specs)
+
+        current_charge_ah = np.clip(current_charge_ah + profile.charge_ah(), 0, max_capacity_ah)
+        soc_percent = (current_charge_ah / max_capacity_ah) * 100 if max_capacity_ah > 0 else 0
+        return (0.0, actual_time, 0.0, total_power_kw, total_power_kw * actual_time, current_charge_ah, soc_percent), current_charge_ah
+
+    if mode not in ['Charge', 'Discharge']: return None, current_charge_ah
+
+    # CC, CP 처리
+    voltage, current = step['전압(V)'], step['전류(A)']
+    if test_type == 'CC':
+        current = abs(current) if pd.notna(current) else 0
+    elif test_type == 'CP':
+        voltage = operating_points['voltages'][original_index]
+        current = operating_points['currents'][original_index]
+
+    if not (pd.notna(voltage) and pd.notna(current) and current > 0): return None, current_charge_ah
+
+    efficiency = operating_points['efficiencies'][original_index]
+    time_limit = step['시간 제한(H)']
+    c_rate = current / specs.cell_capacity if specs.cell_capacity > 0 else 0
+    c_rate_time = specs.cell_capacity / current
+
+    if mode == 'Charge':
+        soc_time_limit = (max_capacity_ah - current_charge_ah) / current
+    else:
+        soc_time_limit = current_charge_ah / current
+
+    possible_times = [soc_time_limit, c_rate_time]
+    if time_limit is not None and time_limit > 0: possible_times.append(time_limit)
+    actual_time = min(possible_times)
+
+    charge_change = actual_time * current
+    current_charge_ah = np.clip(current_charge_ah + (charge_change if mode == 'Charge' else -charge_change), 0, max_capacity_ah)
+    soc_percent = (current_charge_ah / max_capacity_ah) * 100 if max_capacity_ah > 0 else 0
+
+    if mode == 'Charge':
+        p_in_w = voltage * current / efficiency if efficiency > 0 else 0
+        total_power_kw = _plant_power_kw(p_in_w, specs)
+    else: # Discharge: 대기전력에서 회수전력 차감
+        p_rec_w = voltage * current * efficiency
+        total_power_kw = (specs.standby_power * specs.required_equipment - p_rec_w * specs.test_channels) / 1000.0
+
+    return (c_rate, actual_time, efficiency * 100.0, total_power_kw, total_power_kw * actual_time, current_charge_ah, soc_percent), current_charge_ah
+
+
+def _build_result_frame(recipe_df, order, outputs, operating_points, weights):
+    """계산한 스텝 순서(order: 원본 스텝 인덱스 배열)와 결과 배열로 결과표를 한 번에 생성"""
+    result_df = recipe_df.iloc[order].reset_index(drop=True)
+    # CP 스텝은 계산된 운전점(평균 전압/전류)을 표에 표시
+    cp_mask = ((recipe_df['테스트'] == 'CP') & recipe_df['모드'].isin(['Charge', 'Discharge'])).to_numpy()[order]
+    if cp_mask.any():
+        for col, key in (('전압(V)', 'voltages'), ('전류(A)', 'currents')):
+            values = pd.to_numeric(result_df[col], errors='coerce').to_numpy(dtype=float)
+            result_df[col] = np.where(cp_mask, operating_points[key][order], values)
+    for j, col in enumerate(RESULT_COLUMNS): result_df[col] = outputs[:, j]
+    result_df[RUN_COUNT_COLUMN] = weights
+    return result_df
+
+
+def _iter_units(nodes):
+    """노드 목록을 실행 단위(최상위 스텝 인덱스 또는 LoopBlock)로 나열"""
+    for node in nodes:
+        if isinstance(node, StepSpan): yield from range(node.start, node.stop)
+        else: yield node
+
+
+def _unit_stop(unit):
+    """실행 단위가 차지하는 마지막 레시피 행 + 1"""
+    return unit + 1 if isinstance(unit, int) else unit.stop
+
+
+class _RunRecorder:
+    """실행 트리를 계산하며 계산한 스텝(원본 인덱스, 결과 값)을 쌓는 보조 객체
+
+    step_fn(스텝 인덱스, 누적 충전량) -> (결과 값 또는 None, 누적 충전량) 으로 스텝을 계산하며,
+    누적 충전량은 스칼라(단일 레시피) 또는 시나리오별 배열(scenario_engine) 모두 가능합니다.
+    """
+
+    def __init__(self, step_fn, zeros=(0.0,) * len(RESULT_COLUMNS)):
+        self.step_fn, self._zeros = step_fn, zeros
+        self.order, self.outputs, self.start_charges = [], [], []
+
+    def simulate_units(self, units, current_charge_ah, runs=None, checkpoints=None):
+        """실행 단위를 순서대로 계산해 (runs, 종료 시 누적 충전량) 을 반환
+
+        checkpoints 가 주어지면 각 단위 직전과 마지막 단위 이후의 (계산한 행 수, 누적 충전량, runs) 를 기록합니다.
+        """
+        runs = [] if runs is None else runs
+        for unit in units:
+            if checkpoints is not None: checkpoints.append((len(self.order), current_charge_ah, list(runs)))
+            if isinstance(unit, LoopBlock):
+                loop_runs, current_charge_ah, _ = self.simulate_loop(unit, current_charge_ah)
+                _append_run(runs, 1, loop_runs)
+                continue
+            start_charge_ah = current_charge_ah
+            values, current_charge_ah = self.step_fn(unit, current_charge_ah)
+            self.order.append(unit)
+            self.start_charges.append(start_charge_ah)
+            self.outputs.append(self._zeros if values is None else values)
+            _append_run(runs, 1, (len(self.order) - 1, len(self.order)))
+        if checkpoints is not None: checkpoints.append((len(self.order), current_charge_ah, list(runs)))
+        return runs, current_charge_ah
+
+    def simulate_loop(self, block, current_charge_ah, first_iteration=None):
+        """루프를 회차별로 계산하다가 회차 시작/종료 누적 충전량이 같아지면(정상 상태) 남은 회차를 그 회차로 대체
+
+        first_iteration: 첫 회차 계산을 대신할 함수 (누적 충전량 -> (runs, 누적 충전량))
+        (runs, 종료 시 누적 충전량, 정상 상태 회차 또는 None) 을 반환
+        """
+        runs, steady_iteration = [], None
+        for iteration in range(1, block.count + 1):
+            start_charge_ah = current_charge_ah
+            if iteration == 1 and first_iteration is not None:
+                body_runs, current_charge_ah = first_iteration(current_charge_ah)
+            else:
+                body_runs, current_charge_ah = self.simulate_units(_iter_units(block.body), current_charge_ah)
+            if iteration < block.count and np.max(np.abs(current_charge_ah - start_charge_ah)) <= STEADY_STATE_TOL_AH:
+                steady_iteration = iteration
+                _append_run(runs, block.count - iteration + 1, body_runs)
+                break
+            _append_run(runs, 1, body_runs)
+        return runs, current_charge_ah, steady_iteration
+
+
+def _same_value(a, b):
+    if a is b: return True
+    try:
+        if pd.isna(a) and pd.isna(b): return True
+    except (TypeError, ValueError):
+        pass
+    return a == b
+
+
+def _first_changed_row(old_steps, new_steps, old_details, new_details):
+    """두 레시피에서 처음으로 달라진 행 (스텝 값 또는 상세 설정 기준, 같으면 행 수)"""
+    n = min(len(old_steps), len(new_steps))
+    for i in range(n):
+        old, new = old_steps[i], new_steps[i]
+        if old.keys() != new.keys() or not all(_same_value(old[k], new[k]) for k in new): return i
+        if old_details.get(i) != new_details.get(i): return i
+    return n
+
+
+class IncrementalSimulator:
+    """레시피를 고칠 때 바뀐 첫 스텝부터만 다시 계산하는 시뮬레이터
+
+    직전 계산의 첫 회차에서 최상위 실행 단위(스텝/루프)마다 (계산한 행 수, 누적 충전량) 을 기록해 두고,
+    다음 계산에서는 처음으로 달라진 행 이전의 단위 결과를 그대로 재사용합니다.
+    장비 사양이나 효율 맵 파일 내용이 바뀌면 처음부터 다시 계산합니다. 세션마다 하나를 만들어 보관해 사용합니다.
+    """
+
+    def __init__(self):
+        self._previous = None
+        self.reused_steps = 0  # 직전 simulate 호출에서 재사용한 계산 행 수
+
+    def simulate(self, recipe_df, specs, cp_cccv_details=None, repetition_count=1):
+        """simulate_recipe 와 같은 인자/결과"""
+        if not isinstance(specs, CyclerSpecs): specs = CyclerSpecs.from_mapping(specs)
+        cp_cccv_details = {int(k): v for k, v in (cp_cccv_details or {}).items()}
+        recipe_df = recipe_df.reset_index(drop=True)
+        cycle_length = len(recipe_df)
+        repetition_count = max(int(repetition_count), 1)
+        program = compile_recipe(recipe_df, repetition_count)
+        steps = recipe_df.to_dict('records')
+        units = list(_iter_units(program.body))
+        # 효율 맵 파일이 바뀌면(레지스트리가 다시 읽음) 직전 결과는 옛 맵으로 계산한 것이므로 재사용하지 않음
+        efficiency_map = get_registry().fingerprint(specs.cycler_model)
+
+        operating_points = resolve_step_operating_points(recipe_df, cp_cccv_details, specs) if cycle_length > 0 else {}
+        recorder = _RunRecorder(lambda i, charge_ah: _simulate_step(steps[i], i, operating_points, cp_cccv_details, specs, charge_ah))
+
+        # 재사용할 수 있는 최상위 단위 수: 직전 계산과 같고 바뀐 행보다 앞에서 끝나는 단위
+        reuse, previous = 0, self._previous
+        if previous is not None and previous['specs'] == specs and previous['efficiency_map'] == efficiency_map:
+            first_changed = _first_changed_row(previous['steps'], steps, previous['cp_cccv_details'], cp_cccv_details)
+            limit = min(len(units), len(previous['units']))
+            while reuse < limit and units[reuse] == previous['units'][reuse] and _unit_stop(units[reuse]) <= first_changed:
+                reuse += 1
+
+        checkpoints, first_runs, first_charge_ah = [], None, 0.0
+        if reuse > 0:
+            n_rows, first_charge_ah, first_runs = previous['checkpoints'][reuse]
+            recorder.order, recorder.outputs = previous['order'][:n_rows], previous['outputs'][:n_rows]
+            recorder.start_charges = previous['start_charges'][:n_rows]
+            checkpoints = previous['checkpoints'][:reuse]
+        self.reused_steps = len(recorder.order)
+
+        def first_iteration(_):
+            return recorder.simulate_units(units[reuse:], first_charge_ah, list(first_runs or []), checkpoints)
+
+        runs, _, steady_state_cycle = recorder.simulate_loop(program, 0.0, first_iteration)
+        self._previous = {'specs': specs, 'efficiency_map': efficiency_map, 'steps': steps, 'cp_cccv_details': cp_cccv_details, 'units': units,
+                          'checkpoints': checkpoints, 'order': recorder.order, 'outputs': recorder.outputs,
+                          'start_charges': recorder.start_charges}
+
+        order = np.asarray(recorder.order, dtype=np.intp)
+        outputs = np.asarray(recorder.outputs, dtype=float).reshape(len(order), len(RESULT_COLUMNS))
+        result_df = _build_result_frame(recipe_df, order, outputs, operating_points, run_weights(runs, len(order)))
+        return RecipeResult(result_df, runs, cycle_length, repetition_count, steady_state_cycle, order,
+                            np.asarray(recorder.start_charges, dtype=float), (steps, operating_points, cp_cccv_details, specs))
+
+
+def simulate_recipe(recipe_df, specs, cp_cccv_details=None, repetition_count=1):
+    """레시피를 repetition_count 회 반복 실행한 스텝별 결과를 계산
+
+    recipe_df: RECIPE_COLUMNS (루프를 쓰면 recipe_loops.LOOP_COLUMNS 포함) 를 가진 레시피 1회분,
+    specs: CyclerSpecs 또는 사양 dict, cp_cccv_details: {스텝 인덱스(0부터): CP/CCCV 상세 설정}
+
+    레시피는 펼치지 않은 실행 트리(recipe_loops.compile_recipe)로 계산합니다. 전체 반복과 각 루프는
+    회차 시작/종료 시점의 누적 충전량이 같아지면(정상 상태) 남은 회차를 계산하지 않고 마지막 회차의
+    실행 횟수로만 반영하므로, 계산량과 메모리는 실행 스텝 수가 아니라 레시피 크기에 비례합니다.
+    잘못된 루프 정의는 ValueError 를 발생시킵니다.
+    """
+    return IncrementalSimulator().simulate(recipe_df, specs, cp_cccv_details, repetition_count)
@@ -0,0 +1,166 @@
+"""레시피 파일 불러오기 / 표 형식 교정 / 계산 전 검증
+
+- read_recipe_file: 엑셀(xlsx/xls), CSV, Parquet 레시피 파일을 레시피 표 열 순서(A:모드 ~ H:루프 횟수, I ~ M:CP/CCCV 상세 설정)로 읽음
+- split_recipe_details: 상세 설정 열(I ~ M)을 떼어 내 계산기의 CP/CCCV 상세 설정 dict 로 변환
+- normalize_recipe_frame: 데이터 에디터가 요구하는 형식(문자열/float64 열, 0부터 시작하는 인덱스)으로 교정
+- validate_recipe: CP/CCCV/루프 규칙을 열 단위 마스크로 한 번에 검사해 모든 오류를 행 번호와 함께 반환
+"""
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+from powercalc.efficiency import parquet_available
+from powercalc.recipe_loops import LOOP_COLUMNS, find_loops
+
+RECIPE_FILE_COLUMNS = ["모드", "테스트", "전압(V)", "전류(A)", "전력(W)", "시간 제한(H)", *LOOP_COLUMNS]
+RECIPE_FILE_TYPES = ['xlsx', 'xls', 'csv'] + (['parquet'] if parquet_available() else [])  # Parquet 는 엔진(pyarrow)이 있을 때만
+STRING_COLUMN_DEFAULTS = {"모드": "Rest", "테스트": "-"}
+NUMERIC_COLUMNS = ["전압(V)", "전류(A)", "전력(W)", "시간 제한(H)", *LOOP_COLUMNS]
+# 선택 사항인 I ~ M 열: 상세 설정 열 이름 -> (테스트, 상세 설정 키)
+DETAIL_COLUMNS = {"CV 전압(V)": ('CCCV', 'cv_v'), "종료 전류(A)": ('CCCV', 'cutoff_a'), "CV 전환(%)": ('CCCV', 'transition'),
+                  "CP 시작 전압(V)": ('CP', 'start_v'), "CP 종료 전압(V)": ('CP', 'end_v')}
+DETAIL_FILE_COLUMNS = [*RECIPE_FILE_COLUMNS, *DETAIL_COLUMNS]
+# 상세 설정으로 인정하는 최소 키 (CCCV 의 전환 비율은 없으면 계산 엔진 기본값 80%)
+REQUIRED_DETAIL_KEYS = {'CCCV': ('cv_v', 'cutoff_a'), 'CP': ('start_v', 'end_v')}
+
+
+# --- 1. 파일 불러오기 ---
+def _excel_engine():
+    """python-calamine 이 설치되어 있으면 openpyxl 보다 훨씬 빠른 calamine 엔진 사용"""
+    try:
+        import python_calamine  # noqa: F401
+        return 'calamine'
+    except ImportError:
+        return None
+
+
+def _positional_columns(df):
+    """열 순서(A ~ M)대로 레시피 열 이름을 붙임 (G, H 열(루프)과 I ~ M 열(상세 설정)은 선택 사항)"""
+    df = df.iloc[:, :len(DETAIL_FILE_COLUMNS)]
+    df.columns = DETAIL_FILE_COLUMNS[:df.shape[1]]
+    return df.reindex(columns=DETAIL_FILE_COLUMNS)
+
+
+def _drop_header_row(df):
+    """첫 행이 '모드, 테스트, ...' 제목 행이면 제거 (제목 행이 있는 파일과 없는 파일 모두 허용)"""
+    if len(df) and str(df.iat[0, 0]).strip() == RECIPE_FILE_COLUMNS[0]: df = df.iloc[1:]
+    return df.reset_index(drop=True)
+
+
+def read_recipe_file(file, name=None):
+    """업로드 파일(경로 또는 파일 객체)을 레시피 표로 읽음 — 확장자로 형식 판단 (xlsx/xls/csv/parquet)"""
+    name = name or getattr(file, 'name', None) or str(file)
+    ext = os.path.splitext(name)[1].lower().lstrip('.')
+    if ext == 'parquet':
+        if not parquet_available(): raise ValueError("Parquet 파일을 읽으려면 pyarrow 를 설치해야 합니다 (pip install pyarrow).")
+        df = pd.read_parquet(file)
+        # 레시피 열 이름으로 저장된 파일은 이름으로, 아니면 열 순서로 맞춤
+        if set(RECIPE_FILE_COLUMNS[:2]) <= set(df.columns): return df.reindex(columns=DETAIL_FILE_COLUMNS)
+        return _positional_columns(df)
+    if ext == 'csv':
+        data = file.read() if hasattr(file, 'read') else open(file, 'rb').read()
+        if isinstance(data, str): data = data.encode('utf-8')
+        # 엑셀에서 저장한 CSV 는 cp949 인 경우가 많음
+        try: text = data.decode('utf-8-sig')
+        except UnicodeDecodeError: text = data.decode('cp949')
+        df = pd.read_csv(io.StringIO(text), header=None, dtype=object, skip_blank_lines=True)
+        return _positional_columns(_drop_header_row(df))
+    if ext in ('xlsx', 'xls'):
+        df = pd.read_excel(file, header=None, engine=_excel_engine())
+        return _positional_columns(_drop_header_row(df))
+    raise ValueError(f"지원하지 않는 파일 형식입니다: '{name}' ({', '.join(RECIPE_FILE_TYPES)} 만 가능)")
+
+
+def read_recipe_sheets(file, name=None):
+    """엑셀 파일은 모든 시트를 {시트 이름: 레시피 표} 로, CSV/Parquet 파일은 {'': 레시피 표} 로 읽음"""
+    name = name or getattr(file, 'name', None) or str(file)
+    if os.path.splitext(name)[1].lower() in ('.xlsx', '.xls'):
+        sheets = pd.read_excel(file, sheet_name=None, header=None, engine=_excel_engine())
+        return {str(sheet): _positional_columns(_drop_header_row(df)) for sheet, df in sheets.items()}
+    return {'': read_recipe_file(file, name)}
+
+
+def split_recipe_details(df):
+    """(상세 설정 열을 뺀 레시피 표, {행 번호: 상세 설정}) — CCCV 는 CV 전압과 종료 전류, CP 는 시작/종료 전압이 모두 있는 행만 상세 설정으로 인정"""
+    present = [col for col in DETAIL_COLUMNS if col in df.columns]
+    if not present: return df, {}
+    values = df[present].apply(pd.to_numeric, errors='coerce')
+    tests = df['테스트'].astype(str) if '테스트' in df.columns else pd.Series('', index=df.index)
+    details = {}
+    for label, test, row in zip(df.index, tests, values.itertuples(index=False)):
+        entry = {key: float(value) for (col_test, key), value in zip((DETAIL_COLUMNS[col] for col in present), row)
+                 if col_test == test and pd.notna(value)}
+        if test in REQUIRED_DETAIL_KEYS and all(key in entry for key in REQUIRED_DETAIL_KEYS[test]): details[int(label)] = entry
+    return df.drop(columns=present), details
+
+
+def missing_cccv_details(recipe_df, cp_cccv_details):
+    """상세 설정(CV 전압/종료 전류)이 없는 CCCV 스텝 번호 목록 (1부터)"""
+    if '테스트' not in recipe_df.columns: return []
+    return [int(label) + 1 for label, test in zip(recipe_df.index, recipe_df['테스트'].astype(str)) if test == 'CCCV' and int(label) not in cp_cccv_details]
+
+
+# --- 2. 표 형식 교정 ---
+def is_normalized(df):
+    """이미 데이터 에디터용 형식이면 True (교정을 건너뛰기 위한 검사)"""
+    if not isinstance(df.index, pd.RangeIndex) or df.index.start != 0 or df.index.step != 1: return False
+    for col in STRING_COLUMN_DEFAULTS:
+        if col in df.columns and (not pd.api.types.is_string_dtype(df[col]) or df[col].isna().any()): return False
+    for col in NUMERIC_COLUMNS:
+        if col in df.columns:
+            if df[col].dtype != np.float64: return False
+        elif col in LOOP_COLUMNS: return False
+    return True
+
+
+def normalize_recipe_frame(df):
+    """문자열(Selectbox) 열은 빈 값을 기본값으로 채운 str, 숫자 열은 float64 (엉뚱한 문자나 공백은 NaN) 로 교정한 복사본"""
+    df = df.reset_index(drop=True)
+    for col, default_val in STRING_COLUMN_DEFAULTS.items():
+        if col in df.columns: df[col] = df[col].fillna(default_val).astype(str)
+    for col in NUMERIC_COLUMNS:
+        # 루프 기능 이전에 저장된 레시피는 루프 열이 없음
+        if col not in df.columns and col in LOOP_COLUMNS: df[col] = np.nan
+        if col in df.columns: df[col] = pd.to_numeric(df[col], errors='coerce').astype('float64')
+    return df
+
+
+# --- 3. 계산 전 검증 ---
+def _positive(df, col):
+    values = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=float) if col in df.columns else np.full(len(df), np.nan)
+    with np.errstate(invalid='ignore'):
+        return values > 0  # NaN 은 False
+
+
+def validate_recipe(recipe_df, cp_cccv_details=None):
+    """모든 검증 오류 메시지 목록 (스텝 번호 순, 없으면 빈 목록) — 행 번호는 표의 인덱스 + 1"""
+    cp_cccv_details = cp_cccv_details or {}
+    labels = np.asarray(recipe_df.index)
+    tests = recipe_df['테스트'].astype(str).to_numpy() if '테스트' in recipe_df.columns else np.full(len(recipe_df), '')
+    power_ok, voltage_ok, current_ok = _positive(recipe_df, '전력(W)'), _positive(recipe_df, '전압(V)'), _positive(recipe_df, '전류(A)')
+    is_cp, is_cccv = tests == 'CP', tests == 'CCCV'
+    has_details = np.fromiter((label in cp_cccv_details for label in labels), dtype=bool, count=len(labels))
+    cccv_details_ok = np.fromiter(
+        (bool(cp_cccv_details.get(label, {}).get('cv_v')) and bool(cp_cccv_details.get(label, {}).get('cutoff_a')) if cccv else True
+         for label, cccv in zip(labels, is_cccv)), dtype=bool, count=len(labels))
+
+    # (마스크, 메시지 형식) — 같은 스텝의 여러 오류는 아래 순서대로 표시
+    rules = [
+        (is_cp & ~power_ok, "➡️ {step}번 스텝: CP 모드는 '전력(W)' 값을 필수로 입력해야 합니다."),
+        (is_cp & ~has_details & voltage_ok & current_ok, "➡️ {step}번 스텝(CP): 상세 설정이 없으면 '전압'과 '전류' 중 하나만 입력해야 합니다."),
+        (is_cp & ~has_details & ~voltage_ok & ~current_ok, "➡️ {step}번 스텝(CP): 상세 설정이 없으면 '전압' 또는 '전류' 중 하나를 입력해야 합니다."),
+        (is_cccv & ~current_ok, "➡️ {step}번 스텝(CCCV): '전류(A)'(CC전류) 값을 필수로 입력해야 합니다."),
+        (is_cccv & ~cccv_details_ok, "➡️ {step}번 스텝(CCCV): 상세 설정에서 'CV 목표 전압'과 '종료 전류'를 반드시 입력해야 합니다."),
+    ]
+    found = []
+    for order, (mask, template) in enumerate(rules):
+        found.extend((int(labels[i]), order, template.format(step=int(labels[i]) + 1)) for i in np.flatnonzero(mask))
+    errors = [msg for _, _, msg in sorted(found)]
+
+    try:
+        find_loops(recipe_df)
+    except ValueError as e:
+        errors.extend(f"➡️ {msg}" for msg in str(e).splitlines())
+    return errors
@@ -0,0 +1,92 @@
+"""레시피 루프 블록 컴파일
+
+레시피 표의 'Loop' 행은 '루프 시작 스텝'(1부터 시작하는 스텝 번호)부터 자기 바로 앞 스텝까지를
+'루프 횟수' 만큼 실행합니다 (루프 행 자체는 계산되지 않음). 루프는 중첩할 수 있으며
+서로 걸치는(교차하는) 루프는 허용하지 않습니다.
+
+예) 1: Charge, 2: Discharge, 3: Loop(시작 1, 3회), 4: Rest, 5: Loop(시작 1, 20회)
+    -> [ [Charge, Discharge] x3, Rest ] x20
+
+compile_recipe 는 레시피를 펼치지 않은 실행 트리(StepSpan / LoopBlock)로 변환합니다.
+"""
+from dataclasses import dataclass
+
+import pandas as pd
+
+LOOP_MODE = "Loop"
+LOOP_START_COLUMN = "루프 시작 스텝"
+LOOP_COUNT_COLUMN = "루프 횟수"
+LOOP_COLUMNS = [LOOP_START_COLUMN, LOOP_COUNT_COLUMN]
+
+
+@dataclass(frozen=True)
+class StepSpan:
+    """원본 레시피의 [start, stop) 행을 순서대로 1회 실행"""
+    start: int
+    stop: int
+
+
+@dataclass(frozen=True)
+class LoopBlock:
+    """body 를 count 회 실행 (start, stop: 루프 행을 포함해 이 블록이 차지하는 레시피 행 범위)"""
+    count: int
+    body: tuple
+    start: int = 0
+    stop: int = 0
+
+
+def has_loops(recipe_df):
+    return '모드' in recipe_df and bool((recipe_df['모드'] == LOOP_MODE).any())
+
+
+def find_loops(recipe_df):
+    """[(시작 행, 루프 행, 횟수)] 을 반환하고 잘못된 루프 정의는 ValueError 로 알림 (행 번호는 0부터)"""
+    if '모드' not in recipe_df: return []
+    loops = []
+    errors = []
+    starts = recipe_df.get(LOOP_START_COLUMN, pd.Series(index=recipe_df.index, dtype=float))
+    counts = recipe_df.get(LOOP_COUNT_COLUMN, pd.Series(index=recipe_df.index, dtype=float))
+    for row, mode in enumerate(recipe_df['모드'].tolist()):
+        if mode != LOOP_MODE: continue
+        start, count = pd.to_numeric(starts.iloc[row], errors='coerce'), pd.to_numeric(counts.iloc[row], errors='coerce')
+        if pd.isna(start) or start != int(start) or not (1 <= start <= row):
+            errors.append(f"{row + 1}번 스텝(Loop): '{LOOP_START_COLUMN}'은 1 ~ {row} 사이의 스텝 번호여야 합니다.")
+            continue
+        if pd.isna(count) or count != int(count) or count < 1:
+            errors.append(f"{row + 1}번 스텝(Loop): '{LOOP_COUNT_COLUMN}'는 1 이상의 정수여야 합니다.")
+            continue
+        loops.append((int(start) - 1, row, int(count)))
+
+    for a_start, a_row, _ in loops:
+        for b_start, b_row, _ in loops:
+            # b 가 a 안에서 시작해 a 밖에서 끝나면 교차
+            if a_start < b_start <= a_row < b_row:
+                errors.append(f"{a_row + 1}번 스텝과 {b_row + 1}번 스텝의 루프 구간이 서로 교차합니다. 루프는 완전히 포함되거나 떨어져 있어야 합니다.")
+    if errors: raise ValueError("\n".join(errors))
+    return loops
+
+
+def compile_recipe(recipe_df, repetition_count=1):
+    """레시피 표를 실행 트리로 변환 (전체 반복 횟수는 최상위 LoopBlock 으로 표현)"""
+    loops = find_loops(recipe_df)
+    # 같은 행에서 시작하는 루프는 바깥쪽(루프 행이 뒤에 있는 것)부터 사용 (안쪽 루프는 본문을 만들 때 사용)
+    loops_by_start = {}
+    for start, row, count in sorted(loops, key=lambda x: -x[1]):
+        loops_by_start.setdefault(start, []).append((row, count))
+
+    def build(lo, hi):
+        nodes, span_start, i = [], None, lo
+        while i < hi:
+            block = next(((row, count) for row, count in loops_by_start.get(i, []) if row < hi), None)
+            if block is not None:
+                if span_start is not None: nodes.append(StepSpan(span_start, i)); span_start = None
+                row, count = block
+                nodes.append(LoopBlock(count, build(i, row), i, row + 1))
+                i = row + 1
+                continue
+            if span_start is None: span_start = i
+            i += 1
+        if span_start is not None: nodes.append(StepSpan(span_start, hi))
+        return tuple(nodes)
+
+    return LoopBlock(max(int(repetition_count), 1), build(0, len(recipe_df)), 0, len(recipe_df))
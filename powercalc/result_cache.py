@@ -0,0 +1,136 @@
+"""레시피 시뮬레이션 결과 캐시 (프로세스 전체 공유)
+
+레시피 표, 상세 설정(cp_cccv_details), 사양, 반복 횟수, 효율 맵 파일 내용으로 만든 안정적인 해시(recipe_fingerprint)를
+키로 RecipeResult 를 LRU 방식으로 보관합니다. 모듈 수준 캐시이므로 같은 Streamlit 프로세스의 모든 페이지/세션이
+공유하며, 계산기 페이지에서 계산한 레시피는 결과 그래프 페이지에서 다시 시뮬레이션하지 않습니다.
+
+메모리 캐시 뒤에는 디스크 저장소(powercalc.disk_cache)가 있어 프로세스가 재시작되어도 결과가 유지됩니다.
+챔버 프로파일/연간 계획 등 다른 결과는 content_key 로 키를 만들어 디스크 저장소를 직접 사용합니다.
+"""
+import hashlib
+import json
+import math
+import threading
+from collections import OrderedDict
+from dataclasses import fields
+
+import numpy as np
+import pandas as pd
+
+from powercalc.disk_cache import get_disk_cache
+from powercalc.efficiency import get_registry
+from powercalc.recipe_engine import RECIPE_COLUMNS, CyclerSpecs, IncrementalSimulator
+from powercalc.recipe_loops import LOOP_COLUMNS
+
+DEFAULT_MAX_ENTRIES = 128
+CACHE_VERSION = 1  # 결과 객체 구조나 계산 방식이 바뀌면 올려서 디스크에 남은 이전 결과를 무효화
+
+
+# --- 1. 입력 해시 ---
+def _canonical(value):
+    """해시 입력 정규화 (숫자는 float, NaN 은 None) — 표의 dtype 이나 dict 키 형식이 달라도 같은 값이 되도록"""
+    if isinstance(value, dict): return {str(k): _canonical(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)): return [_canonical(v) for v in value]
+    if isinstance(value, (bool, np.bool_)): return bool(value)
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return None if math.isnan(value) else float(value)
+    if value is None or value is pd.NA: return None
+    return str(value)
+
+
+def recipe_fingerprint(recipe_df, cp_cccv_details, repetition_count, specs, exclude=()):
+    """레시피/상세 설정/반복 횟수/사양(exclude 항목 제외)/효율 맵의 내용 해시 (같은 입력이면 같은 값)"""
+    if not isinstance(specs, CyclerSpecs): specs = CyclerSpecs.from_mapping(specs)
+    columns = [c for c in recipe_df.columns if c in RECIPE_COLUMNS or c in LOOP_COLUMNS]
+    payload = {
+        'recipe': {'columns': columns, 'data': _canonical(recipe_df[columns].to_numpy(dtype=object).tolist())},
+        'details': _canonical({int(k): v for k, v in (cp_cccv_details or {}).items()}),
+        'repetition_count': int(repetition_count),
+        'specs': _canonical({f.name: getattr(specs, f.name) for f in fields(specs) if f.name not in exclude}),
+        'efficiency_map': get_registry().fingerprint(specs.cycler_model),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def content_key(namespace, payload):
+    """임의 입력(dict/list/숫자/문자열)의 내용 해시 키 'namespace:v버전:해시' (디스크 저장소용)"""
+    digest = hashlib.sha256(json.dumps(_canonical(payload), sort_keys=True).encode('utf-8')).hexdigest()
+    return f"{namespace}:v{CACHE_VERSION}:{digest}"
+
+
+# --- 2. LRU 캐시 ---
+class ResultCache:
+    """키 -> 결과 LRU 캐시 (스레드 안전, max_entries 를 넘으면 가장 오래 쓰지 않은 항목부터 제거)
+
+    backing (DiskCache) 이 있으면 메모리에 없는 키를 디스크에서 찾고, 저장할 때 디스크에도 기록합니다.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, backing=None, namespace='recipe'):
+        self.max_entries = max_entries
+        self.backing, self.namespace = backing, namespace
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits, self.misses = 0, 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _backing_key(self, key):
+        return f"{self.namespace}:v{CACHE_VERSION}:{key}"
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+        value = self.backing.get(self._backing_key(key)) if self.backing is not None else None
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._store(key, value)
+        return value
+
+    def put(self, key, value):
+        self._store(key, value)
+        if self.backing is not None: self.backing.put(self._backing_key(key), value)
+
+    def _store(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries: self._entries.popitem(last=False)
+
+    def get_or_compute(self, key, compute):
+        """(결과, 캐시 적중 여부) — 없으면 compute() 로 계산해 저장 (계산은 잠금 밖에서 수행)"""
+        value = self.get(key)
+        if value is not None: return value, True
+        value = compute()
+        self.put(key, value)
+        return value, False
+
+    def clear(self):
+        """메모리 항목만 비움 (디스크 항목은 DiskCache.clear 로 삭제)"""
+        with self._lock:
+            self._entries.clear()
+
+
+_result_cache = ResultCache(backing=get_disk_cache())
+
+
+def get_result_cache():
+    return _result_cache
+
+
+def cached_simulate_recipe(recipe_df, specs, cp_cccv_details=None, repetition_count=1, simulator=None):
+    """simulate_recipe 와 같은 결과를 프로세스 공용 캐시에서 반환 (없으면 simulator 또는 새 시뮬레이터로 계산)
+
+    반환한 RecipeResult 는 여러 페이지가 공유하므로 결과표(steps)를 직접 수정하지 마세요.
+    """
+    if not isinstance(specs, CyclerSpecs): specs = CyclerSpecs.from_mapping(specs)
+    key = recipe_fingerprint(recipe_df, cp_cccv_details, repetition_count, specs)
+    simulator = simulator or IncrementalSimulator()
+    result, _ = _result_cache.get_or_compute(key, lambda: simulator.simulate(recipe_df, specs, cp_cccv_details, repetition_count))
+    return result
@@ -0,0 +1,229 @@
+"""여러 시나리오를 한 번의 배열 연산으로 계산하는 레시피 엔진
+
+셀 용량, 대기전력, 채널 수, 배선(길이/단면적), 장비 사양, 효율 배율이 서로 다른 S 개의 시나리오를
+recipe_engine 과 같은 스텝 규칙으로 동시에 계산합니다. 스텝 계산은 시나리오 축에 대해 벡터화되어 있고
+(누적 충전량도 시나리오별 배열), 루프/반복의 정상 상태 판정은 모든 시나리오가 정상 상태일 때 적용됩니다.
+
+효율 맵 보간은 장비 사양마다 한 번만 하고 배선 보정은 시나리오별 저항으로 브로드캐스트합니다.
+결과는 시나리오별 요약(총 시간/전력량/최대 피크/수용률)으로 반환됩니다. 몬테카를로, 조합 스윕,
+배선 최적화, 장비 사양 자동 선택이 모두 이 모듈을 사용합니다.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, fields
+
+import numpy as np
+import pandas as pd
+
+from powercalc.efficiency import COPPER_RESISTIVITY, get_efficiency_model
+from powercalc.recipe_engine import (CyclerSpecs, _RunRecorder, attach_efficiencies, compile_recipe, operating_point_batch,
+                                     run_weights)
+
+MIN_PARALLEL_CHUNK = 256  # 이보다 작은 조각은 프로세스 간 전달 비용이 계산보다 큼
+SUMMARY_COLUMNS = ['total_hours', 'total_kwh', 'max_peak_power', 'demand_factor', 'demand_peak_power', 'required_equipment']
+
+
+# --- 1. 시나리오 입력 ---
+@dataclass
+class ScenarioSet:
+    """시나리오별 입력 값 (모든 필드는 길이 S 의 배열)"""
+    cell_capacity: np.ndarray
+    standby_power: np.ndarray
+    test_channels: np.ndarray
+    control_channels: np.ndarray
+    cable_length: np.ndarray
+    cable_area: np.ndarray
+    equipment_spec: np.ndarray
+    efficiency_scale: np.ndarray  # 효율 맵 값에 곱하는 배율 (1.0 = 그대로)
+
+    @classmethod
+    def from_specs(cls, specs, n=1, **overrides):
+        """기준 사양을 n 개 시나리오로 복제하고 overrides 로 준 필드만 시나리오별 값으로 바꿈"""
+        if not isinstance(specs, CyclerSpecs): specs = CyclerSpecs.from_mapping(specs)
+        unknown = set(overrides) - {f.name for f in fields(cls)}
+        if unknown: raise ValueError(f"알 수 없는 시나리오 항목입니다: {', '.join(sorted(unknown))}")
+        values = {}
+        for f in fields(cls):
+            base = overrides.get(f.name, getattr(specs, f.name, 1.0))
+            dtype = object if f.name == 'equipment_spec' else (np.int64 if f.name.endswith('_channels') else float)
+            values[f.name] = np.broadcast_to(np.asarray(base, dtype=dtype), (n,)).copy()
+        return cls(**values)
+
+    def __len__(self):
+        return len(self.cell_capacity)
+
+    def subset(self, index):
+        return ScenarioSet(**{f.name: getattr(self, f.name)[index] for f in fields(self)})
+
+    @property
+    def required_equipment(self):
+        return np.where(self.control_channels > 0, -(-self.test_channels // np.maximum(self.control_channels, 1)), 0)
+
+    @property
+    def cable_resistance(self):
+        """calculate_cable_resistance 와 같은 식의 시나리오별 배선 저항 (Ω)"""
+        area_m2 = self.cable_area * 1e-6
+        return np.where(self.cable_area > 0, COPPER_RESISTIVITY * (self.cable_length * 2) / np.where(self.cable_area > 0, area_m2, 1.0), 0.0)
+
+
+def _scenario_operating_points(points, scenarios, cycler_model):
+    """시나리오별 효율 (장비 사양별로 효율 맵을 한 번씩 보간하고 배선 보정은 시나리오별로 적용)"""
+    model = get_efficiency_model(cycler_model)
+    efficiencies = np.empty((len(scenarios), len(points['batch_voltages'])))
+    resistances = scenarios.cable_resistance
+    for spec in pd.unique(scenarios.equipment_spec):
+        selected = scenarios.equipment_spec == spec
+        efficiencies[selected] = model.efficiency_batch_resistances(
+            points['batch_modes'], points['batch_voltages'], points['batch_currents'], spec, resistances[selected])
+    scale = scenarios.efficiency_scale[:, None]
+    if not np.all(scale == 1.0): efficiencies = np.minimum(efficiencies * np.maximum(scale, 0.0), 1.0)  # 효율 맵과 같이 상한 1.0
+    return attach_efficiencies(points, efficiencies)
+
+
+# --- 2. 벡터화된 스텝 계산 ---
+class _BatchContext:
+    def __init__(self, specs, scenarios, operating_points, cp_cccv_details):
+        self.specs, self.scenarios = specs, scenarios
+        self.operating_points, self.cp_cccv_details = operating_points, cp_cccv_details
+        self.capacity = scenarios.cell_capacity
+        self.test_channels = scenarios.test_channels.astype(float)
+        self.standby_kw = scenarios.standby_power * scenarios.required_equipment / 1000.0
+
+    def plant_power_kw(self, p_ch_w):
+        return p_ch_w * self.test_channels / 1000.0 + self.standby_kw
+
+
+def _safe_divide(a, b):
+    """b > 0 인 곳만 a / b, 나머지는 0 (기존 'x / eff if eff > 0 else 0' 규칙)"""
+    b = np.asarray(b, dtype=float)
+    return np.where(b > 0, np.asarray(a, dtype=float) / np.where(b > 0, b, 1.0), 0.0)
+
+
+def _simulate_step_batch(step, i, ctx, current_charge_ah):
+    """recipe_engine._simulate_step 의 시나리오 벡터화 버전: ([시간(H), 전력(kW)] (2, S) 또는 None, 누적 충전량)"""
+    mode, test_type = step['모드'], step['테스트']
+    capacity, n = ctx.capacity, len(ctx.capacity)
+    time_limit = step['시간 제한(H)']
+
+    if mode == 'Rest':
+        actual_time = np.full(n, time_limit if pd.notna(time_limit) else 0.0)
+        return np.stack([actual_time, ctx.standby_kw]), current_charge_ah
+
+    if test_type == 'CCCV' and mode == 'Charge':
+        details = ctx.cp_cccv_details.get(i, {})
+        if not details: return None, current_charge_ah
+        cc_current = step['전류(A)']
+        avg_v_cc = step['전압(V)'] if pd.notna(step['전압(V)']) else 3.8
+        cv_v, cutoff_a = details.get('cv_v'), details.get('cutoff_a')
+        transition_ratio = details.get('transition', 80.0) / 100.0
+
+        chargeable_ah = capacity - current_charge_ah
+        ah_for_cc = chargeable_ah * transition_ratio
+        ah_for_cv = chargeable_ah * (1 - transition_ratio)
+        time_cc = ah_for_cc / cc_current if cc_current > 0 else np.zeros(n)
+        p_in_cc = _safe_divide(avg_v_cc * cc_current, ctx.operating_points['efficiencies'][:, i])
+
+        cv_table = ctx.operating_points['cv_tables'].get(i)
+        exponential = ctx.specs.cv_model == 'exponential' and cv_table is not None
+        if exponential:
+            tau = ah_for_cv / (cc_current - cutoff_a)
+            full_cv = tau * np.log(cc_current / cutoff_a)
+        else:
+            avg_current_cv = (cc_current + cutoff_a) / 2.0 if cc_current and cutoff_a else 0
+            full_cv = ah_for_cv / avg_current_cv if avg_current_cv > 0 else np.zeros(n)
+            p_in_cv = _safe_divide(cv_v * avg_current_cv, ctx.operating_points['cv_efficiencies'][:, i])
+
+        actual_time = time_cc + full_cv
+        if pd.notna(time_limit) and time_limit > 0:
+            actual_time = np.where(time_limit < actual_time, time_limit, actual_time)
+        time_cv = np.maximum(actual_time - time_cc, 0.0)
+        if exponential:
+            end_current = np.where(tau > 0, cc_current * np.exp(-time_cv / np.where(tau > 0, tau, 1.0)), cutoff_a)
+            cv_charge = tau * (cc_current - end_current)
+            cv_energy = cv_v * tau * (cv_table.integral_at(np.full(n, float(cc_current))) - cv_table.integral_at(end_current))
+        else:
+            cv_charge, cv_energy = time_cv * avg_current_cv, time_cv * p_in_cv
+
+        in_cc = actual_time <= time_cc
+        charge_change = np.where(in_cc, actual_time * cc_current, time_cc * cc_current + cv_charge)
+        energy_wh = np.where(in_cc, actual_time * p_in_cc, time_cc * p_in_cc + cv_energy)
+        total_power_kw = ctx.plant_power_kw(_safe_divide(energy_wh, actual_time))
+        current_charge_ah = np.clip(current_charge_ah + charge_change, 0, capacity)
+        return np.stack([actual_time, total_power_kw]), current_charge_ah
+
+    if mode not in ['Charge', 'Discharge']: return None, current_charge_ah
+
+    voltage, current = step['전압(V)'], step['전류(A)']
+    if test_type == 'CC':
+        current = abs(current) if pd.notna(current) else 0
+    elif test_type == 'CP':
+        voltage = ctx.operating_points['voltages'][i]
+        current = ctx.operating_points['currents'][i]
+    if not (pd.notna(voltage) and pd.notna(current) and current > 0): return None, current_charge_ah
+
+    efficiency = ctx.operating_points['efficiencies'][:, i]
+    soc_time_limit = (capacity - current_charge_ah) / current if mode == 'Charge' else current_charge_ah / current
+    actual_time = np.minimum(soc_time_limit, capacity / current)
+    if time_limit is not None and time_limit > 0: actual_time = np.minimum(actual_time, time_limit)
+
+    charge_change = actual_time * current
+    current_charge_ah = np.clip(current_charge_ah + (charge_change if mode == 'Charge' else -charge_change), 0, capacity)
+    if mode == 'Charge':
+        total_power_kw = ctx.plant_power_kw(_safe_divide(voltage * current, efficiency))
+    else: # Discharge: 대기전력에서 회수전력 차감
+        total_power_kw = ctx.plant_power_kw(-voltage * current * efficiency)
+    return np.stack([actual_time, total_power_kw]), current_charge_ah
+
+
+# --- 3. 실행 ---
+def simulate_scenarios(recipe_df, specs, scenarios, cp_cccv_details=None, repetition_count=1):
+    """모든 시나리오를 한 번에 계산해 시나리오별 요약 DataFrame (SUMMARY_COLUMNS) 을 반환
+
+    specs 의 효율 맵(cycler_model)/CV 모델은 모든 시나리오에 공통으로 쓰고, LUT 대신 정밀 모델을 사용합니다.
+    """
+    if not isinstance(specs, CyclerSpecs): specs = CyclerSpecs.from_mapping(specs)
+    cp_cccv_details = {int(k): v for k, v in (cp_cccv_details or {}).items()}
+    recipe_df = recipe_df.reset_index(drop=True)
+    n = len(scenarios)
+    program = compile_recipe(recipe_df, repetition_count)
+    steps = recipe_df.to_dict('records')
+
+    points = operating_point_batch(recipe_df, cp_cccv_details)
+    operating_points = _scenario_operating_points(points, scenarios, specs.cycler_model)
+    ctx = _BatchContext(specs, scenarios, operating_points, cp_cccv_details)
+    recorder = _RunRecorder(lambda i, charge_ah: _simulate_step_batch(steps[i], i, ctx, charge_ah), np.zeros((2, n)))
+    runs, _, _ = recorder.simulate_loop(program, np.zeros(n))
+
+    weights = run_weights(runs, len(recorder.order)).astype(float)
+    outputs = np.asarray(recorder.outputs, dtype=float).reshape(len(recorder.order), 2, n)
+    times, powers = outputs[:, 0, :], outputs[:, 1, :]
+    is_charge = (recipe_df['모드'].to_numpy(dtype=object)[np.asarray(recorder.order, dtype=np.intp)] == 'Charge') if len(recorder.order) else np.zeros(0, dtype=bool)
+
+    total_hours = weights @ times
+    total_kwh = weights @ (powers * times)
+    max_peak_power = np.max(np.where(powers >= 0, powers, 0.0), axis=0) if len(recorder.order) else np.zeros(n)
+    charge_hours = (weights * is_charge) @ times
+    demand_factor = _safe_divide(charge_hours, total_hours)
+    return pd.DataFrame({'total_hours': total_hours, 'total_kwh': total_kwh, 'max_peak_power': max_peak_power,
+                         'demand_factor': demand_factor, 'demand_peak_power': max_peak_power * demand_factor,
+                         'required_equipment': scenarios.required_equipment})
+
+
+def _simulate_chunk(args):
+    return simulate_scenarios(*args)
+
+
+def simulate_scenarios_parallel(recipe_df, specs, scenarios, cp_cccv_details=None, repetition_count=1, workers=None, chunk_size=None):
+    """시나리오를 chunk_size 개(기본: 작업자 수로 균등 분할)씩 나눠 프로세스 풀에서 계산
+
+    workers 가 1 이하이거나 시나리오가 MIN_PARALLEL_CHUNK 개 이하로 나뉘면 현재 프로세스에서 계산합니다.
+    """
+    workers = workers if workers is not None else (os.cpu_count() or 1)
+    chunk_size = chunk_size or max(MIN_PARALLEL_CHUNK, -(-len(scenarios) // max(workers, 1)))
+    if workers <= 1 or len(scenarios) <= chunk_size:
+        return simulate_scenarios(recipe_df, specs, scenarios, cp_cccv_details, repetition_count)
+    if not isinstance(specs, CyclerSpecs): specs = CyclerSpecs.from_mapping(specs)
+    chunks = [scenarios.subset(slice(start, start + chunk_size)) for start in range(0, len(scenarios), chunk_size)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(_simulate_chunk, [(recipe_df, specs, chunk, cp_cccv_details, repetition_count) for chunk in chunks]))
+    return pd.concat(results, ignore_index=True)
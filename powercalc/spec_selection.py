@@ -0,0 +1,44 @@
+"""장비 사양(프레임) 자동 선택
+
+레시피를 13 개 장비 사양 전체에 대해 scenario_engine 으로 한 번에 계산하고 전력량/피크로 순위를 매깁니다.
+(필요 장비 수는 테스트 채널 수 / 컨트롤 채널 수로 정해져 사양과 무관하므로 순위 기준이 아닙니다.)
+효율은 장비 최대 전류 대비 부하율에 따라 크게 달라지므로 같은 레시피라도 사양마다 결과가 다릅니다.
+레시피의 최대 전류가 장비 최대 전류를 넘는 사양은 전류 범위 초과로 표시하고 순위에서 뒤로 보냅니다.
+"""
+import numpy as np
+import pandas as pd
+
+from powercalc.efficiency import EQUIPMENT_SPECS, parse_max_current
+from powercalc.recipe_engine import CyclerSpecs, operating_point_batch
+from powercalc.scenario_engine import ScenarioSet, simulate_scenarios
+
+RANKING_CRITERIA = {'total_kwh': "총 전력량", 'max_peak_power': "최대 피크 전력"}
+
+
+def recipe_max_current(recipe_df, cp_cccv_details=None):
+    """레시피 스텝 운전점 중 최대 전류 (A, CP 는 계산된 평균 전류, CCCV 는 CC 전류)"""
+    currents = np.abs(operating_point_batch(recipe_df.reset_index(drop=True), cp_cccv_details or {})['currents'])
+    return float(np.nanmax(currents)) if np.isfinite(currents).any() else 0.0
+
+
+def rank_equipment_specs(recipe_df, specs, cp_cccv_details=None, repetition_count=1, equipment_specs=EQUIPMENT_SPECS,
+                         sort_by=('total_kwh', 'max_peak_power')):
+    """장비 사양별 결과와 순위 (전류 범위를 넘지 않는 사양이 먼저, 그 안에서 sort_by 순서로 오름차순)
+
+    열: rank, equipment_spec, max_current, load_ratio (레시피 최대 전류 / 장비 최대 전류), exceeds_range, 요약 값
+    """
+    if not isinstance(specs, CyclerSpecs): specs = CyclerSpecs.from_mapping(specs)
+    cp_cccv_details = {int(k): v for k, v in (cp_cccv_details or {}).items()}
+    equipment_specs = list(equipment_specs)
+    scenarios = ScenarioSet.from_specs(specs, len(equipment_specs), equipment_spec=np.array(equipment_specs, dtype=object))
+    summary = simulate_scenarios(recipe_df, specs, scenarios, cp_cccv_details, repetition_count)
+
+    peak_current = recipe_max_current(recipe_df, cp_cccv_details)
+    max_currents = np.array([parse_max_current(spec) or np.nan for spec in equipment_specs], dtype=float)
+    table = pd.concat([pd.DataFrame({
+        'equipment_spec': equipment_specs, 'max_current': max_currents,
+        'load_ratio': peak_current / max_currents, 'exceeds_range': peak_current > max_currents,
+    }), summary], axis=1)
+    table = table.sort_values(['exceeds_range', *sort_by], kind='stable').reset_index(drop=True)
+    table.insert(0, 'rank', np.arange(1, len(table) + 1))
+    return table
@@ -0,0 +1,199 @@
+"""레시피 시작 시차 자동 최적화 (종합 최대 전력 / 최대 수요전력 최소화)
+
+결과 그래프 페이지는 선택한 레시피가 모두 0H 에 시작한다고 보므로 충전 피크가 겹칩니다.
+레시피마다 시작 시차를 [최소, 최대] 범위에서 granularity_h 간격으로 찾아 종합 전력의 목적 함수를 줄입니다.
+
+- 탐색: 좌표 하강 — 레시피 하나의 시차만 바꾸고 나머지 레시피의 종합 전력(others)은 고정해 모든 후보 시차를 한 번에 평가,
+  개선이 없을 때까지 레시피를 돌아가며 반복 (레시피는 다시 시뮬레이션하지 않고 계단 함수만 옮김)
+- 최대 전력: 시차 o 의 종합 최대 전력 = max_j (스텝 j 전력 + others 의 [시작_j + o, 종료_j + o) 최댓값) 이므로
+  PowerTimeline 구간 최댓값 조회로 (후보 x 스텝) 을 벡터 연산으로 정확히 계산
+- 최대 수요전력: 이동 평균은 두 레시피 이동 평균의 합이고 구간별 선형이므로 양쪽 꺾이는 시각에서만 평가
+- 가지치기: 전력이 큰 스텝(꺾이는 시각)부터 묶음으로 평가해 하한이 현재 시차의 값 이상이 된 후보는 더 계산하지 않고,
+  묶음의 상한(묶음 최댓값 + 상대 쪽 최댓값)이 이미 구한 하한 이하인 후보는 그 묶음을 건너뜀
+
+레시피는 시작 전과 종료 후 대기전력(standby_kw)만 씁니다. 내부에서는 대기전력을 뺀 곡선(시작 전/종료 후 0 kW)으로
+탐색하고, 종합 전력에는 모든 레시피의 대기전력 합(상수)을 더하므로 최적 시차는 같고 목적 함수는 그만큼 커집니다.
+최대 수요전력은 rolling_demand 와 같게 타임라인 안의 구간(구간 끝 <= 종합 전력 종료 시각)만 봅니다.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+from powercalc.demand import DEFAULT_DEMAND_WINDOW_H, demand_peak
+from powercalc.power_timeline import PowerTimeline
+from powercalc.power_trace import merge_step_curves
+
+STAGGER_OBJECTIVES = {'peak': "순간 최대 전력", 'demand': "최대 수요전력"}
+EVALUATION_CHUNK = 2048  # 한 번에 평가하는 스텝(꺾이는 시각) 수 — 묶음마다 가지치기
+
+
+@dataclass
+class StaggerResult:
+    """시작 시차 최적화 결과 (offsets: 레시피별 시작 시차 H, baseline: 모두 0H 시작일 때 목적 함수 값)"""
+    offsets: np.ndarray
+    baseline: float
+    optimized: float
+    timeline: PowerTimeline
+    baseline_timeline: PowerTimeline
+    passes: int
+
+    @property
+    def reduction(self):
+        return self.baseline - self.optimized
+
+    @property
+    def reduction_ratio(self):
+        return self.reduction / self.baseline if self.baseline > 0 else 0.0
+
+
+def shift_curve(curve, offset_h):
+    """step_curve 결과를 offset_h 만큼 늦게 시작하도록 이동"""
+    starts, ends, powers = curve
+    return starts + offset_h, ends + offset_h, powers
+
+
+def combined_timeline(curves, offsets, standby_kw=0.0):
+    """시작 시차를 반영한 종합 전력 타임라인 (standby_kw: 전 기간에 더할 대기전력 합)"""
+    timeline, power = merge_step_curves([shift_curve(curve, offset) for curve, offset in zip(curves, offsets)], hold_last=False)
+    return PowerTimeline(timeline, power + standby_kw)
+
+
+def schedule_objective(timeline, objective='peak', window_h=DEFAULT_DEMAND_WINDOW_H, exclude_h=0.0):
+    """종합 전력의 목적 함수 값 (peak: 최대 전력, demand: 최대 수요전력 — 둘 다 0 kW 미만은 0)"""
+    if objective == 'peak': return max(timeline.max_value, 0.0)
+    if objective == 'demand':
+        peak = demand_peak(timeline, window_h, exclude_h)
+        return max(peak.demand_kw, 0.0) if peak is not None else 0.0
+    raise ValueError(f"알 수 없는 목적 함수입니다: {objective} (가능한 값: {', '.join(STAGGER_OBJECTIVES)})")
+
+
+# --- 1. 후보 시차 평가 (묶음 단위) ---
+def _window_max(timeline, a, b):
+    """[a, b) 최댓값 — 빈 구간은 -inf, 타임라인 밖(0 kW)에 걸친 구간은 0 kW 포함"""
+    if not len(timeline): return np.where(b > a, 0.0, -np.inf)
+    inside = np.nan_to_num(timeline.max_in_window(a, b), nan=-np.inf)
+    inside = np.where((a < timeline.start) | (b > timeline.end), np.fmax(inside, 0.0), inside)
+    return np.where(b > a, inside, -np.inf)
+
+
+def _chunks(order):
+    return [order[i:i + EVALUATION_CHUNK] for i in range(0, len(order), EVALUATION_CHUNK)]
+
+
+def _peak_evaluators(others, curve):
+    """최대 전력 평가 목록 [(상한, 함수)] — 함수는 후보 시차 배열 -> 그 묶음에서의 최댓값 배열"""
+    starts, ends, powers = curve
+    end = ends[-1]
+    others_max = max(others.max_value, 0.0)
+    # 레시피가 돌지 않는 구간은 나머지 레시피 전력만
+    evaluators = [(others_max, lambda offs: np.fmax(_window_max(others, np.zeros_like(offs), offs),
+                                                    _window_max(others, offs + end, np.full_like(offs, max(others.end, 0.0)))))]
+    for idx in _chunks(np.argsort(-powers, kind='stable')):
+        evaluators.append((powers[idx].max() + others_max, lambda offs, idx=idx: (powers[idx][None, :] + _window_max(
+            others, starts[idx][None, :] + offs[:, None], ends[idx][None, :] + offs[:, None])).max(axis=1)))
+    return evaluators
+
+
+def _demand_evaluators(others, curve, window_h, exclude_h):
+    """최대 수요전력 평가 목록 [(상한, 함수)] (레시피 쪽 꺾이는 시각, 나머지 레시피 쪽 꺾이는 시각 순)"""
+    starts, ends, powers = curve
+    recipe = PowerTimeline.from_step_curve(starts, ends, powers)
+    lo = exclude_h + window_h
+
+    def average(timeline, t):
+        return timeline.energy(t - window_h, t) / window_h
+
+    recipe_knots = np.unique(np.concatenate([starts, ends[-1:]]) + np.array([[0.0], [window_h]])).ravel()
+    recipe_avg = average(recipe, recipe_knots)
+    other_knots = np.unique(np.concatenate([others.times, [others.end, lo]]) + np.array([[0.0], [window_h]]))
+    other_avg = average(others, other_knots) if len(others) else np.zeros(len(other_knots))
+
+    def window_ends(t, offs):
+        """rolling_demand 와 같은 후보 범위: lo <= 구간 끝 <= max(종합 전력 종료 시각, lo)"""
+        hi = np.maximum(np.maximum(others.end if len(others) else 0.0, ends[-1] + offs), lo)[:, None]
+        return (t >= lo) & (t <= hi)
+
+    def at_recipe_knots(offs, idx):
+        t = recipe_knots[idx][None, :] + offs[:, None]
+        values = recipe_avg[idx][None, :] + (average(others, t) if len(others) else 0.0)
+        return np.where(window_ends(t, offs), values, -np.inf).max(axis=1)
+
+    def at_other_knots(offs, idx):
+        t = np.broadcast_to(other_knots[idx][None, :], (len(offs), len(idx)))
+        values = other_avg[idx][None, :] + average(recipe, t - offs[:, None])
+        return np.where(window_ends(t, offs), values, -np.inf).max(axis=1)
+
+    recipe_max, other_max = max(recipe_avg.max(), 0.0), max(other_avg.max(), 0.0)
+    evaluators = [(recipe_avg[idx].max() + other_max, lambda offs, idx=idx: at_recipe_knots(offs, idx))
+                  for idx in _chunks(np.argsort(-recipe_avg, kind='stable'))]
+    evaluators += [(other_avg[idx].max() + recipe_max, lambda offs, idx=idx: at_other_knots(offs, idx))
+                   for idx in _chunks(np.argsort(-other_avg, kind='stable'))]
+    return evaluators
+
+
+def _best_offset(evaluators, candidates, current, incumbent, floor=0.0):
+    """(최적 시차, 값) — incumbent(현재 시차의 값)보다 확실히 작은 후보만 끝까지 평가 (같은 값이면 현재 시차 유지)
+
+    floor: 목적 함수의 하한 (대기전력을 뺀 곡선에서는 -대기전력 합 — 종합 전력 기준 0 kW)
+    """
+    tolerance = 1e-9 * max(1.0, abs(incumbent))
+    lower = np.full(len(candidates), float(floor))
+    alive = np.ones(len(candidates), dtype=bool)
+    for upper, evaluate in evaluators:
+        idx = np.flatnonzero(alive & (lower < upper))
+        if not alive.any(): return current, incumbent
+        if not len(idx): continue
+        lower[idx] = np.fmax(lower[idx], evaluate(candidates[idx]))
+        alive[idx] = lower[idx] < incumbent - tolerance
+    if not alive.any(): return current, incumbent
+    best = np.flatnonzero(alive)[np.argmin(lower[alive])]
+    return float(candidates[best]), float(lower[best])
+
+
+# --- 2. 좌표 하강 ---
+def optimize_start_offsets(curves, max_offset_h, granularity_h, min_offset_h=0.0, objective='peak',
+                           window_h=DEFAULT_DEMAND_WINDOW_H, exclude_h=0.0, max_passes=5, standby_kw=0.0):
+    """레시피별 시작 시차를 찾아 StaggerResult 반환
+
+    curves: 레시피별 step_curve 결과 (0H 시작 기준), min_offset_h / max_offset_h: 시차 범위 (숫자 또는 레시피별 배열),
+    granularity_h: 시차 간격, objective: 'peak' (순간 최대 전력) 또는 'demand' (window_h 평균 최대 수요전력),
+    standby_kw: 레시피 시작 전/종료 후의 대기전력 (숫자 또는 레시피별 배열)
+    """
+    if objective not in STAGGER_OBJECTIVES:
+        raise ValueError(f"알 수 없는 목적 함수입니다: {objective} (가능한 값: {', '.join(STAGGER_OBJECTIVES)})")
+    if granularity_h <= 0: raise ValueError("시차 간격은 0 보다 커야 합니다.")
+    n = len(curves)
+    lows = np.broadcast_to(np.asarray(min_offset_h, dtype=float), (n,))
+    highs = np.broadcast_to(np.asarray(max_offset_h, dtype=float), (n,))
+    if (highs < lows).any(): raise ValueError("시차 최댓값은 최솟값보다 작을 수 없습니다.")
+    candidates = [low + granularity_h * np.arange(int(np.floor((high - low) / granularity_h + 1e-9)) + 1) for low, high in zip(lows, highs)]
+    standby = np.broadcast_to(np.asarray(standby_kw, dtype=float), (n,))
+    total_standby = float(standby.sum())
+    # 대기전력을 뺀 곡선: 시작 전/종료 후 0 kW 이므로 평가 함수를 그대로 쓰고, 목적 함수 값은 대기전력 합만큼 작음
+    curves = [(starts, ends, powers - base) for (starts, ends, powers), base in zip(curves, standby)]
+
+    def objective_value(offsets):
+        return schedule_objective(combined_timeline(curves, offsets, total_standby), objective, window_h, exclude_h)
+
+    baseline_timeline = combined_timeline(curves, np.zeros(n), total_standby)
+    baseline = schedule_objective(baseline_timeline, objective, window_h, exclude_h)
+    offsets = lows.copy()
+    current = (baseline if not offsets.any() else objective_value(offsets)) - total_standby
+    # 피크가 큰 레시피부터 자리를 잡도록 순서를 정함
+    order = sorted((i for i in range(n) if len(curves[i][2]) and len(candidates[i]) > 1), key=lambda i: -curves[i][2].max())
+
+    passes = 0
+    for passes in range(1, max_passes + 1):
+        improved = False
+        for r in order:
+            others = combined_timeline([curves[i] for i in range(n) if i != r], [offsets[i] for i in range(n) if i != r])
+            if objective == 'peak': evaluators = _peak_evaluators(others, curves[r])
+            else: evaluators = _demand_evaluators(others, curves[r], window_h, exclude_h)
+            best, value = _best_offset(evaluators, candidates[r], offsets[r], current, floor=-total_standby)
+            if best != offsets[r]:
+                offsets[r], current, improved = best, value, True
+        if not improved: break
+
+    timeline = combined_timeline(curves, offsets, total_standby)
+    optimized = schedule_objective(timeline, objective, window_h, exclude_h)
+    return StaggerResult(offsets, baseline, optimized, timeline, baseline_timeline, passes)
@@ -0,0 +1,89 @@
+"""배선/장비 사양/채널 구성 조합 스윕
+
+cable_area x cable_length x equipment_spec x control_channels 의 모든 조합을 scenario_engine 으로 한 번에
+계산합니다 (조합이 많으면 프로세스 풀로 나눠 계산). 결과는 조합(격자점)마다 SweepCache 에 저장되므로,
+범위를 넓히면 새로 추가된 격자점만 계산합니다.
+"""
+import itertools
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from powercalc.recipe_engine import CyclerSpecs
+from powercalc.result_cache import recipe_fingerprint
+from powercalc.scenario_engine import SUMMARY_COLUMNS, ScenarioSet, simulate_scenarios_parallel
+
+SWEEP_PARAMETERS = ('cable_area', 'cable_length', 'equipment_spec', 'control_channels')
+
+
+def _cast_value(value, cast, part):
+    """cast=int 이면 정수가 아닌 값(예: 16.5)은 잘라내지 않고 오류"""
+    if cast is int and not float(value).is_integer(): raise ValueError(f"정수 값만 입력할 수 있습니다: {part}")
+    return cast(value)
+
+
+def parse_sweep_values(text, cast=float):
+    """'95, 120, 150' 같은 목록 또는 '시작:끝:간격' 범위(끝 포함)를 값 목록으로 변환"""
+    values = []
+    for part in str(text).replace(';', ',').split(','):
+        part = part.strip()
+        if not part: continue
+        if ':' in part:
+            start, stop, step = (float(x) for x in part.split(':'))
+            if step <= 0: raise ValueError(f"범위 간격은 0 보다 커야 합니다: {part}")
+            values.extend(_cast_value(round(v, 9), cast, part) for v in np.arange(start, stop + step / 2, step))
+        else:
+            values.append(_cast_value(float(part), cast, part))
+    return sorted(set(values))
+
+
+class SweepCache:
+    """(레시피 지문, 격자점) -> 결과 요약 값 캐시 (Streamlit 세션 상태에 보관)"""
+
+    def __init__(self):
+        self._points = {}
+
+    def __len__(self):
+        return len(self._points)
+
+    def get(self, fingerprint, point):
+        return self._points.get((fingerprint, point))
+
+    def put(self, fingerprint, point, values):
+        self._points[(fingerprint, point)] = values
+
+    def clear(self):
+        self._points.clear()
+
+
+@dataclass
+class SweepResult:
+    """격자점별 결과 (열: SWEEP_PARAMETERS + SUMMARY_COLUMNS) 와 이번에 새로 계산한 격자점 수"""
+    table: pd.DataFrame
+    computed_points: int
+
+    def heatmap(self, metric, equipment_spec, control_channels):
+        """장비 사양/컨트롤 채널 수 하나에 대한 (행: 배선 단면적, 열: 배선 길이) 표"""
+        selected = self.table[(self.table['equipment_spec'] == equipment_spec) & (self.table['control_channels'] == control_channels)]
+        return selected.pivot(index='cable_area', columns='cable_length', values=metric)
+
+
+def run_sweep(recipe_df, specs, cable_areas, cable_lengths, equipment_specs, control_channels,
+              cp_cccv_details=None, repetition_count=1, cache=None, workers=None):
+    """모든 조합을 계산해 SweepResult 를 반환 (cache 에 있는 격자점은 다시 계산하지 않음)"""
+    if not isinstance(specs, CyclerSpecs): specs = CyclerSpecs.from_mapping(specs)
+    cache = cache if cache is not None else SweepCache()
+    fingerprint = recipe_fingerprint(recipe_df, cp_cccv_details, repetition_count, specs, exclude=SWEEP_PARAMETERS)
+    points = [(float(a), float(l), str(s), int(c)) for a, l, s, c in itertools.product(cable_areas, cable_lengths, equipment_specs, control_channels)]
+
+    missing = [p for p in dict.fromkeys(points) if cache.get(fingerprint, p) is None]
+    if missing:
+        area, length, spec, channels = (np.array(values, dtype=object if j == 2 else None) for j, values in enumerate(zip(*missing)))
+        scenarios = ScenarioSet.from_specs(specs, len(missing), cable_area=area, cable_length=length, equipment_spec=spec, control_channels=channels)
+        summary = simulate_scenarios_parallel(recipe_df, specs, scenarios, cp_cccv_details, repetition_count, workers=workers)
+        for point, values in zip(missing, summary[SUMMARY_COLUMNS].itertuples(index=False, name=None)):
+            cache.put(fingerprint, point, values)
+
+    table = pd.DataFrame([point + tuple(cache.get(fingerprint, point)) for point in points], columns=list(SWEEP_PARAMETERS) + SUMMARY_COLUMNS)
+    return SweepResult(table, len(missing))